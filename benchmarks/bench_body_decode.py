@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓包路径body处理开销对比
+用 logs/ 中的真实请求/响应体比较:
+  eager - 旧版拦截器在抓包时立即做 json.loads / parse_qs / utf-8 解码
+  lazy  - 新版只保存原始内容(encode_body)，解析推迟到分析时
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import find_capture_files, iter_capture_file
+from body_decoder import encode_body, parse_body
+
+
+def eager_decode(content, content_type):
+    """旧版拦截器的body处理逻辑"""
+    if not content:
+        return None
+    try:
+        if 'application/json' in content_type:
+            return json.loads(content.decode('utf-8'))
+        elif 'application/x-www-form-urlencoded' in content_type:
+            return dict(parse_qs(content.decode('utf-8')))
+        else:
+            try:
+                return content.decode('utf-8')
+            except UnicodeDecodeError:
+                return f"<二进制数据: {len(content)} 字节>"
+    except Exception as e:
+        return f"<解析失败: {str(e)}>"
+
+
+def load_samples(log_dir):
+    """从日志中还原 (原始字节, Content-Type) 样本"""
+    samples = []
+    for path in find_capture_files(log_dir):
+        for record in iter_capture_file(path):
+            for part in (record.get('request', {}), record.get('response', {})):
+                body = part.get('body')
+                if body is None:
+                    continue
+                if isinstance(body, (dict, list)):
+                    content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    content = str(body).encode('utf-8')
+                    content_type = part.get('headers', {}).get('Content-Type', 'text/html')
+                samples.append((content, content_type))
+    return samples
+
+
+def bench(func, samples, rounds):
+    """返回每条样本的平均耗时(微秒)"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for content, content_type in samples:
+            func(content, content_type)
+    elapsed = time.perf_counter() - started
+    return elapsed / (rounds * len(samples)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比抓包时立即解析body与延迟解析的CPU开销")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    samples = load_samples(args.log_dir)
+    if not samples:
+        print("未找到带body的日志记录")
+        return
+
+    total_bytes = sum(len(content) for content, _ in samples)
+    print(f"样本: {len(samples)} 个body, 共 {total_bytes} 字节, 每个重复 {args.rounds} 次")
+
+    structured = [s for s in samples if 'json' in s[1] or 'form' in s[1]]
+    groups = [("全部", samples), ("JSON/表单", structured)]
+    for label, group in groups:
+        if not group:
+            continue
+        encoded = [(encode_body(content), content_type) for content, content_type in group]
+        eager = bench(eager_decode, group, args.rounds)
+        lazy = bench(lambda content, _: encode_body(content), group, args.rounds)
+        deferred = bench(lambda body, content_type: parse_body(body[0], body[1], content_type), encoded, args.rounds)
+
+        print(f"\n[{label}] {len(group)} 个body")
+        print(f"  抓包时立即解析 (旧):   {eager:8.2f} µs/body")
+        print(f"  抓包时只保存原始内容:  {lazy:8.2f} µs/body  (节省 {eager - lazy:.2f} µs, {(1 - lazy / eager) * 100:.0f}%)")
+        print(f"  分析时按需解析一次:    {deferred:8.2f} µs/body  (只对实际查看的body产生)")
+
+
+if __name__ == "__main__":
+    main()
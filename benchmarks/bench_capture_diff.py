@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两次抓包对比的耗时和内存
+用 logs/ 中的真实记录循环生成两份抓包(默认各 5万/20万 条，后一份的耗时和响应大小放大)，
+对每种记录数计时并记录峰值内存:
+  diff - EndpointProfile 流式统计两份抓包 + diff_profiles
+峰值内存只与接口数和耗时直方图的桶数有关，不随记录数增长
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_diff import EndpointProfile, diff_profiles
+from capture_log import find_capture_files, iter_capture_file
+
+
+def stream(templates, count, slowdown, seed):
+    """逐条生成记录(不整体保存)，耗时为指数分布，乘以slowdown"""
+    rng = random.Random(seed)
+    for i in range(count):
+        record = templates[i % len(templates)]
+        response = dict(record.get('response') or {})
+        response['response_time'] = rng.expovariate(20) * slowdown
+        response['body_size'] = int((response.get('body_size') or 0) * slowdown)
+        yield {'request': record.get('request') or {}, 'response': response}
+
+
+def run(templates, count):
+    before = EndpointProfile("before").add_records(stream(templates, count, 1.0, 1))
+    after = EndpointProfile("after").add_records(stream(templates, count, 1.5, 2))
+    return diff_profiles(before, after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="两次抓包对比的耗时和内存")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, nargs="+", default=[50000, 200000])
+    args = parser.parse_args()
+
+    templates = [record for path in find_capture_files(args.log_dir) for record in iter_capture_file(path)]
+    if not templates:
+        print("未找到日志记录")
+        return
+
+    print(f"{'每份记录数':<12}{'耗时':>10}{'峰值内存':>12}{'接口数':>8}")
+    for count in args.flows:
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = run(templates, count)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{count:<12}{seconds:>9.2f}s{peak / 1024:>10.0f}KB{len(result['endpoints']):>8}")
+
+
+if __name__ == "__main__":
+    main()
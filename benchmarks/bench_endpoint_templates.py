@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口模板归一化耗时对比
+生成N个URL(默认20万个): logs/ 中的真实URL，加上带数字ID、UUID、十六进制ID和时间戳参数的REST风格URL，比较:
+  plain - 每个URL都逐段分类(正则匹配每个路径段)
+  trie  - EndpointTemplates: 前缀树缓存，已出现过的普通路径段直接命中
+并检查两者的模板完全相同，输出模板数和前缀树节点数
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import find_capture_files, iter_capture_file
+from endpoint_templates import EndpointTemplates, normalize_query, normalize_segment, split_url
+
+RESOURCES = ("users", "orders", "files", "shares", "albums", "videos")
+ACTIONS = ("", "/detail", "/comments", "/download", "/thumbnail.jpg")
+
+
+def generate(log_dir, count):
+    real = [record['request'].get('url') for path in find_capture_files(log_dir)
+            for record in iter_capture_file(path) if (record.get('request') or {}).get('url')]
+    rng = random.Random(0)
+    urls = []
+    for i in range(count):
+        if real and i % 4 == 0:
+            urls.append(real[i % len(real)])
+            continue
+        host = f"api{rng.randint(1, 5)}.example.com"
+        resource = rng.choice(RESOURCES)
+        kind = rng.random()
+        if kind < 0.4:
+            item = str(rng.randint(1, 10 ** 7))
+        elif kind < 0.7:
+            item = str(uuid.UUID(int=rng.getrandbits(128)))
+        else:
+            item = f"{rng.getrandbits(96):024x}"
+        urls.append(f"https://{host}/v2/{resource}/{item}{rng.choice(ACTIONS)}"
+                    f"?t={1700000000000 + i}&lang=zh&page={rng.randint(1, 50)}")
+    return urls
+
+
+def plain_template(method, url):
+    host, path, query = split_url(url)
+    return f"{method} {host or 'unknown'}" + "/".join(normalize_segment(s) for s in path.split("/")) + normalize_query(query)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐段分类与前缀树缓存的接口模板归一化")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    args = parser.parse_args()
+
+    urls = generate(args.log_dir, args.flows)
+    print(f"{len(urls)} 个URL, 其中不同URL {len(set(urls))} 个")
+
+    started = time.perf_counter()
+    expected = [plain_template("GET", url) for url in urls]
+    plain_seconds = time.perf_counter() - started
+
+    templates = EndpointTemplates()
+    started = time.perf_counter()
+    result = [templates.template("GET", url) for url in urls]
+    trie_seconds = time.perf_counter() - started
+
+    print(f"plain {plain_seconds:.2f}s ({len(urls) / plain_seconds:,.0f} 个/秒)")
+    print(f"trie  {trie_seconds:.2f}s ({len(urls) / trie_seconds:,.0f} 个/秒), x{plain_seconds / trie_seconds:.1f}")
+    print(f"接口模板 {len(set(result))} 个, 前缀树节点 {templates.nodes} 个"
+          + ("" if result == expected else "  (结果不一致!)"))
+
+
+if __name__ == "__main__":
+    main()
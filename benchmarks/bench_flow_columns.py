@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+总览统计耗时对比
+用 logs/ 中的真实记录循环生成N条流量(默认20万条)，比较:
+  dicts   - 旧版: 逐条遍历记录字典，用三个defaultdict计数(域名/方法/状态码)
+  columns - FlowColumns: 一次投影为列，再计算全部统计
+            (分布、每分钟请求数、各主机流量、主机×状态码、耗时分位数、接口模板)
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import find_capture_files, iter_capture_file
+import flow_columns
+from flow_columns import FlowColumns
+
+
+def load_records(log_dir, count):
+    templates = [record for path in find_capture_files(log_dir) for record in iter_capture_file(path)]
+    return [templates[i % len(templates)] for i in range(count)] if templates else []
+
+
+def dict_summary(records):
+    domains = defaultdict(int)
+    methods = defaultdict(int)
+    status_codes = defaultdict(int)
+    for record in records:
+        request = record.get('request', {})
+        response = record.get('response', {})
+        domains[request.get('host', 'unknown')] += 1
+        methods[request.get('method', 'unknown')] += 1
+        status_codes[response.get('status_code', 'unknown')] += 1
+    return domains, methods, status_codes
+
+
+def column_summary(columns):
+    return (
+        [columns.value_counts(name) for name in ("host", "method", "status")],
+        columns.per_minute(),
+        columns.host_traffic(),
+        columns.status_by_host(),
+        columns.latency_percentiles(),
+        columns.endpoint_stats(),
+    )
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐条计数与列式统计的耗时")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    args = parser.parse_args()
+
+    records = load_records(args.log_dir, args.flows)
+    if not records:
+        print("未找到日志记录")
+        return
+    print(f"{len(records)} 条流量, 列式统计后端: {'numpy' if flow_columns.numpy is not None else 'array'}")
+
+    _, dict_seconds = timed(lambda: dict_summary(records))
+    columns, project_seconds = timed(lambda: FlowColumns.from_records(records))
+    _, aggregate_seconds = timed(lambda: column_summary(columns))
+    _, repeat_seconds = timed(lambda: [columns.value_counts(name) for name in ("host", "method", "status")])
+
+    print(f"\n逐条计数(3项分布)          {dict_seconds * 1000:>10.1f}ms")
+    print(f"投影为列(一次)             {project_seconds * 1000:>10.1f}ms")
+    print(f"列上计算全部统计           {aggregate_seconds * 1000:>10.1f}ms")
+    print(f"列上计算3项分布            {repeat_seconds * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
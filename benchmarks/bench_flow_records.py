@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流量记录内存占用对比
+用 logs/ 中的真实记录循环生成N条流量(默认10万条，每条时间戳不同)，比较:
+  dict    - 旧版: 每条记录是json.loads得到的嵌套字典，头部字符串各自一份
+  compact - FlowRecord + 会话内共享的HeaderTable
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import find_capture_files, iter_capture_file
+from flow_record import FlowRecord, HeaderTable
+
+
+def load_templates(log_dir):
+    """日志中的记录，编码为JSON行作为模板"""
+    templates = []
+    for path in find_capture_files(log_dir):
+        for record in iter_capture_file(path):
+            templates.append(json.dumps(record, ensure_ascii=False))
+    return templates
+
+
+def generate(templates, count):
+    """循环模板生成count条记录，每条都是重新解析出来的(和从日志加载时一样)"""
+    for i in range(count):
+        record = json.loads(templates[i % len(templates)])
+        record.setdefault("request", {})["timestamp"] = f"2024-01-01T00:00:00.{i:06d}"
+        yield record
+
+
+def measure(build):
+    """返回 (构建出的对象占用的字节数, 耗时秒)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比嵌套字典与紧凑记录的内存占用")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=100000)
+    args = parser.parse_args()
+
+    templates = load_templates(args.log_dir)
+    if not templates:
+        print("未找到日志记录")
+        return
+    print(f"模板: {len(templates)} 条记录, 生成 {args.flows} 条流量")
+
+    dict_bytes, dict_seconds = measure(lambda: list(generate(templates, args.flows)))
+
+    table = HeaderTable()
+    compact_bytes, compact_seconds = measure(
+        lambda: (table, [FlowRecord.from_dict(record, table) for record in generate(templates, args.flows)])
+    )
+
+    per_100k = 100000 / args.flows
+    print(f"\n{'':<10}{'总内存':>14}{'每10万条':>14}{'每条':>10}{'加载耗时':>10}")
+    for label, size, seconds in (("dict", dict_bytes, dict_seconds), ("compact", compact_bytes, compact_seconds)):
+        print(f"{label:<10}{size / 1024 / 1024:>12.1f}MB{size * per_100k / 1024 / 1024:>12.1f}MB"
+              f"{size / args.flows:>9.0f}B{seconds:>9.2f}s")
+    print(f"\n紧凑记录节省 {(1 - compact_bytes / dict_bytes) * 100:.0f}% 内存; 头部表: {table.stats()}")
+
+
+if __name__ == "__main__":
+    main()
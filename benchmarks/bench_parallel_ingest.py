@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程并行读取日志的扩展性测试
+用 logs/ 中的真实记录循环生成N条流量(默认20万条)，写入临时目录的多个JSONL文件(默认32个)，
+对不同进程数(默认1,2,4,...直到CPU核数)分别计时:
+  links   - 下载链接提取 (extract_file_links)
+  columns - 总览统计的列投影 (project_capture_file + FlowColumns.extend)
+  index   - 搜索索引扫描 (scan_capture_file)
+并检查各进程数下的结果与单进程完全相同
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import CaptureWriter, find_capture_files, iter_capture_file
+from download_link_extractor import extract_file_links
+from flow_columns import FlowColumns, project_capture_file
+from parallel_ingest import default_workers, map_capture_files
+from search_index import scan_capture_file
+
+
+def generate(log_dir, flows, files):
+    templates = [record for path in find_capture_files(log_dir) for record in iter_capture_file(path)]
+    if not templates:
+        return []
+    paths = []
+    per_file = (flows + files - 1) // files
+    directory = tempfile.mkdtemp(prefix="bench_parallel_")
+    for n in range(files):
+        path = os.path.join(directory, f"api_requests_20240101_000000_{n + 1:04d}.jsonl")
+        with CaptureWriter(path, fsync_policy="none") as writer:
+            writer.write_many(
+                templates[i % len(templates)]
+                for i in range(n * per_file, min(flows, (n + 1) * per_file))
+            )
+        paths.append(path)
+    return paths
+
+
+def run_links(paths, workers):
+    links = []
+    for _, (file_links, _) in map_capture_files(extract_file_links, paths, workers):
+        links.extend(file_links)
+    links.sort(key=lambda link: link.get('timestamp') or '')
+    return [(link['download_url'], link['timestamp']) for link in links]
+
+
+def run_columns(paths, workers):
+    columns = FlowColumns()
+    for _, file_columns in map_capture_files(project_capture_file, paths, workers):
+        columns.extend(file_columns)
+    return columns.value_counts("host"), columns.host_traffic(), columns.latency_percentiles()
+
+
+def run_index(paths, workers):
+    return [count for _, (count, _, _) in map_capture_files(scan_capture_file, paths, workers)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程并行读取日志的扩展性测试")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="要测试的进程数 (默认: 1,2,4,...直到CPU核数)")
+    args = parser.parse_args()
+
+    workers_list = args.workers
+    if not workers_list:
+        workers_list = [1]
+        while workers_list[-1] * 2 <= default_workers():
+            workers_list.append(workers_list[-1] * 2)
+        if workers_list[-1] != default_workers():
+            workers_list.append(default_workers())
+
+    paths = generate(args.log_dir, args.flows, args.files)
+    if not paths:
+        print("未找到日志记录")
+        return
+    print(f"生成 {args.flows} 条流量, {len(paths)} 个文件: {os.path.dirname(paths[0])}, CPU核数 {default_workers()}")
+
+    print(f"\n{'进程数':<8}{'links':>12}{'columns':>12}{'index':>12}")
+    baseline = {}
+    for workers in workers_list:
+        cells = []
+        for name, func in (("links", run_links), ("columns", run_columns), ("index", run_index)):
+            started = time.perf_counter()
+            result = func(paths, workers)
+            seconds = time.perf_counter() - started
+            baseline.setdefault(name, (result, seconds))
+            expected, base_seconds = baseline[name]
+            mark = "" if result == expected else "!"
+            cells.append(f"{seconds:>6.2f}s x{base_seconds / seconds:.1f}{mark}")
+        print(f"{workers:<8}" + "".join(f"{cell:>12}" for cell in cells))
+    print("\n(x为相对单进程的加速比，!表示结果与单进程不一致)")
+
+
+if __name__ == "__main__":
+    main()
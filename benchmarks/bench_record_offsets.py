@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查看单条记录(请求详情)的耗时和内存对比
+用 logs/ 中的真实记录循环生成N条流量(默认20万条)，写入一个临时JSONL文件，
+分别读取开头、中间、最后一条记录，比较:
+  scan    - 旧版: 从头逐条解析到目标记录
+  offsets - RecordOffsets: 偏移索引 + mmap，只解码目标记录(另计第一次建立索引的耗时)
+  gzip    - 分段压缩后通过同一个偏移索引读取(顺序解压，不解析)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import CaptureWriter, compress_file, find_capture_files, iter_capture_file
+from record_offsets import RecordOffsets
+
+
+def generate(log_dir, flows):
+    templates = [record for path in find_capture_files(log_dir) for record in iter_capture_file(path)]
+    if not templates:
+        return None
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_offsets_"), "api_requests_20240101_000000_0001.jsonl")
+    with CaptureWriter(path, fsync_policy="none") as writer:
+        for start in range(0, flows, 10000):
+            writer.write_many([templates[i % len(templates)] for i in range(start, min(flows, start + 10000))])
+    return path
+
+
+def scan(path, ordinal):
+    for n, record in enumerate(iter_capture_file(path)):
+        if n == ordinal:
+            return record
+    return None
+
+
+def read_offsets(path, ordinal):
+    with RecordOffsets(path) as offsets:
+        return offsets.read(ordinal)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐条扫描与偏移索引读取单条记录")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    args = parser.parse_args()
+
+    path = generate(args.log_dir, args.flows)
+    if not path:
+        print("未找到日志记录")
+        return
+    print(f"{args.flows} 条流量, {os.path.getsize(path) / 1024 / 1024:.1f}MB: {path}")
+
+    _, build_seconds, build_peak = measure(lambda: len(RecordOffsets(path)))
+    print(f"建立偏移索引 {build_seconds:.2f}s (峰值内存 {build_peak / 1024:.0f}KB), "
+          f"索引大小 {os.path.getsize(RecordOffsets(path).index_path) / 1024:.0f}KB")
+
+    ordinals = [0, args.flows // 2, args.flows - 1]
+    expected = {}
+    print(f"\n{'记录':<10}{'scan':>18}{'offsets':>22}")
+    for ordinal in ordinals:
+        expected[ordinal], scan_seconds, scan_peak = measure(scan, path, ordinal)
+        record, seconds, peak = measure(read_offsets, path, ordinal)
+        mark = "" if record == expected[ordinal] else "  (结果不一致!)"
+        print(f"#{ordinal:<9}{scan_seconds * 1000:>9.1f}ms {scan_peak / 1024:>5.0f}KB"
+              f"{seconds * 1000:>12.2f}ms {peak / 1024:>5.0f}KB{mark}")
+
+    gz_path = compress_file(path, "gzip")
+    print(f"\n压缩后 {os.path.getsize(gz_path) / 1024 / 1024:.1f}MB，沿用同一个偏移索引:")
+    for ordinal in ordinals:
+        record, seconds, peak = measure(read_offsets, gz_path, ordinal)
+        mark = "" if record == expected[ordinal] else "  (结果不一致!)"
+        print(f"#{ordinal:<9}{'gzip':>18}{seconds * 1000:>12.2f}ms {peak / 1024:>5.0f}KB{mark}")
+
+
+if __name__ == "__main__":
+    main()
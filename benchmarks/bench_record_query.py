@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行查询(log_analyzer.py search)的提前结束
+用 logs/ 中的真实记录循环生成N条流量(默认20万条)，写入一个临时JSONL文件，
+对几个过滤表达式分别计时:
+  limit - 只取前10条 (search --limit 10)，取够后停止读取
+  all   - 取出全部满足条件的记录
+并检查前10条与全部结果的开头一致；每个表达式先运行一次预热(SQLite页缓存)
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import CaptureWriter, find_capture_files, iter_capture_file
+from log_analyzer import LogAnalyzer, paginate
+
+QUERIES = (
+    "",
+    "status=2xx response_size>1000",
+    "host~43.143 endpoint~getlist",
+    "api.php method=GET",
+)
+
+
+def generate(log_dir, flows):
+    templates = [record for path in find_capture_files(log_dir) for record in iter_capture_file(path)]
+    if not templates:
+        return None
+    directory = tempfile.mkdtemp(prefix="bench_query_")
+    path = os.path.join(directory, "api_requests_20240101_000000.jsonl")
+    with CaptureWriter(path, fsync_policy="none") as writer:
+        for start in range(0, flows, 10000):
+            writer.write_many([templates[i % len(templates)] for i in range(start, min(flows, start + 10000))])
+    return path
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行查询取前N条与取全部的耗时对比")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    path = generate(args.log_dir, args.flows)
+    if not path:
+        print("未找到日志记录")
+        return
+    analyzer = LogAnalyzer(os.path.dirname(path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_logs([path])
+        # 第一次查询会建立搜索索引，不计入
+        analyzer._search_index()
+    print(f"{args.flows} 条流量: {path}")
+
+    print(f"\n{'过滤表达式':<36}{'limit':>10}{'all':>10}{'条数':>10}")
+    for query in QUERIES:
+        list(paginate(analyzer.iter_query(query), args.limit))
+        first, limit_seconds = timed(lambda: [n for n, _ in paginate(analyzer.iter_query(query), args.limit)])
+        everything, all_seconds = timed(lambda: [n for n, _ in analyzer.iter_query(query)])
+        mark = "" if first == everything[:args.limit] else "  (结果不一致!)"
+        print(f"{query or '(全部)':<36}{limit_seconds * 1000:>8.1f}ms{all_seconds:>9.2f}s{len(everything):>10}{mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索索引与逐条扫描的查询耗时对比
+用 logs/ 中的真实记录循环生成N条流量(默认20万条，URL中带每条不同的参数)，
+写入临时目录的多个JSONL文件，比较:
+  scan  - 逐条读取并比较 keyword in url.lower() (没有索引时的搜索方式)
+  index - SearchIndex.search (倒排表求交集 + 候选确认)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import CaptureWriter, find_capture_files, iter_capture_file
+from search_index import SearchIndex, INDEX_NAME
+
+QUERIES = [
+    ("api.php", None, None),
+    ("aliyun", None, None),
+    ("gstatic.com/generate_204", None, None),
+    (None, "POST", None),
+    ("api.php", "GET", 200),
+    ("no-such-keyword", None, None),
+]
+
+
+def generate(log_dir, flows, files):
+    templates = [record for path in find_capture_files(log_dir) for record in iter_capture_file(path)]
+    if not templates:
+        return []
+    paths = []
+    per_file = (flows + files - 1) // files
+    directory = tempfile.mkdtemp(prefix="bench_search_")
+    for n in range(files):
+        path = os.path.join(directory, f"api_requests_20240101_000000_{n + 1:04d}.jsonl")
+        with CaptureWriter(path, fsync_policy="none") as writer:
+            batch = []
+            for i in range(n * per_file, min(flows, (n + 1) * per_file)):
+                record = dict(templates[i % len(templates)])
+                request = dict(record.get("request") or {})
+                url = request.get("url") or ""
+                request["url"] = url + ("&" if "?" in url else "?") + f"seq={i}"
+                record["request"] = request
+                batch.append(record)
+            writer.write_many(batch)
+        paths.append(path)
+    return paths
+
+
+def scan(paths, keyword, method, status_code):
+    """没有索引时的搜索: 逐条解析并比较"""
+    keyword = keyword.lower() if keyword else None
+    total = 0
+    for path in paths:
+        for record in iter_capture_file(path):
+            request = record.get("request") or {}
+            response = record.get("response") or {}
+            if keyword and keyword not in (request.get("url") or "").lower() \
+                    and keyword not in (request.get("host") or "").lower():
+                continue
+            if method and (request.get("method") or "").upper() != method.upper():
+                continue
+            if status_code and response.get("status_code") != status_code:
+                continue
+            total += 1
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比搜索索引与逐条扫描的查询耗时")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--flows", type=int, default=200000)
+    parser.add_argument("--files", type=int, default=8)
+    args = parser.parse_args()
+
+    paths = generate(args.log_dir, args.flows, args.files)
+    if not paths:
+        print("未找到日志记录")
+        return
+    directory = os.path.dirname(paths[0])
+    print(f"生成 {args.flows} 条流量, {len(paths)} 个文件: {directory}")
+
+    with SearchIndex(os.path.join(directory, INDEX_NAME)) as index:
+        started = time.perf_counter()
+        index.update(paths)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        index.update(paths)
+        check_seconds = time.perf_counter() - started
+        index_size = os.path.getsize(index.path)
+        print(f"建立索引 {build_seconds:.1f}s, 索引大小 {index_size / 1024 / 1024:.1f}MB, "
+              f"文件未变化时检查 {check_seconds * 1000:.1f}ms")
+
+        print(f"\n{'查询':<34}{'命中':>10}{'scan':>10}{'index':>12}")
+        for keyword, method, status_code in QUERIES:
+            started = time.perf_counter()
+            expected = scan(paths, keyword, method, status_code)
+            scan_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            hits = index.search(paths, keyword, method, status_code)
+            index_seconds = time.perf_counter() - started
+            label = " ".join(str(part) for part in (keyword, method, status_code) if part)
+            mark = "" if len(hits) == expected else "  (结果不一致!)"
+            print(f"{label:<34}{len(hits):>10}{scan_seconds:>9.2f}s{index_seconds * 1000:>10.1f}ms{mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON编码/解码吞吐量对比
+用 logs/ 中的真实记录(循环到N条，默认2万条)比较:
+  pretty  - 旧版保存文件的方式: json.dumps(indent=2, ensure_ascii=False)
+  default - 旧版JSONL行: json.dumps(ensure_ascii=False)
+  compact - 标准库紧凑输出: separators=(',', ':')
+  orjson  - 安装了orjson时的编码器(serialization模块默认使用)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_log import find_capture_files, iter_capture_file
+import serialization
+
+
+def load_records(log_dir, count):
+    records = []
+    for path in find_capture_files(log_dir):
+        records.extend(iter_capture_file(path))
+    if not records:
+        return []
+    return [records[i % len(records)] for i in range(count)]
+
+
+def encoders():
+    """(名称, 编码函数, 解码函数)，编码结果均为UTF-8字节"""
+    result = [
+        ("pretty", lambda r: json.dumps(r, ensure_ascii=False, indent=2).encode('utf-8'), json.loads),
+        ("default", lambda r: json.dumps(r, ensure_ascii=False).encode('utf-8'), json.loads),
+        ("compact", lambda r: json.dumps(r, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+         json.loads),
+    ]
+    if serialization.orjson is not None:
+        orjson = serialization.orjson
+        result.append(("orjson", lambda r: orjson.dumps(r, option=orjson.OPT_NON_STR_KEYS), orjson.loads))
+    return result
+
+
+def best_of(repeat, func):
+    """多次运行取最短耗时(秒)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比JSON编码器的编码/解码吞吐量")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = load_records(args.log_dir, args.records)
+    if not records:
+        print("未找到日志记录")
+        return
+    print(f"{len(records)} 条记录, 取 {args.repeat} 次中最快的一次; serialization后端: {serialization.BACKEND}")
+
+    rows = []
+    for name, encode, decode in encoders():
+        encoded = [encode(r) for r in records]
+        size = sum(len(e) for e in encoded)
+        encode_seconds = best_of(args.repeat, lambda: [encode(r) for r in records])
+        decode_seconds = best_of(args.repeat, lambda: [decode(e) for e in encoded])
+        rows.append((name, size, encode_seconds, decode_seconds))
+
+    baseline = rows[0]
+    print(f"\n{'':<10}{'大小':>10}{'编码':>12}{'编码MB/s':>10}{'解码':>12}{'解码MB/s':>10}{'相对pretty':>12}")
+    for name, size, encode_seconds, decode_seconds in rows:
+        mb = size / 1024 / 1024
+        speedup = (baseline[2] + baseline[3]) / (encode_seconds + decode_seconds)
+        print(f"{name:<10}{mb:>8.1f}MB{encode_seconds:>11.3f}s{mb / encode_seconds:>10.0f}"
+              f"{decode_seconds:>11.3f}s{mb / decode_seconds:>10.0f}{speedup:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
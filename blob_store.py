@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的请求/响应体存储
+较大的body按sha256只保存一次到 logs/blobs/ 下，日志记录中只保留引用，
+相同的响应(例如重复的api.php返回)在所有抓包文件之间自动去重
+"""
+
+import gzip
+import hashlib
+import os
+from serialization import dumps_bytes, loads
+
+# 日志记录中body引用的标记字段
+BLOB_KEY = "$blob"
+BLOB_DIR = "blobs"
+
+
+def is_blob_ref(body):
+    """判断body是否是blob引用"""
+    return isinstance(body, dict) and BLOB_KEY in body
+
+
+class BlobStore:
+    """blob存储目录，文件按 <前两位>/<sha256>[.gz] 存放"""
+
+    def __init__(self, root, threshold=4096, compress=True):
+        self.root = root
+        self.threshold = threshold
+        self.compress = compress
+        self.stored = 0
+        self.deduplicated = 0
+
+    def _path(self, digest, compression):
+        name = digest + (".gz" if compression == "gzip" else "")
+        return os.path.join(self.root, digest[:2], name)
+
+    def externalize(self, body):
+        """body超过阈值时写入blob并返回引用，否则原样返回"""
+        if body is None or is_blob_ref(body):
+            return body
+        if isinstance(body, (dict, list)):
+            kind = "json"
+            data = dumps_bytes(body)
+        elif isinstance(body, str):
+            kind = "text"
+            data = body.encode('utf-8')
+        else:
+            return body
+
+        if self.threshold < 0 or len(data) < self.threshold:
+            return body
+        return self.put(data, kind)
+
+    def put(self, data, kind="text"):
+        """保存数据并返回引用，内容已存在时不重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        compression = "gzip" if self.compress else None
+        path = self._path(digest, compression)
+
+        if os.path.exists(path):
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = gzip.compress(data, compresslevel=6) if compression else data
+            # 先写临时文件再改名，多个进程同时写同一内容也不会产生半个文件
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            self.stored += 1
+
+        return {BLOB_KEY: digest, "kind": kind, "size": len(data), "compression": compression}
+
+    def read_bytes(self, ref):
+        """读取引用对应的原始数据"""
+        digest = ref[BLOB_KEY]
+        compression = ref.get("compression")
+        path = self._path(digest, compression)
+        if not os.path.exists(path):
+            # 兼容用不同压缩设置写入的同一内容
+            compression = None if compression else "gzip"
+            path = self._path(digest, compression)
+        with open(path, 'rb') as f:
+            data = f.read()
+        return gzip.decompress(data) if compression == "gzip" else data
+
+    def resolve(self, body):
+        """把blob引用还原为原来的body，非引用原样返回"""
+        if not is_blob_ref(body):
+            return body
+        try:
+            data = self.read_bytes(body)
+        except OSError as e:
+            return f"<blob读取失败: {body[BLOB_KEY][:12]}... {e}>"
+        if body.get("kind") == "json":
+            return loads(data)
+        return data.decode('utf-8')
+
+
+_stores = {}
+
+
+def store_for_log(log_path=None):
+    """返回日志文件所在目录对应的blob存储(用于读取)，不知道日志文件时使用抓包默认的logs/blobs"""
+    log_dir = os.path.dirname(os.path.abspath(log_path)) if log_path else os.path.abspath("logs")
+    root = os.path.join(log_dir, BLOB_DIR)
+    if root not in _stores:
+        _stores[root] = BlobStore(root)
+    return _stores[root]
+
+
+def resolve_body(body, log_path=None):
+    """按需还原日志记录中的body"""
+    if not is_blob_ref(body):
+        return body
+    return store_for_log(log_path).resolve(body)
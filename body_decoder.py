@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求/响应体的编码与按需解码
+抓包时只保存原始内容(utf-8文本或base64)和Content-Type，
+JSON/表单解析推迟到分析工具真正查看body时进行，解析结果按记录缓存
+"""
+
+import base64
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from blob_store import is_blob_ref, resolve_body
+from serialization import loads
+
+# body_encoding字段的取值
+TEXT_ENCODING = "utf-8"
+BASE64_ENCODING = "base64"
+
+
+def encode_body(content):
+    """抓包时调用: 把原始字节转换为可写入JSON的形式，返回(body, body_encoding)"""
+    if not content:
+        return None, None
+    try:
+        return content.decode('utf-8'), TEXT_ENCODING
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode('ascii'), BASE64_ENCODING
+
+
+def _charset(content_type):
+    """从Content-Type中取出charset"""
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return None
+
+
+def parse_body(body, body_encoding, content_type):
+    """把原始body解析为JSON对象、表单字典或文本"""
+    if body is None:
+        return None
+    content_type = (content_type or '').lower()
+
+    if body_encoding == BASE64_ENCODING:
+        raw = base64.b64decode(body)
+        charset = _charset(content_type)
+        try:
+            text = raw.decode(charset) if charset else None
+        except (LookupError, UnicodeDecodeError):
+            text = None
+        if text is None:
+            return f"<二进制数据: {len(raw)} 字节>"
+    else:
+        text = body
+
+    try:
+        if 'application/json' in content_type:
+            return loads(text)
+        if 'application/x-www-form-urlencoded' in content_type:
+            return dict(parse_qs(text))
+    except Exception as e:
+        return f"<解析失败: {str(e)}>"
+    return text
+
+
+class BodyDecoder:
+    """按需解码日志记录中的body，最近解码过的结果按记录缓存"""
+
+    def __init__(self, max_cached=1024):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, part, log_path=None):
+        """解码记录中的request或response部分的body"""
+        if not part:
+            return None
+        key = id(part)
+        cached = self._cache.get(key)
+        # 缓存中保存了part本身的引用，id不会被其他对象复用
+        if cached is not None and cached[0] is part:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        value = self._decode(part, log_path)
+        self._cache[key] = (part, value)
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return value
+
+    def _decode(self, part, log_path):
+        body = part.get('body')
+        if is_blob_ref(body):
+            body = resolve_body(body, log_path)
+
+        body_encoding = part.get('body_encoding')
+        if body_encoding is None:
+            # 旧版日志在抓包时已经解析过
+            return body
+        return parse_body(body, body_encoding, part.get('content_type'))
+
+
+_default_decoder = BodyDecoder()
+
+
+def decode_body(part, log_path=None):
+    """使用共享的解码器解码body"""
+    return _default_decoder.decode(part, log_path)
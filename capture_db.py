@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite抓包存储
+可选的抓包后端: 记录批量写入WAL模式的SQLite数据库，
+时间(毫秒时间戳)、主机、方法、状态码和URL建索引，URL和文本body建FTS5全文索引，
+分析工具的搜索、详情和链接提取都变成索引查询而不是全量扫描
+
+也可以把已有的JSONL/旧版JSON日志导入数据库:
+    python capture_db.py logs logs/api_requests_all.db
+"""
+
+import glob
+import os
+import sqlite3
+from colorama import Fore, Style
+from capture_log import CAPTURE_PREFIX, find_capture_files, iter_capture_file, ms_to_iso, record_epoch_ms
+from blob_store import is_blob_ref
+from serialization import dumps, loads
+
+DB_EXT = ".db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flows (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    timestamp_ms INTEGER,
+    method TEXT,
+    host TEXT,
+    url TEXT,
+    status_code INTEGER,
+    request_size INTEGER,
+    response_size INTEGER,
+    response_time REAL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_flows_timestamp ON flows(timestamp);
+CREATE INDEX IF NOT EXISTS idx_flows_host ON flows(host);
+CREATE INDEX IF NOT EXISTS idx_flows_method ON flows(method);
+CREATE INDEX IF NOT EXISTS idx_flows_status ON flows(status_code);
+CREATE INDEX IF NOT EXISTS idx_flows_url ON flows(url);
+"""
+
+# 旧数据库补充timestamp_ms列时每批更新的行数
+_MIGRATE_BATCH = 1000
+
+# 优先使用trigram分词(支持任意子串匹配)，旧版SQLite退回默认分词
+_FTS_TOKENIZERS = ("trigram", "unicode61")
+
+# 可以做分组统计的列
+GROUP_COLUMNS = ("host", "method", "status_code")
+
+
+def _fts_phrase(text):
+    """把任意文本转换为FTS5短语查询"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _like_pattern(text):
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _text_body(part):
+    """可以建全文索引的body文本，二进制和存入blob的body不索引"""
+    body = part.get('body')
+    if body is None or is_blob_ref(body):
+        return ""
+    if part.get('body_encoding') is None:
+        # 旧版日志在抓包时已经解析过
+        return body if isinstance(body, str) else dumps(body)
+    if part.get('body_encoding') == "utf-8":
+        return body
+    return ""
+
+
+class CaptureDatabase:
+    """SQLite抓包数据库，写入接口与SegmentedCaptureWriter相同(write_many/close)"""
+
+    def __init__(self, path, fsync_policy="flush", fsync_interval=1.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.records_written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 连接不是线程安全的: 写入和fsync策略的修改都只在后台写入线程中进行，
+        # 关闭在写入线程退出之后由mitmproxy主线程执行
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self.has_timestamp_ms = self._migrate_timestamp_ms()
+        self.fts = self._create_fts()
+        self.fsync_policy = fsync_policy
+
+    def _migrate_timestamp_ms(self):
+        """旧数据库没有timestamp_ms列时补充并回填，返回能否按毫秒时间戳查询(只读的旧数据库不能)"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(flows)")}
+        try:
+            if "timestamp_ms" not in columns:
+                with self._conn:
+                    self._conn.execute("ALTER TABLE flows ADD COLUMN timestamp_ms INTEGER")
+                    last_id = 0
+                    while True:
+                        rows = self._conn.execute(
+                            "SELECT id, record FROM flows WHERE id > ? ORDER BY id LIMIT ?", (last_id, _MIGRATE_BATCH)
+                        ).fetchall()
+                        if not rows:
+                            break
+                        self._conn.executemany(
+                            "UPDATE flows SET timestamp_ms = ? WHERE id = ?",
+                            [(record_epoch_ms(loads(record)) or None, row_id) for row_id, record in rows],
+                        )
+                        last_id = rows[-1][0]
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_flows_timestamp_ms ON flows(timestamp_ms)")
+        except sqlite3.OperationalError:
+            return "timestamp_ms" in columns
+        return True
+
+    def _create_fts(self):
+        """创建全文索引表，返回使用的分词器，不支持FTS5时返回None"""
+        row = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'flows_fts'"
+        ).fetchone()
+        if row:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        for tokenizer in _FTS_TOKENIZERS:
+            try:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE flows_fts USING fts5("
+                    f"url, host, body, content='', tokenize='{tokenizer}')"
+                )
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        return None
+
+    @property
+    def fsync_policy(self):
+        return self._fsync_policy
+
+    @fsync_policy.setter
+    def fsync_policy(self, policy):
+        # WAL模式下NORMAL只在检查点时fsync，always对应每次提交都fsync
+        self._fsync_policy = policy
+        synchronous = {"none": "OFF", "always": "FULL"}.get(policy, "NORMAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+
+    def write_many(self, records):
+        """在一个事务中批量插入记录"""
+        if not records:
+            return
+        with self._conn:
+            for record in records:
+                request = record.get('request', {})
+                response = record.get('response', {})
+                cursor = self._conn.execute(
+                    "INSERT INTO flows (timestamp, timestamp_ms, method, host, url, status_code, request_size,"
+                    " response_size, response_time, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        request.get('timestamp'),
+                        # 与JSONL日志的时间范围查询使用同一个毫秒时间戳，没有时间的记录为NULL
+                        record_epoch_ms(record) or None,
+                        (request.get('method') or '').upper(),
+                        request.get('host'),
+                        request.get('url'),
+                        response.get('status_code'),
+                        request.get('body_size'),
+                        response.get('body_size'),
+                        response.get('response_time'),
+                        dumps(record),
+                    ),
+                )
+                if self.fts:
+                    body = "\n".join(filter(None, (_text_body(request), _text_body(response))))
+                    self._conn.execute(
+                        "INSERT INTO flows_fts (rowid, url, host, body) VALUES (?, ?, ?, ?)",
+                        (cursor.lastrowid, request.get('url') or '', request.get('host') or '', body),
+                    )
+        self.records_written += len(records)
+
+    def write(self, record):
+        self.write_many([record])
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 查询 ----
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM flows").fetchone()[0]
+
+    def get(self, index):
+        """按写入顺序取第index条记录(从1开始)，不存在时返回None"""
+        row = self._conn.execute("SELECT record FROM flows WHERE id = ?", (index,)).fetchone()
+        return loads(row[0]) if row else None
+
+    def _match_clause(self, columns, text):
+        """全文匹配条件: trigram分词支持3个字符以上的任意子串，其余情况退回LIKE"""
+        if self.fts == "trigram" and len(text) >= 3:
+            return (
+                "id IN (SELECT rowid FROM flows_fts WHERE flows_fts MATCH ?)",
+                ["{" + " ".join(columns) + "} : " + _fts_phrase(text)],
+            )
+        if columns == ("body",):
+            if self.fts == "unicode61":
+                # 默认分词器按词匹配
+                return (
+                    "id IN (SELECT rowid FROM flows_fts WHERE flows_fts MATCH ?)",
+                    ["body : " + _fts_phrase(text)],
+                )
+            # body只保存在完整记录中
+            columns = ("record",)
+        return (
+            "(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns) + ")",
+            [_like_pattern(text)] * len(columns),
+        )
+
+    def _where(self, keyword=None, method=None, status_code=None, body_keyword=None, since=None, until=None):
+        clauses, params = [], []
+        if keyword:
+            clause, values = self._match_clause(("url", "host"), keyword)
+            clauses.append(clause)
+            params.extend(values)
+        if body_keyword:
+            clause, values = self._match_clause(("body",), body_keyword)
+            clauses.append(clause)
+            params.extend(values)
+        if method:
+            clauses.append("method = ?")
+            params.append(method.upper())
+        if status_code is not None:
+            clauses.append("status_code = ?")
+            params.append(status_code)
+        # since/until为毫秒时间戳，与timestamp_ms列(带索引)按整数比较；
+        # 无法补充该列的只读旧数据库退回按ISO字符串比较
+        if self.has_timestamp_ms:
+            column, convert = "timestamp_ms", int
+        else:
+            column, convert = "timestamp", ms_to_iso
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(convert(since))
+        if until is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(convert(until))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def search(self, keyword=None, method=None, status_code=None, body_keyword=None,
+               since=None, until=None, limit=None, offset=0):
+        """按条件查询，返回[(序号, 记录), ...]，since/until为毫秒时间戳"""
+        where, params = self._where(keyword, method, status_code, body_keyword, since, until)
+        sql = f"SELECT id, record FROM flows{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [(row[0], loads(row[1])) for row in self._conn.execute(sql, params)]
+
+    def iter_search(self, keyword=None, method=None, status_code=None, body_keyword=None, since=None, until=None):
+        """与search相同的条件，逐条返回 (序号, 记录)，不再需要时停止迭代即可结束查询"""
+        where, params = self._where(keyword, method, status_code, body_keyword, since, until)
+        for row in self._conn.execute(f"SELECT id, record FROM flows{where} ORDER BY id", params):
+            yield row[0], loads(row[1])
+
+    def search_count(self, keyword=None, method=None, status_code=None, body_keyword=None, since=None, until=None):
+        where, params = self._where(keyword, method, status_code, body_keyword, since, until)
+        return self._conn.execute(f"SELECT COUNT(*) FROM flows{where}", params).fetchone()[0]
+
+    def group_counts(self, column):
+        """按列分组计数，按次数倒序"""
+        if column not in GROUP_COLUMNS:
+            raise ValueError(f"不支持按 {column} 分组 (可选: {', '.join(GROUP_COLUMNS)})")
+        return self._conn.execute(
+            f"SELECT {column}, COUNT(*) AS n FROM flows GROUP BY {column} ORDER BY n DESC"
+        ).fetchall()
+
+    def iter_columns(self):
+        """按写入顺序返回统计用的列: (timestamp, method, host, status_code, request_size, response_size, response_time, url)"""
+        return self._conn.execute(
+            "SELECT timestamp, method, host, status_code, request_size, response_size, response_time, url"
+            " FROM flows ORDER BY id"
+        )
+
+    def link_candidates(self, since=None, until=None):
+        """可能包含下载链接的记录: 阿里云盘API请求或body中出现aliyundrive"""
+        if self.fts == "trigram":
+            # 整个条件用一次全文查询完成，再按rowid取记录
+            clause = "id IN (SELECT rowid FROM flows_fts WHERE flows_fts MATCH ?)"
+            params = ['(url : "aliyun" AND url : "api.php") OR body : "aliyundrive"']
+        else:
+            body_clause, params = self._match_clause(("body",), "aliyundrive")
+            clause = f"((url LIKE '%aliyun%' AND url LIKE '%api.php%') OR {body_clause})"
+        where, range_params = self._where(since=since, until=until)
+        sql = f"SELECT id, record FROM flows{where}{' AND' if where else ' WHERE'} {clause} ORDER BY id"
+        params = range_params + params
+        for row in self._conn.execute(sql, params):
+            yield row[0], loads(row[1])
+
+    def iter_records(self, since=None, until=None):
+        """按写入顺序逐条返回记录，since/until(毫秒时间戳)走时间索引"""
+        where, params = self._where(since=since, until=until)
+        for row in self._conn.execute(f"SELECT record FROM flows{where} ORDER BY id", params):
+            yield loads(row[0])
+
+
+def find_capture_databases(log_dir="logs"):
+    """查找目录中的抓包数据库"""
+    return sorted(glob.glob(os.path.join(log_dir, f"{CAPTURE_PREFIX}*{DB_EXT}")))
+
+
+def is_capture_database(path):
+    name = os.path.basename(path)
+    return name.startswith(CAPTURE_PREFIX) and name.endswith(DB_EXT)
+
+
+def import_capture_files(db_path, log_dir="logs", batch_size=1000):
+    """把目录中的JSONL/旧版JSON日志导入数据库，返回导入的记录数"""
+    imported = 0
+    with CaptureDatabase(db_path, fsync_policy="none") as db:
+        if db.count():
+            raise FileExistsError(f"数据库已有记录: {db_path}")
+        for path in find_capture_files(log_dir):
+            batch = []
+            for record in iter_capture_file(path):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    db.write_many(batch)
+                    imported += len(batch)
+                    batch = []
+            db.write_many(batch)
+            imported += len(batch)
+            print(f"{Fore.GREEN}✅ 已导入 {path}{Style.RESET_ALL}")
+    return imported
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把JSONL/旧版JSON抓包日志导入SQLite数据库")
+    parser.add_argument("log_dir", nargs="?", default="logs", help="日志目录 (默认: logs)")
+    parser.add_argument("db_path", nargs="?", default=None,
+                        help=f"数据库文件 (默认: <日志目录>/{CAPTURE_PREFIX}all{DB_EXT})")
+    args = parser.parse_args()
+
+    db_path = args.db_path or os.path.join(args.log_dir, f"{CAPTURE_PREFIX}all{DB_EXT}")
+    try:
+        imported = import_capture_files(db_path, args.log_dir)
+    except FileExistsError as e:
+        print(f"{Fore.YELLOW}⚠️  跳过: {e}{Style.RESET_ALL}")
+        return
+    print(f"📊 共导入 {imported} 条记录到 {db_path}")
+
+
+if __name__ == "__main__":
+    main()
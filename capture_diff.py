@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两次抓包的接口对比
+分别流式读取两份抓包(或同一份抓包的两个时间范围)，按接口模板累计调用次数、错误数、
+收发字节数和耗时直方图，再逐个接口比较: 调用次数变化、耗时分位数变化、body大小变化，
+以及新出现和消失的接口。每个接口只保存计数和一个HDR风格直方图，内存与记录数无关
+"""
+
+from endpoint_templates import EndpointTemplates
+from flow_timing import LatencyHistogram
+
+DIFF_PERCENTILES = (50, 95, 99)
+
+
+class _EndpointStats:
+    """一个接口模板的累计值"""
+
+    __slots__ = ("count", "errors", "request_bytes", "response_bytes", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self, percentiles=DIFF_PERCENTILES):
+        """次数、错误率、平均body大小(字节)和耗时分位数(毫秒，没有耗时时为None)"""
+        result = {
+            "count": self.count,
+            "error_rate": round(self.errors / self.count, 4),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "avg_request_bytes": round(self.request_bytes / self.count, 1),
+            "avg_response_bytes": round(self.response_bytes / self.count, 1),
+        }
+        for p in percentiles:
+            value = self.latency.percentile(p)
+            result[f"p{p}_ms"] = round(value * 1000, 3) if value is not None else None
+        return result
+
+
+class EndpointProfile:
+    """一份抓包按接口模板的统计，用法:
+
+        profile = EndpointProfile("before")
+        profile.add_records(records)
+    """
+
+    def __init__(self, label=None, templates=None):
+        self.label = label
+        self.records = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.endpoints = {}
+        # 两份抓包可以共用同一个前缀树缓存
+        self._templates = templates or EndpointTemplates()
+
+    def add(self, record):
+        """计入一条日志记录字典"""
+        request = record.get('request') or {}
+        response = record.get('response') or {}
+        template = self._templates.template(request.get('method'), request.get('url'), request.get('host'))
+        stats = self.endpoints.get(template)
+        if stats is None:
+            stats = self.endpoints[template] = _EndpointStats()
+        status = response.get('status_code') or 0
+        stats.count += 1
+        stats.errors += status == 0 or status >= 400
+        stats.request_bytes += request.get('body_size') or 0
+        stats.response_bytes += response.get('body_size') or 0
+        stats.latency.record(response.get('response_time'))
+
+        self.records += 1
+        timestamp = request.get('timestamp')
+        if timestamp:
+            if self.first_timestamp is None or timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+
+    def add_records(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def summary(self):
+        return {
+            "label": self.label,
+            "records": self.records,
+            "endpoints": len(self.endpoints),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+        }
+
+
+def _ratio(before, after):
+    """after相对before的变化比例，before为0或缺失时为None"""
+    if before is None or after is None or not before:
+        return None
+    return round(after / before - 1, 4)
+
+
+def _delta(before, after):
+    if before is None or after is None:
+        return None
+    return round(after - before, 4)
+
+
+def diff_profiles(before, after, percentiles=DIFF_PERCENTILES, min_count=1):
+    """比较两份EndpointProfile，返回可直接编码为JSON的字典
+
+    endpoints中每个接口的change为 changed / new / vanished，
+    delta中的 *_change 是相对变化比例(0.25表示增加25%)；
+    调用次数同时按每千条请求的占比比较，两份抓包的长度不同时也可比；
+    两边调用次数都小于min_count的接口不列出，按调用次数变化的绝对值倒序
+    """
+    rows = []
+    for template in before.endpoints.keys() | after.endpoints.keys():
+        old = before.endpoints.get(template)
+        new = after.endpoints.get(template)
+        if max(old.count if old else 0, new.count if new else 0) < min_count:
+            continue
+        old_dict = old.to_dict(percentiles) if old else None
+        new_dict = new.to_dict(percentiles) if new else None
+        row = {
+            "endpoint": template,
+            "change": "changed" if old and new else "new" if new else "vanished",
+            "before": old_dict,
+            "after": new_dict,
+        }
+        if old and new:
+            old_share = old.count * 1000 / before.records
+            new_share = new.count * 1000 / after.records
+            delta = {
+                "count": new.count - old.count,
+                "count_change": _ratio(old.count, new.count),
+                "per_1000_requests": _delta(round(old_share, 4), round(new_share, 4)),
+                "error_rate": _delta(old_dict["error_rate"], new_dict["error_rate"]),
+                "avg_request_bytes": _delta(old_dict["avg_request_bytes"], new_dict["avg_request_bytes"]),
+                "avg_response_bytes": _delta(old_dict["avg_response_bytes"], new_dict["avg_response_bytes"]),
+                "avg_response_bytes_change": _ratio(old_dict["avg_response_bytes"], new_dict["avg_response_bytes"]),
+            }
+            for p in percentiles:
+                key = f"p{p}_ms"
+                delta[key] = _delta(old_dict[key], new_dict[key])
+                delta[f"p{p}_change"] = _ratio(old_dict[key], new_dict[key])
+        else:
+            delta = {"count": new.count if new else -old.count}
+        row["delta"] = delta
+        rows.append(row)
+    rows.sort(key=lambda row: (-abs(row["delta"]["count"]), row["endpoint"]))
+    return {
+        "before": before.summary(),
+        "after": after.summary(),
+        "percentiles": list(percentiles),
+        "totals": {
+            "records": after.records - before.records,
+            "new_endpoints": sum(row["change"] == "new" for row in rows),
+            "vanished_endpoints": sum(row["change"] == "vanished" for row in rows),
+            "changed_endpoints": sum(row["change"] == "changed" for row in rows),
+        },
+        "endpoints": rows,
+    }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓包过滤规则
+按主机、路径前缀、请求方法和Content-Type决定每个请求的处理方式:
+  keep    - 完整记录(请求体和响应体)
+  headers - 只记录请求行、头部和大小，不保存body
+  drop    - 完全不处理
+规则按顺序匹配，第一条命中的规则生效；都不命中时使用default
+"""
+
+import json
+import re
+
+ACTIONS = ("keep", "headers", "drop")
+# 规则文件没有写default时与不使用规则相同，完整记录
+DEFAULT_ACTION = "keep"
+
+
+class FilterRule:
+    """一条过滤规则"""
+
+    __slots__ = ("name", "action", "host", "path_prefix", "methods", "content_types", "hits")
+
+    def __init__(self, name, action, host=None, path_prefix=None, method=None, content_type=None):
+        if action not in ACTIONS:
+            raise ValueError(f"规则 {name} 的action无效: {action} (可选: {', '.join(ACTIONS)})")
+        self.name = name
+        self.action = action
+        self.host = host.lower().lstrip('*.') if host else None
+        self.path_prefix = path_prefix
+        self.methods = frozenset(m.upper() for m in _as_list(method)) or None
+        self.content_types = tuple(c.lower() for c in _as_list(content_type)) or None
+        self.hits = 0
+
+    @classmethod
+    def from_dict(cls, data, index):
+        return cls(
+            name=data.get("name", f"rule{index + 1}"),
+            action=data.get("action", "keep"),
+            host=data.get("host"),
+            path_prefix=data.get("path_prefix"),
+            method=data.get("method"),
+            content_type=data.get("content_type"),
+        )
+
+
+def _as_list(value):
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class _HostTrie:
+    """按域名标签倒序组织的后缀树，规则host=example.com同时匹配example.com及其子域名"""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, host, rule_index):
+        node = self.root
+        for label in reversed(host.split('.')):
+            node = node.setdefault(label, {})
+        node.setdefault(None, []).append(rule_index)
+
+    def lookup(self, host):
+        """返回所有host后缀命中的规则下标"""
+        matched = []
+        node = self.root
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            matched.extend(node.get(None, ()))
+        return matched
+
+
+class CaptureFilter:
+    """编译后的规则集"""
+
+    def __init__(self, rules, default=DEFAULT_ACTION):
+        if default not in ACTIONS:
+            raise ValueError(f"default无效: {default} (可选: {', '.join(ACTIONS)})")
+        self.rules = rules
+        self.default = default
+        self.default_hits = 0
+        self.has_content_type_rules = any(rule.content_types for rule in rules)
+
+        # 主机条件编入后缀树，不限主机的规则单独列出
+        self._host_trie = _HostTrie()
+        self._any_host = []
+        for index, rule in enumerate(rules):
+            if rule.host:
+                self._host_trie.add(rule.host, index)
+            else:
+                self._any_host.append(index)
+
+        # 所有路径前缀合并成一个正则: 每个前缀是一个可选的前瞻分组，
+        # 一次match就能得到所有命中的前缀
+        self._prefix_group = {}
+        groups = []
+        for index, rule in enumerate(rules):
+            if rule.path_prefix is not None:
+                self._prefix_group[index] = len(groups) + 1
+                groups.append(f"(?:(?=({re.escape(rule.path_prefix)})))?")
+        self._prefix_regex = re.compile("".join(groups)) if groups else None
+
+    @classmethod
+    def from_dict(cls, data):
+        rules = [FilterRule.from_dict(item, i) for i, item in enumerate(data.get("rules", []))]
+        return cls(rules, data.get("default", DEFAULT_ACTION))
+
+    @classmethod
+    def from_file(cls, path):
+        """从JSON规则文件加载"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def match_rule(self, host, path, method, content_type=""):
+        """返回第一条命中的规则，没有则返回None(不计数)"""
+        candidates = self._host_trie.lookup(host.lower()) if host else []
+        if self._any_host:
+            candidates = sorted(candidates + self._any_host)
+        elif len(candidates) > 1:
+            candidates.sort()
+        if not candidates:
+            return None
+
+        prefix_match = self._prefix_regex.match(path) if self._prefix_regex else None
+        method = method.upper()
+        content_type = (content_type or "").lower()
+        for index in candidates:
+            rule = self.rules[index]
+            if rule.path_prefix is not None and prefix_match.group(self._prefix_group[index]) is None:
+                continue
+            if rule.methods and method not in rule.methods:
+                continue
+            if rule.content_types and not content_type.startswith(rule.content_types):
+                continue
+            return rule
+        return None
+
+    def match(self, host, path, method, content_type=""):
+        """返回处理方式(keep/headers/drop)并更新命中计数"""
+        rule = self.match_rule(host, path, method, content_type)
+        self.count(rule)
+        return self.action(rule)
+
+    def action(self, rule):
+        """规则的处理方式，None为default"""
+        return self.default if rule is None else rule.action
+
+    def count(self, rule, delta=1):
+        """计入(delta=-1时撤销)一次命中，rule为None时计入default"""
+        if rule is None:
+            self.default_hits += delta
+        else:
+            rule.hits += delta
+
+    def rematch(self, previous, host, path, method, content_type):
+        """拿到响应的Content-Type后重新匹配，只有带content_type条件的规则会改变处理方式
+
+        previous是请求阶段匹配并已计数的规则；命中新规则时把这次计数移过去，
+        每个请求只计一次。返回新规则，处理方式不变时返回None
+        """
+        rule = self.match_rule(host, path, method, content_type)
+        if rule is None or not rule.content_types or rule is previous:
+            return None
+        self.count(previous, -1)
+        self.count(rule)
+        return rule
+
+    def stats(self):
+        """各规则命中次数"""
+        result = [(rule.name, rule.action, rule.hits) for rule in self.rules]
+        result.append(("(default)", self.default, self.default_hits))
+        return result
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓包日志读写工具
+以追加写入的JSONL格式(每行一条请求/响应记录)保存抓包数据，
+支持按大小/时间切分为压缩分段并用清单文件记录每个分段的时间范围，
+同时兼容旧版整体JSON数组格式的日志文件
+"""
+
+import gzip
+import io
+import json
+import os
+import glob
+import re
+import time
+from datetime import date, datetime
+from colorama import init, Fore, Style
+from serialization import dump_file, dumps_line, load_file, loads
+
+init()
+
+# 日志文件名前缀与扩展名
+CAPTURE_PREFIX = "api_requests_"
+JSONL_EXT = ".jsonl"
+LEGACY_EXT = ".json"
+MANIFEST_SUFFIX = ".manifest.json"
+
+# 分段压缩格式及扩展名，zstd需要安装zstandard，否则退回gzip
+COMPRESSION_EXTS = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# fsync策略:
+#   none     - 只写入操作系统缓冲区，由系统决定何时落盘
+#   flush    - 每条记录后flush到操作系统(默认，进程崩溃不丢数据)
+#   interval - 每条记录flush，并且至少每隔fsync_interval秒fsync一次
+#   always   - 每条记录后都fsync(最安全，最慢)
+FSYNC_POLICIES = ("none", "flush", "interval", "always")
+
+
+def iso_to_ms(timestamp):
+    """ISO时间字符串(本地时间)转为毫秒时间戳，无法解析时返回0"""
+    if not timestamp:
+        return 0
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return 0
+
+
+def ms_to_iso(ms):
+    """毫秒时间戳转为与日志记录相同格式的ISO时间字符串(本地时间)"""
+    return datetime.fromtimestamp(ms / 1000).isoformat()
+
+
+def record_epoch_ms(record):
+    """记录的请求时间(毫秒时间戳)，没有时间的记录返回0
+
+    新记录直接读取request.timestamp_ms，旧记录解析ISO时间字符串
+    """
+    request = record.get("request") or {}
+    ms = request.get("timestamp_ms")
+    if ms is not None:
+        return ms
+    return iso_to_ms(request.get("timestamp"))
+
+
+_CLOCK_RE = re.compile(r"^\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?$")
+
+
+def parse_time_bound(text, end=False):
+    """把命令行/菜单中输入的时间解析为毫秒时间戳(本地时间)
+
+    支持 2025-05-28T17:16[:SS]、2025-05-28 17:16、2025-05-28、17:16[:SS](今天)以及秒或毫秒时间戳；
+    end为True(时间范围的结束)时，没有写出的更小单位取到该时间段的最后一刻，
+    例如 --until 17:19 包含 17:19:59.999，--until 2025-05-28 包含当天全天。
+    格式错误时抛出ValueError
+    """
+    text = text.strip()
+    if text.isdigit():
+        value = int(text)
+        # 10^11毫秒约为1973年，更小的数按秒处理
+        return value if value >= 10 ** 11 else value * 1000
+    if _CLOCK_RE.match(text):
+        text = f"{date.today().isoformat()}T{text}"
+    ms = int(datetime.fromisoformat(text).timestamp() * 1000)
+    if end:
+        clock = text[11:]
+        if not clock:
+            ms += 24 * 3600 * 1000 - 1
+        elif clock.count(":") == 1:
+            ms += 60 * 1000 - 1
+        elif "." not in clock:
+            ms += 999
+    return ms
+
+
+def parse_until_bound(text):
+    """时间范围结束的命令行参数(--until)"""
+    return parse_time_bound(text, end=True)
+
+
+class CaptureWriter:
+    """追加写入的JSONL抓包日志写入器，每条记录的写入开销与已有日志大小无关"""
+
+    def __init__(self, path, fsync_policy="flush", fsync_interval=1.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"未知的fsync策略: {fsync_policy} (可选: {', '.join(FSYNC_POLICIES)})")
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.records_written = 0
+        self.bytes_written = 0
+        self._last_fsync = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 以二进制追加方式打开，便于统计字节偏移
+        self._file = open(path, 'ab')
+        self.start_offset = self._file.tell()
+
+    @staticmethod
+    def encode(record):
+        """把一条记录编码为一行UTF-8字节"""
+        return dumps_line(record)
+
+    def write(self, record):
+        """追加一条记录"""
+        self.write_lines([self.encode(record)])
+
+    def write_many(self, records):
+        """批量追加多条记录，只做一次flush/fsync"""
+        self.write_lines([self.encode(record) for record in records])
+
+    def write_lines(self, lines):
+        """追加已编码的行"""
+        if not lines:
+            return
+        data = b"".join(lines)
+        self._file.write(data)
+        self.records_written += len(lines)
+        self.bytes_written += len(data)
+        self._sync()
+
+    def _sync(self):
+        """按fsync策略刷新数据"""
+        if self.fsync_policy == "none":
+            return
+        self._file.flush()
+        if self.fsync_policy == "always":
+            os.fsync(self._file.fileno())
+        elif self.fsync_policy == "interval":
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def flush(self):
+        """强制刷新并落盘"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync_policy != "none":
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """关闭写入器"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SegmentedCaptureWriter:
+    """按大小或时间自动切分的JSONL写入器
+
+    分段文件名为 <base>_0001.jsonl，写满后关闭并压缩为 .jsonl.gz / .jsonl.zst，
+    <base>.manifest.json 记录每个分段的时间范围、记录数和字节偏移，pretty为True时清单缩进输出
+    """
+
+    def __init__(self, base_path, max_bytes=64 * 1024 * 1024, max_seconds=0, compression="gzip",
+                 fsync_policy="flush", fsync_interval=1.0, pretty=False):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"未知的压缩格式: {compression} (可选: {', '.join(COMPRESSIONS)})")
+        if compression == "zstd" and zstandard is None:
+            print(f"{Fore.YELLOW}⚠️  未安装zstandard，分段改用gzip压缩{Style.RESET_ALL}")
+            compression = "gzip"
+
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.pretty = pretty
+        self._fsync_policy = fsync_policy
+        self._fsync_interval = fsync_interval
+
+        self.manifest_path = base_path + MANIFEST_SUFFIX
+        self.manifest = {"session": os.path.basename(base_path), "segments": []}
+        self.records_written = 0
+        self._offset = 0
+        self._sequence = 0
+        self._current = None
+        self._opened_at = None
+        self._first_timestamp = None
+        self._last_timestamp = None
+        self._first_ms = None
+        self._last_ms = None
+        self._resume()
+
+    def _resume(self):
+        """同名会话已有分段时(例如崩溃后重启的工作进程)，从已有清单和最大分段序号之后继续"""
+        try:
+            manifest = load_file(self.manifest_path)
+            self.manifest["segments"] = manifest.get("segments", [])
+        except (OSError, ValueError):
+            pass
+        if self.manifest["segments"]:
+            self._offset = self.manifest["segments"][-1].get("offset_end", 0)
+        prefix = os.path.basename(self.base_path) + "_"
+        for path in glob.glob(glob.escape(self.base_path) + "_*" + JSONL_EXT + "*"):
+            # 偏移索引等附属文件(xxx_0001.jsonl.offsets)不是分段
+            if not is_capture_file(path):
+                continue
+            sequence = os.path.basename(path)[len(prefix):].split('.')[0]
+            if sequence.isdigit():
+                self._sequence = max(self._sequence, int(sequence))
+
+    @property
+    def fsync_policy(self):
+        return self._fsync_policy
+
+    @fsync_policy.setter
+    def fsync_policy(self, value):
+        self._fsync_policy = value
+        if self._current:
+            self._current.fsync_policy = value
+
+    @property
+    def fsync_interval(self):
+        return self._fsync_interval
+
+    @fsync_interval.setter
+    def fsync_interval(self, value):
+        self._fsync_interval = value
+        if self._current:
+            self._current.fsync_interval = value
+
+    @property
+    def current_path(self):
+        """正在写入的分段文件路径"""
+        return self._current.path if self._current else None
+
+    def _open_segment(self):
+        self._sequence += 1
+        path = f"{self.base_path}_{self._sequence:04d}{JSONL_EXT}"
+        self._current = CaptureWriter(path, self._fsync_policy, self._fsync_interval)
+        self._opened_at = time.monotonic()
+        self._first_timestamp = None
+        self._last_timestamp = None
+        self._first_ms = None
+        self._last_ms = None
+
+    def write(self, record):
+        """追加一条记录"""
+        self.write_many([record])
+
+    def write_many(self, records):
+        """批量追加记录，写满后切换到新分段
+
+        每条记录编码后都检查是否写满，一批记录(后台线程一次最多几百条)可以跨越多个分段，
+        分段大小最多超出max_bytes一条记录；同一分段内的记录仍然一次写入、一次flush
+        """
+        lines = []
+        pending = 0
+        for record in records:
+            if self._current is None:
+                self._open_segment()
+            self._track_time(record)
+            line = CaptureWriter.encode(record)
+            lines.append(line)
+            pending += len(line)
+            if self._should_rotate(pending):
+                self._write_lines(lines)
+                lines, pending = [], 0
+                self._close_segment()
+        self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if lines:
+            self._current.write_lines(lines)
+            self.records_written += len(lines)
+
+    def _track_time(self, record):
+        """更新当前分段的时间范围"""
+        # ISO时间字符串格式一致，直接按字符串比较大小
+        timestamp = record.get("request", {}).get("timestamp")
+        if timestamp:
+            if self._first_timestamp is None or timestamp < self._first_timestamp:
+                self._first_timestamp = timestamp
+            if self._last_timestamp is None or timestamp > self._last_timestamp:
+                self._last_timestamp = timestamp
+        ms = record_epoch_ms(record)
+        if ms:
+            if self._first_ms is None or ms < self._first_ms:
+                self._first_ms = ms
+            if self._last_ms is None or ms > self._last_ms:
+                self._last_ms = ms
+
+    def _should_rotate(self, pending=0):
+        """当前分段加上还未写入的pending字节后是否需要切换"""
+        if self.max_bytes and self._current.bytes_written + pending >= self.max_bytes:
+            return True
+        return bool(self.max_seconds) and time.monotonic() - self._opened_at >= self.max_seconds
+
+    def _close_segment(self):
+        """关闭并压缩当前分段，更新清单"""
+        writer = self._current
+        self._current = None
+        writer.close()
+        if writer.records_written == 0:
+            os.remove(writer.path)
+            return
+
+        path = compress_file(writer.path, self.compression)
+        self.manifest["segments"].append({
+            "file": os.path.basename(path),
+            "compression": self.compression,
+            "flows": writer.records_written,
+            "first_timestamp": self._first_timestamp,
+            "last_timestamp": self._last_timestamp,
+            "first_ms": self._first_ms,
+            "last_ms": self._last_ms,
+            "offset_start": self._offset,
+            "offset_end": self._offset + writer.bytes_written,
+            "size": writer.bytes_written,
+            "stored_size": os.path.getsize(path),
+        })
+        self._offset += writer.bytes_written
+        self._save_manifest()
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        dump_file(self.manifest, tmp_path, self.pretty)
+        os.replace(tmp_path, self.manifest_path)
+
+    def flush(self):
+        if self._current:
+            self._current.flush()
+
+    def close(self):
+        """关闭写入器，最后一个分段也会被压缩并写入清单"""
+        if self._current:
+            self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def compress_file(path, compression):
+    """压缩分段文件并删除原文件，返回压缩后的路径"""
+    if compression == "none":
+        return path
+    target = path + COMPRESSION_EXTS[compression]
+    tmp_path = target + ".tmp"
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        if compression == "zstd":
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6) as gz:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    gz.write(chunk)
+    os.replace(tmp_path, target)
+    os.remove(path)
+    return target
+
+
+def open_capture_text(path):
+    """以文本方式打开(可能已压缩的)日志文件"""
+    if path.endswith(COMPRESSION_EXTS["gzip"]):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith(COMPRESSION_EXTS["zstd"]):
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要安装zstandard: pip install zstandard")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def open_capture_binary(path):
+    """以二进制方式打开(可能已压缩的)日志文件，读到的是解压后的原始字节，支持按行迭代"""
+    if path.endswith(COMPRESSION_EXTS["gzip"]):
+        return gzip.open(path, 'rb')
+    if path.endswith(COMPRESSION_EXTS["zstd"]):
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要安装zstandard: pip install zstandard")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    return open(path, 'rb')
+
+
+def load_manifests(log_dir="logs"):
+    """读取目录中所有分段清单，返回 {分段文件名: 分段信息}"""
+    segments = {}
+    for manifest_path in glob.glob(os.path.join(log_dir, f"{CAPTURE_PREFIX}*{MANIFEST_SUFFIX}")):
+        try:
+            manifest = load_file(manifest_path)
+        except (OSError, ValueError):
+            continue
+        for segment in manifest.get("segments", []):
+            segments[segment["file"]] = segment
+    return segments
+
+
+def _segment_overlaps(segment, since, until):
+    """分段时间范围是否与[since, until](毫秒时间戳，None表示不限)有交集
+
+    旧版清单没有first_ms/last_ms，按ISO时间换算
+    """
+    first = segment.get("first_ms") or iso_to_ms(segment.get("first_timestamp"))
+    last = segment.get("last_ms") or iso_to_ms(segment.get("last_timestamp"))
+    if since is not None and last and last < since:
+        return False
+    if until is not None and first and first > until:
+        return False
+    return True
+
+
+def find_capture_files(log_dir="logs", since=None, until=None):
+    """查找目录中的所有抓包日志文件(JSONL分段和旧版JSON)，按文件名中的时间排序
+
+    指定since/until(毫秒时间戳)时，根据清单跳过时间范围不相交的分段；
+    不在清单中的文件(正在写入的分段、旧版文件)总是返回
+    """
+    files = []
+    for ext in [JSONL_EXT] + [JSONL_EXT + c for c in COMPRESSION_EXTS.values()]:
+        files.extend(glob.glob(os.path.join(log_dir, f"{CAPTURE_PREFIX}*{ext}")))
+    converted = {os.path.splitext(p)[0] for p in files}
+    for path in glob.glob(os.path.join(log_dir, f"{CAPTURE_PREFIX}*{LEGACY_EXT}")):
+        # 清单、统计等附属文件(xxx.manifest.json)不是日志
+        if not _is_legacy_name(os.path.basename(path)):
+            continue
+        # 已经转换过的旧版文件不重复读取
+        if os.path.splitext(path)[0] not in converted:
+            files.append(path)
+
+    if since is not None or until is not None:
+        segments = load_manifests(log_dir)
+        files = [
+            p for p in files
+            if os.path.basename(p) not in segments
+            or _segment_overlaps(segments[os.path.basename(p)], since, until)
+        ]
+    return sorted(files, key=capture_file_order)
+
+
+def _is_legacy_name(name):
+    """旧版日志文件名只有一个扩展名: api_requests_YYYYMMDD_HHMMSS.json"""
+    return name.endswith(LEGACY_EXT) and name.count('.') == 1
+
+
+_SESSION_RE = re.compile(rf"^({re.escape(CAPTURE_PREFIX)}\d{{8}}_\d{{6}})")
+
+
+def capture_session(path):
+    """日志文件所属的抓包会话(api_requests_YYYYMMDD_HHMMSS)，多个工作进程的分段属于同一会话"""
+    name = os.path.basename(path)
+    match = _SESSION_RE.match(name)
+    return match.group(1) if match else name.split('.')[0]
+
+
+def session_capture_files(log_dir, session, since=None, until=None):
+    """某个抓包会话的所有日志文件(所有工作进程、所有分段)"""
+    return [p for p in find_capture_files(log_dir, since, until) if capture_session(p) == session]
+
+
+def capture_file_order(path):
+    """日志文件的读取顺序: 依次按会话、工作进程、分段排列"""
+    return (os.path.basename(path).split('.')[0], path)
+
+
+def iter_capture_files(paths, reader=None):
+    """按读取顺序(capture_file_order)逐条读取多个日志文件，同一时刻只打开一个文件
+
+    每个文件内的记录是写入(响应完成)顺序，请求时间只是大致有序，所以同一会话的多个工作进程的日志
+    依次读取，不按请求时间交错归并。搜索结果和请求详情的记录序号按同样的顺序编号，
+    总览、导出和序号在各个命令之间一致；reader(path)返回文件中要读取的记录，默认为iter_capture_file
+    """
+    reader = reader or iter_capture_file
+    for path in sorted(paths, key=capture_file_order):
+        yield from reader(path)
+
+
+def is_capture_file(filename):
+    """判断文件名是否为抓包日志文件"""
+    name = os.path.basename(filename)
+    if not name.startswith(CAPTURE_PREFIX):
+        return False
+    return _is_legacy_name(name) or name.endswith(JSONL_EXT) or any(
+        name.endswith(JSONL_EXT + ext) for ext in COMPRESSION_EXTS.values()
+    )
+
+
+def iter_json_array(f, chunk_size=64 * 1024):
+    """增量解析文本文件中的JSON数组，逐个返回元素，只在内存中保留当前元素和一个读取块
+
+    文件被截断时返回截断处之前的完整元素
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        # 跳过空白和元素之间的分隔符
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','
+                                     or (not started and buffer[pos] == '[')):
+            started = started or buffer[pos] == '['
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        if pos < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                end = None
+            # 解析到缓冲区末尾的值可能还没读完(例如被截断的数字)，读入更多内容后再确认
+            if end is not None and (end < len(buffer) or eof):
+                yield item
+                pos = end
+                continue
+            if eof:
+                return
+        elif eof:
+            return
+        # 一个元素跨越多个块时按已缓冲的长度加倍读取，避免反复从头解析大元素
+        chunk = f.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_capture_file(path):
+    """逐条读取抓包日志文件中的记录，自动识别JSONL(含压缩分段)和旧版JSON数组格式
+
+    不是对象的值(例如误转换的附属文件中的字符串)不是记录，跳过
+    """
+    if path.endswith(LEGACY_EXT):
+        # 旧版文件可能有几百MB，增量解析而不是整体读入
+        with open(path, 'r', encoding='utf-8') as f:
+            for record in iter_json_array(f):
+                if isinstance(record, dict):
+                    yield record
+        return
+
+    with open_capture_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = loads(line)
+            except ValueError:
+                # 进程被强制结束时最后一行可能不完整，跳过
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def load_capture_file(path):
+    """读取整个抓包日志文件为列表"""
+    return list(iter_capture_file(path))
+
+
+def convert_legacy_file(json_path, remove_original=False):
+    """把旧版JSON数组日志转换为JSONL格式，返回新文件路径"""
+    jsonl_path = json_path[:-len(LEGACY_EXT)] + JSONL_EXT
+    if os.path.exists(jsonl_path):
+        raise FileExistsError(f"目标文件已存在: {jsonl_path}")
+
+    data = load_file(json_path)
+    if not isinstance(data, list):
+        raise ValueError(f"不是旧版JSON数组日志: {json_path}")
+
+    # 先写入临时文件再改名，避免中途失败留下半个文件
+    tmp_path = jsonl_path + ".tmp"
+    with CaptureWriter(tmp_path, fsync_policy="none") as writer:
+        writer.write_many(record for record in data if isinstance(record, dict))
+    os.replace(tmp_path, jsonl_path)
+
+    if remove_original:
+        os.remove(json_path)
+    return jsonl_path
+
+
+def convert_legacy_logs(log_dir="logs", remove_original=False):
+    """转换目录中所有旧版JSON数组日志"""
+    pattern = os.path.join(log_dir, f"{CAPTURE_PREFIX}*{LEGACY_EXT}")
+    converted = []
+    for json_path in sorted(glob.glob(pattern)):
+        # 清单、延迟统计等附属文件(xxx.manifest.json)不是日志
+        if not _is_legacy_name(os.path.basename(json_path)):
+            continue
+        try:
+            jsonl_path = convert_legacy_file(json_path, remove_original)
+            converted.append(jsonl_path)
+            print(f"{Fore.GREEN}✅ {json_path} -> {jsonl_path}{Style.RESET_ALL}")
+        except FileExistsError as e:
+            print(f"{Fore.YELLOW}⚠️  跳过: {e}{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}❌ 转换失败 {json_path}: {e}{Style.RESET_ALL}")
+    return converted
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把旧版JSON数组抓包日志转换为JSONL格式")
+    parser.add_argument("log_dir", nargs="?", default="logs", help="日志目录 (默认: logs)")
+    parser.add_argument("--remove-original", action="store_true", help="转换成功后删除原JSON文件")
+    args = parser.parse_args()
+
+    converted = convert_legacy_logs(args.log_dir, args.remove_original)
+    print(f"📊 共转换 {len(converted)} 个文件")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@
 从API抓取日志中提取真实的下载链接并验证可用性
 """
 
+import argparse
+import functools
 import json
 import os
 import requests
@@ -12,16 +14,60 @@ import urllib.parse
 from datetime import datetime
 from colorama import init, Fore, Style
 import re
+from capture_log import find_capture_files, iter_capture_file, parse_time_bound, parse_until_bound
+from body_decoder import decode_body
+from link_rules import extract_link, iter_link_stream
+from capture_db import CaptureDatabase, find_capture_databases
+from serialization import dump_file
+from parallel_ingest import map_capture_files
+from record_offsets import iter_records_between
 
 # 初始化colorama
 init()
 
+def iter_links(entries, log_path=None):
+    """从记录中提取下载链接(规则与代理实时提取共用)"""
+    for entry in entries:
+        if 'response' not in entry or 'body' not in entry['response']:
+            continue
+        try:
+            # body在这里才解码(包括读取blob)
+            response_body = decode_body(entry['response'], log_path)
+            link_info = extract_link(entry['request'], response_body)
+        except Exception:
+            continue  # 跳过无法解析的响应
+        if link_info:
+            yield link_info
+
+
+def extract_file_links(file_path, since=None, until=None):
+    """提取单个日志文件中的下载链接，在进程池中运行，返回 (链接列表, 错误信息)
+
+    指定since/until(毫秒时间戳)时通过偏移索引只读取时间范围内的记录
+    """
+    links = []
+    try:
+        if since is None and until is None:
+            entries = iter_capture_file(file_path)
+        else:
+            entries = (record for _, record in iter_records_between(file_path, since, until))
+        for link_info in iter_links(entries, file_path):
+            links.append(link_info)
+    except Exception as e:
+        # 文件中途损坏时保留已经读到的部分
+        return links, str(e)
+    return links, None
+
+
 class DownloadLinkExtractor:
     def __init__(self):
         self.download_links = []
         
-    def extract_from_logs(self, log_directory="logs"):
-        """从日志文件中提取下载链接"""
+    def extract_from_logs(self, log_directory="logs", since=None, until=None, workers=None):
+        """从日志文件中提取下载链接，指定since/until(毫秒时间戳)时跳过时间范围外的分段和记录
+
+        多个日志文件由workers个进程并行解析(默认CPU核数)，找到的链接按时间排序
+        """
         print(f"{Fore.GREEN}🔍 开始从日志中提取下载链接{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
         
@@ -29,80 +75,49 @@ class DownloadLinkExtractor:
             print(f"{Fore.RED}❌ 日志目录不存在: {log_directory}{Style.RESET_ALL}")
             return []
         
-        # 查找所有JSON日志文件
-        json_files = [f for f in os.listdir(log_directory) if f.startswith('api_requests_') and f.endswith('.json')]
+        # 查找所有日志文件(JSONL和旧版JSON)以及SQLite抓包数据库
+        log_files = find_capture_files(log_directory, since, until)
+        databases = find_capture_databases(log_directory)
         
-        if not json_files:
+        if not log_files and not databases:
             print(f"{Fore.YELLOW}⚠️  未找到API请求日志文件{Style.RESET_ALL}")
             return []
         
-        for json_file in json_files:
-            file_path = os.path.join(log_directory, json_file)
-            print(f"\n📄 分析文件: {json_file}")
-            self._process_log_file(file_path)
+        found = []
+        extract = functools.partial(extract_file_links, since=since, until=until)
+        for file_path, (links, error) in map_capture_files(extract, log_files, workers):
+            print(f"📄 分析文件: {os.path.basename(file_path)} ({len(links)} 个链接)")
+            if error:
+                print(f"{Fore.RED}❌ 读取文件失败 {file_path}: {error}{Style.RESET_ALL}")
+            found.extend(links)
         
+        for db_path in databases:
+            print(f"📄 分析数据库: {os.path.basename(db_path)}")
+            found.extend(self._process_database(db_path, since, until))
+        
+        # 稳定排序: 时间相同的链接保持文件顺序，结果与进程数无关
+        found.sort(key=lambda link_info: link_info['timestamp'] or '')
+        for link_info in found:
+            self.download_links.append(link_info)
+            self._display_found_link(link_info)
         return self.download_links
     
-    def _process_log_file(self, file_path):
-        """处理单个日志文件"""
+    def _process_database(self, db_path, since=None, until=None):
+        """数据库中只取出可能包含下载链接的记录(URL条件+全文索引)"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            for entry in data:
-                if 'response' in entry and 'body' in entry['response']:
-                    self._extract_download_urls(entry)
-                    
+            with CaptureDatabase(db_path) as db:
+                return list(iter_links((entry for _, entry in db.link_candidates(since, until)), db_path))
         except Exception as e:
-            print(f"{Fore.RED}❌ 读取文件失败 {file_path}: {str(e)}{Style.RESET_ALL}")
+            print(f"{Fore.RED}❌ 读取数据库失败 {db_path}: {str(e)}{Style.RESET_ALL}")
+            return []
     
-    def _extract_download_urls(self, entry):
-        """从响应中提取下载URL"""
-        try:
-            response_body = entry['response']['body']
-            request_url = entry['request']['url']
-            
-            # 检查是否是阿里云盘API响应
-            if ('aliyun' in request_url and 'api.php' in request_url) or \
-               ('aliyundrive' in str(response_body)):
-                
-                download_url = None
-                file_info = {}
-                
-                # 解析JSON响应
-                if isinstance(response_body, dict):
-                    # 直接是字典格式
-                    if 'url' in response_body:
-                        download_url = response_body['url']
-                        file_info = response_body
-                elif isinstance(response_body, str):
-                    # 尝试解析JSON字符串
-                    try:
-                        json_data = json.loads(response_body)
-                        if 'url' in json_data:
-                            download_url = json_data['url']
-                            file_info = json_data
-                    except:
-                        # 可能是HTML或其他格式，尝试正则提取
-                        url_pattern = r'https://[^"\'>\s]+aliyundrive\.net[^"\'>\s]*'
-                        urls = re.findall(url_pattern, response_body)
-                        if urls:
-                            download_url = urls[0]
-                
-                if download_url and 'aliyundrive.net' in download_url:
-                    link_info = {
-                        'timestamp': entry['request']['timestamp'],
-                        'request_url': request_url,
-                        'download_url': download_url,
-                        'file_info': file_info,
-                        'query_params': entry['request'].get('query_params', {})
-                    }
-                    
-                    self.download_links.append(link_info)
-                    self._display_found_link(link_info)
-                    
-        except Exception as e:
-            pass  # 跳过无法解析的响应
+    def load_link_stream(self, path):
+        """读取代理抓包时实时提取的链接文件，不需要重新解析日志"""
+        print(f"\n📄 读取实时提取的链接: {os.path.basename(path)}")
+        for link_info in iter_link_stream(path):
+            self.download_links.append(link_info)
+            self._display_found_link(link_info)
+        return self.download_links
     
     def _display_found_link(self, link_info):
         """显示找到的下载链接"""
@@ -193,8 +208,8 @@ class DownloadLinkExtractor:
         except requests.exceptions.RequestException as e:
             print(f"{Fore.RED}❌ 请求失败: {str(e)}{Style.RESET_ALL}")
     
-    def save_links_to_file(self, filename="extracted_download_links.json"):
-        """保存提取的链接到文件"""
+    def save_links_to_file(self, filename="extracted_download_links.json", pretty=False):
+        """保存提取的链接到文件，默认紧凑JSON，pretty=True时缩进两格"""
         if not self.download_links:
             print(f"{Fore.YELLOW}⚠️  没有找到下载链接{Style.RESET_ALL}")
             return
@@ -206,8 +221,7 @@ class DownloadLinkExtractor:
         }
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            dump_file(output_data, filename, pretty)
             
             print(f"\n{Fore.GREEN}💾 链接已保存到: {filename}{Style.RESET_ALL}")
             print(f"📊 总共提取了 {len(self.download_links)} 个下载链接")
@@ -249,17 +263,26 @@ class DownloadLinkExtractor:
         return None
 
 def main():
+    parser = argparse.ArgumentParser(description="从抓包日志中提取下载链接")
+    parser.add_argument("--pretty", action="store_true", help="保存的JSON缩进两格便于阅读 (默认紧凑输出)")
+    parser.add_argument("--workers", type=int, default=None, help="并行解析日志的进程数 (默认: CPU核数)")
+    parser.add_argument("--since", type=parse_time_bound, default=None,
+                        help="只分析此时间之后的请求，如 17:16、2025-05-28T17:16、2025-05-28")
+    parser.add_argument("--until", type=parse_until_bound, default=None,
+                        help="只分析此时间之前的请求，如 17:19 (包含17:19这一分钟)")
+    args = parser.parse_args()
+    
     extractor = DownloadLinkExtractor()
     
     # 从日志中提取链接
-    links = extractor.extract_from_logs()
+    links = extractor.extract_from_logs(since=args.since, until=args.until, workers=args.workers)
     
     if links:
         # 验证链接
         extractor.verify_links()
         
         # 保存到文件
-        extractor.save_links_to_file()
+        extractor.save_links_to_file(pretty=args.pretty)
         
         print(f"\n{Fore.GREEN}🎉 提取完成！{Style.RESET_ALL}")
         print(f"📊 总共找到 {len(links)} 个下载链接")
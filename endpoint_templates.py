@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口模板归一化
+把URL归一化为接口模板，只差在ID或易变查询值上的请求归为同一个接口，例如:
+    GET http://host/4k/getinfo.php?id=896013  ->  GET host/4k/getinfo.php?id={id}
+    GET http://host/api/users/42/files/9f1c...  ->  GET host/api/users/{id}/files/{uuid}
+
+路径段和查询值按以下规则替换为占位符，其余保持原样:
+    {id}    纯数字(包括毫秒时间戳)，以及至少8个字符、包含数字的十六进制串(文件ID、签名、哈希)
+    {uuid}  8-4-4-4-12格式的UUID
+    {token} 至少20个字符、字母数字混合的串(令牌、base64编码的ID)
+同一个参数的值可能有时全是数字、有时带a-f字母，所以长数字串和十六进制串共用{id}，不会拆成两个接口；
+带扩展名的段只替换扩展名之前的部分(896013.jpg -> {id}.jpg)；
+查询值超过32个字符时也视为易变值，查询参数按名称排序
+
+归一化结果缓存在按 (方法, 主机) 分开的前缀树中，树的每个节点是一个模板路径段，
+已出现过的普通路径段直接命中子节点，不需要再做正则匹配，只有ID段每次需要分类
+"""
+
+import re
+
+ID = "{id}"
+UUID = "{uuid}"
+TOKEN = "{token}"
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_HEX_RE = re.compile(r"[0-9a-fA-F]{8,}")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_\-]{20,}")
+_LETTER_RE = re.compile(r"[A-Za-z]")
+
+# 查询值超过这个长度时视为易变值
+MAX_QUERY_VALUE = 32
+# 前缀树最多保存的节点数，超过后新的路径段仍正常归一化，只是不再缓存
+MAX_NODES = 100000
+
+
+def classify_segment(segment):
+    """路径段或查询值对应的占位符，不是ID时返回None"""
+    if not segment:
+        return None
+    if segment.isdigit():
+        return ID
+    if len(segment) == 36 and _UUID_RE.fullmatch(segment):
+        return UUID
+    if len(segment) >= 8 and _HEX_RE.fullmatch(segment) and not segment.isalpha():
+        return ID
+    if (len(segment) >= 20 and _TOKEN_RE.fullmatch(segment)
+            and _LETTER_RE.search(segment) and any(c.isdigit() for c in segment)):
+        return TOKEN
+    return None
+
+
+def normalize_segment(segment):
+    """单个路径段的模板"""
+    placeholder = classify_segment(segment)
+    if placeholder:
+        return placeholder
+    stem, dot, extension = segment.rpartition(".")
+    if dot and stem and extension.isalnum():
+        placeholder = classify_segment(stem)
+        if placeholder:
+            return placeholder + dot + extension
+    return segment
+
+
+def normalize_query(query):
+    """查询字符串的模板: 参数按名称排序，易变值替换为占位符"""
+    if not query:
+        return ""
+    params = []
+    for pair in query.split("&"):
+        if not pair:
+            continue
+        name, equals, value = pair.partition("=")
+        if value:
+            value = classify_segment(value) or (TOKEN if len(value) > MAX_QUERY_VALUE else value)
+        params.append(name + equals + value)
+    params.sort(key=lambda param: param.partition("=")[0])
+    return "?" + "&".join(params)
+
+
+def split_url(url):
+    """把URL拆成 (主机, 路径, 查询字符串)，不做解码"""
+    url = url or ""
+    url = url.partition("#")[0]
+    scheme_end = url.find("://")
+    if scheme_end >= 0:
+        rest = url[scheme_end + 3:]
+        slash = rest.find("/")
+        question = rest.find("?")
+        end = min(position for position in (slash, question, len(rest)) if position >= 0)
+        host, url = rest[:end], rest[end:]
+    else:
+        host = ""
+    path, _, query = url.partition("?")
+    return host, path or "/", query
+
+
+class _Node:
+    """前缀树节点: 子节点(原始段或占位符 -> 节点)和到这里为止的路径模板"""
+
+    __slots__ = ("children", "template")
+
+    def __init__(self, template):
+        self.children = {}
+        self.template = template
+
+
+class EndpointTemplates:
+    """带前缀树缓存的接口模板归一化器，用法:
+
+        templates = EndpointTemplates()
+        templates.template("GET", "http://host/api/users/42?t=1716900000")  # 'GET host/api/users/{id}?t={id}'
+    """
+
+    def __init__(self, max_nodes=MAX_NODES):
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        # (方法, 主机) -> 根节点
+        self._roots = {}
+
+    def template(self, method, url, host=None):
+        """请求的接口模板 "方法 主机/路径模板?查询模板"，host为空时从URL中取"""
+        url_host, path, query = split_url(url)
+        host = host or url_host or "unknown"
+        method = (method or "unknown").upper()
+        root = self._roots.get((method, host))
+        if root is None:
+            root = self._roots[(method, host)] = _Node(f"{method} {host}")
+            self.nodes += 1
+        return self._path_template(root, path) + normalize_query(query)
+
+    def _path_template(self, node, path):
+        segments = path.split("/")
+        # 以 / 开头，第一个段为空
+        for position in range(1, len(segments)):
+            segment = segments[position]
+            child = node.children.get(segment)
+            if child is None:
+                # 普通段以原文为键缓存，ID段以占位符为键，原始的ID不进入树
+                key = normalize_segment(segment)
+                child = node.children.get(key)
+                if child is None:
+                    if self.nodes >= self.max_nodes:
+                        return "/".join([node.template, key] + [normalize_segment(s) for s in segments[position + 1:]])
+                    child = node.children[key] = _Node(node.template + "/" + key)
+                    self.nodes += 1
+            node = child
+        return node.template
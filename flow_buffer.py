@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固定容量的流量摘要环形缓冲区
+只保存最近N条请求的紧凑摘要(时间、方法、主机、状态码、大小、耗时)，
+内存占用固定，供实时查看最近的流量。方法名和主机名表只保留缓冲区中还有记录引用的名称，
+长时间抓包遇到再多不同的主机，名称表也不会超过容量
+"""
+
+from array import array
+from collections import namedtuple
+
+FlowSummary = namedtuple(
+    "FlowSummary",
+    ["timestamp", "method", "host", "status", "request_size", "response_size", "duration"],
+)
+
+# 每个字段对应一个array列: (字段名, array类型码)
+_COLUMNS = (
+    ("timestamp", "d"),
+    ("method", "H"),
+    ("host", "I"),
+    ("status", "H"),
+    ("request_size", "Q"),
+    ("response_size", "Q"),
+    ("duration", "d"),
+)
+
+ENTRY_BYTES = sum(array(code).itemsize for _, code in _COLUMNS)
+
+
+class _NameTable:
+    """名称与编号的对照表，按引用它的槽位数计数，不再被引用的名称释放编号供之后复用"""
+
+    __slots__ = ("names", "ids", "refs", "free")
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.refs = []
+        self.free = []
+
+    def acquire(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            if self.free:
+                index = self.free.pop()
+                self.names[index] = name
+            else:
+                index = len(self.names)
+                self.names.append(name)
+                self.refs.append(0)
+            self.ids[name] = index
+        self.refs[index] += 1
+        return index
+
+    def release(self, index):
+        self.refs[index] -= 1
+        if not self.refs[index]:
+            del self.ids[self.names[index]]
+            self.names[index] = None
+            self.free.append(index)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class FlowRingBuffer:
+    """按列存储的环形缓冲区，写满后覆盖最旧的记录"""
+
+    def __init__(self, capacity=10000, max_bytes=None):
+        if max_bytes:
+            capacity = max_bytes // ENTRY_BYTES
+        self.capacity = max(1, capacity)
+        self._columns = {name: array(code, [0] * self.capacity) for name, code in _COLUMNS}
+        self._next = 0
+        self._count = 0
+        self.total = 0
+
+        # 方法名和主机名只保存一份，列中存编号
+        self._methods = _NameTable()
+        self._hosts = _NameTable()
+
+    def append(self, timestamp, method, host, status, request_size, response_size, duration):
+        """追加一条摘要"""
+        i = self._next
+        columns = self._columns
+        if self._count == self.capacity:
+            # 覆盖最旧的记录，它引用的名称可能不再需要
+            self._methods.release(columns["method"][i])
+            self._hosts.release(columns["host"][i])
+        columns["timestamp"][i] = timestamp
+        columns["method"][i] = self._methods.acquire(method)
+        columns["host"][i] = self._hosts.acquire(host)
+        columns["status"][i] = status or 0
+        columns["request_size"][i] = request_size or 0
+        columns["response_size"][i] = response_size or 0
+        columns["duration"][i] = duration if duration is not None else -1.0
+
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self.total += 1
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def memory_bytes(self):
+        """列数据占用的字节数(不含名称表，名称表的条数不超过容量)"""
+        return self.capacity * ENTRY_BYTES
+
+    @property
+    def host_count(self):
+        """缓冲区中出现的不同主机数"""
+        return len(self._hosts)
+
+    def _entry(self, i):
+        columns = self._columns
+        duration = columns["duration"][i]
+        return FlowSummary(
+            timestamp=columns["timestamp"][i],
+            method=self._methods.names[columns["method"][i]],
+            host=self._hosts.names[columns["host"][i]],
+            status=columns["status"][i],
+            request_size=columns["request_size"][i],
+            response_size=columns["response_size"][i],
+            duration=None if duration < 0 else duration,
+        )
+
+    def _indices(self):
+        """从旧到新的槽位下标"""
+        start = (self._next - self._count) % self.capacity
+        for offset in range(self._count):
+            yield (start + offset) % self.capacity
+
+    def __iter__(self):
+        for i in self._indices():
+            yield self._entry(i)
+
+    def recent(self, n=20):
+        """最近的n条摘要，最新的在最后"""
+        n = max(0, min(n, self._count))
+        start = self._next - n
+        return [self._entry((start + offset) % self.capacity) for offset in range(n)]
+
+    def count_since(self, since):
+        """时间戳不早于since的条数(从最新往前数)"""
+        timestamps = self._columns["timestamp"]
+        count = 0
+        for offset in range(1, self._count + 1):
+            if timestamps[(self._next - offset) % self.capacity] < since:
+                break
+            count += 1
+        return count
+
+    def query(self, host=None, method=None, status=None, since=None):
+        """按主机、方法、状态码、起始时间过滤缓冲区中的摘要"""
+        columns = self._columns
+        host_id = self._hosts.ids.get(host) if host is not None else None
+        method_id = self._methods.ids.get(method.upper()) if method is not None else None
+        if (host is not None and host_id is None) or (method is not None and method_id is None):
+            return []
+
+        results = []
+        for i in self._indices():
+            if host_id is not None and columns["host"][i] != host_id:
+                continue
+            if method_id is not None and columns["method"][i] != method_id:
+                continue
+            if status is not None and columns["status"][i] != status:
+                continue
+            if since is not None and columns["timestamp"][i] < since:
+                continue
+            results.append(self._entry(i))
+        return results
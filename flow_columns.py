@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按列存储的流量统计
+把抓包记录投影为列(时间戳、主机编号、方法编号、接口模板编号、状态码、请求/响应大小、耗时)，
+只遍历一次记录，之后的各种统计都在列上完成: 分布、每分钟请求数、各主机流量、
+主机×状态码矩阵、耗时分位数、各接口模板的统计。安装了NumPy时向量化计算，否则使用array列和标准库
+"""
+
+import math
+from array import array
+from collections import Counter, defaultdict
+from capture_log import iso_to_ms, iter_capture_file
+from endpoint_templates import EndpointTemplates
+
+# NumPy可选，未安装时退回纯Python实现
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# (列名, array类型码)，类型码同时也是NumPy的dtype
+_COLUMNS = (
+    ("timestamp", "d"),
+    ("host", "I"),
+    ("method", "H"),
+    ("endpoint", "I"),
+    ("status", "H"),
+    ("request_size", "Q"),
+    ("response_size", "Q"),
+    ("duration", "d"),
+)
+
+PERCENTILES = (50, 90, 99)
+ENDPOINT_PERCENTILES = (50, 95, 99)
+
+# 接口模板的前缀树缓存在本进程的所有列数据之间共用
+_TEMPLATES = EndpointTemplates()
+
+
+def _percentile(sorted_values, p):
+    """线性插值的分位数(与numpy.percentile的默认算法相同)"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    low = math.floor(k)
+    high = math.ceil(k)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+def project_capture_file(path):
+    """把一个日志文件投影为列，在进程池中运行"""
+    return FlowColumns.from_records(iter_capture_file(path))
+
+
+class FlowColumns:
+    """按列存储的流量数据及其聚合统计
+
+    缺失值: 时间戳为0、状态码为0、耗时为-1
+    """
+
+    def __init__(self):
+        self._columns = {name: array(code) for name, code in _COLUMNS}
+        # 主机名和方法名只保存一份，列中存编号
+        self.host_names = []
+        self._host_ids = {}
+        self.method_names = []
+        self._method_ids = {}
+        self.endpoint_names = []
+        self._endpoint_ids = {}
+
+    @staticmethod
+    def _intern(name, names, ids):
+        index = ids.get(name)
+        if index is None:
+            index = len(names)
+            names.append(name)
+            ids[name] = index
+        return index
+
+    def append(self, timestamp, method, host, status, request_size, response_size, duration, url=None):
+        """追加一条流量，timestamp为ISO时间字符串或秒"""
+        columns = self._columns
+        columns["timestamp"].append(
+            timestamp if isinstance(timestamp, (int, float)) else iso_to_ms(timestamp) / 1000
+        )
+        columns["host"].append(self._intern(host or 'unknown', self.host_names, self._host_ids))
+        columns["method"].append(self._intern((method or 'unknown').upper(), self.method_names, self._method_ids))
+        columns["endpoint"].append(
+            self._intern(_TEMPLATES.template(method, url, host), self.endpoint_names, self._endpoint_ids)
+        )
+        columns["status"].append(status or 0)
+        columns["request_size"].append(request_size or 0)
+        columns["response_size"].append(response_size or 0)
+        columns["duration"].append(duration if duration is not None else -1.0)
+
+    def add_record(self, record):
+        """追加一条日志记录字典"""
+        request = record.get('request') or {}
+        response = record.get('response') or {}
+        # 新记录带毫秒时间戳，不需要解析ISO时间
+        timestamp = request.get('timestamp_ms')
+        self.append(
+            timestamp / 1000 if timestamp is not None else request.get('timestamp'), request.get('method'), request.get('host'),
+            response.get('status_code'), request.get('body_size'), response.get('body_size'),
+            response.get('response_time'), request.get('url'),
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """一次遍历日志记录字典，投影为列"""
+        columns = cls()
+        for record in records:
+            columns.add_record(record)
+        return columns
+
+    @classmethod
+    def from_rows(cls, rows):
+        """从 (timestamp, method, host, status_code, request_size, response_size, response_time, url) 行创建"""
+        columns = cls()
+        for row in rows:
+            columns.append(*row)
+        return columns
+
+    def extend(self, other):
+        """追加另一组列数据(例如子进程投影的一个文件)，主机、方法和接口模板编号映射到本组的编号"""
+        host_map = [self._intern(name, self.host_names, self._host_ids) for name in other.host_names]
+        method_map = [self._intern(name, self.method_names, self._method_ids) for name in other.method_names]
+        endpoint_map = [self._intern(name, self.endpoint_names, self._endpoint_ids) for name in other.endpoint_names]
+        for name, code in _COLUMNS:
+            mapping = {"host": host_map, "method": method_map, "endpoint": endpoint_map}.get(name)
+            column = other._columns[name]
+            if mapping is None or mapping == list(range(len(mapping))):
+                self._columns[name].extend(column)
+            elif numpy is not None:
+                remapped = numpy.asarray(mapping, dtype=code)[other._np(name)]
+                self._columns[name].frombytes(remapped.tobytes())
+            else:
+                self._columns[name].extend(array(code, (mapping[value] for value in column)))
+
+    def __len__(self):
+        return len(self._columns["timestamp"])
+
+    def _np(self, name):
+        """列的NumPy视图(不复制)，只在单次计算中使用"""
+        column = self._columns[name]
+        return numpy.frombuffer(column, dtype=column.typecode) if len(column) else numpy.zeros(0, column.typecode)
+
+    # ---- 聚合 ----
+
+    def value_counts(self, name):
+        """host/method/endpoint/status列的分布 [(值, 次数)]，按次数倒序"""
+        column = self._columns[name]
+        if numpy is not None:
+            counts = numpy.bincount(self._np(name))
+            pairs = [(int(value), int(counts[value])) for value in numpy.nonzero(counts)[0]]
+        else:
+            pairs = list(Counter(column).items())
+        labels = {"host": self.host_names, "method": self.method_names, "endpoint": self.endpoint_names}.get(name)
+        if labels is not None:
+            pairs = [(labels[value], count) for value, count in pairs]
+        else:
+            pairs = [(value or 'unknown', count) for value, count in pairs]
+        return sorted(pairs, key=lambda pair: pair[1], reverse=True)
+
+    def per_minute(self):
+        """每分钟的请求数 [(分钟开始的时间戳, 次数)]，按时间排序，没有时间戳的记录不计"""
+        if numpy is not None:
+            timestamps = self._np("timestamp")
+            minutes, counts = numpy.unique(
+                (timestamps[timestamps > 0] // 60).astype(numpy.int64), return_counts=True
+            )
+            return [(int(minute) * 60, int(count)) for minute, count in zip(minutes, counts)]
+        counts = Counter(int(t // 60) for t in self._columns["timestamp"] if t > 0)
+        return [(minute * 60, counts[minute]) for minute in sorted(counts)]
+
+    def host_traffic(self):
+        """各主机的 [(主机, 请求数, 请求字节, 响应字节)]，按总字节数倒序"""
+        if numpy is not None:
+            hosts = self._np("host")
+            size = len(self.host_names)
+            requests = numpy.bincount(hosts, minlength=size)
+            sent = numpy.bincount(hosts, weights=self._np("request_size"), minlength=size)
+            received = numpy.bincount(hosts, weights=self._np("response_size"), minlength=size)
+            rows = [
+                (name, int(requests[i]), int(sent[i]), int(received[i]))
+                for i, name in enumerate(self.host_names)
+            ]
+        else:
+            totals = defaultdict(lambda: [0, 0, 0])
+            columns = self._columns
+            for host, sent, received in zip(columns["host"], columns["request_size"], columns["response_size"]):
+                total = totals[host]
+                total[0] += 1
+                total[1] += sent
+                total[2] += received
+            rows = [(self.host_names[host], *total) for host, total in totals.items()]
+        return sorted(rows, key=lambda row: row[2] + row[3], reverse=True)
+
+    def status_by_host(self):
+        """主机×状态码的请求数矩阵，返回 (主机列表, 状态码列表, 行列表)，主机按请求数倒序"""
+        if numpy is not None:
+            statuses = numpy.unique(self._np("status"))
+            status_index = numpy.searchsorted(statuses, self._np("status"))
+            cells = numpy.bincount(
+                self._np("host").astype(numpy.int64) * len(statuses) + status_index,
+                minlength=len(self.host_names) * len(statuses),
+            ).reshape(len(self.host_names), len(statuses))
+            statuses = [int(status) for status in statuses]
+            matrix = {i: [int(n) for n in row] for i, row in enumerate(cells)}
+        else:
+            pairs = Counter(zip(self._columns["host"], self._columns["status"]))
+            statuses = sorted({status for _, status in pairs})
+            matrix = defaultdict(lambda: [0] * len(statuses))
+            position = {status: i for i, status in enumerate(statuses)}
+            for (host, status), count in pairs.items():
+                matrix[host][position[status]] = count
+        hosts = sorted(matrix, key=lambda host: sum(matrix[host]), reverse=True)
+        return (
+            [self.host_names[host] for host in hosts],
+            [status or 'unknown' for status in statuses],
+            [matrix[host] for host in hosts],
+        )
+
+    def latency_percentiles(self, percentiles=PERCENTILES):
+        """耗时分位数(秒): [(主机, 次数, p...)]，第一行为全部主机("*")，其余按次数倒序"""
+        if numpy is not None:
+            durations = self._np("duration")
+            hosts = self._np("host")
+            valid = durations >= 0
+            durations, hosts = durations[valid], hosts[valid]
+            groups = [("*", durations)]
+            if len(durations):
+                order = numpy.argsort(hosts, kind="stable")
+                sorted_hosts, sorted_durations = hosts[order], durations[order]
+                starts = numpy.flatnonzero(numpy.r_[True, sorted_hosts[1:] != sorted_hosts[:-1]])
+                for host, values in zip(sorted_hosts[starts], numpy.split(sorted_durations, starts[1:])):
+                    groups.append((self.host_names[host], values))
+            rows = [
+                (name, len(values), *(float(v) for v in numpy.percentile(values, percentiles)))
+                for name, values in groups if len(values)
+            ]
+        else:
+            by_host = defaultdict(list)
+            everything = []
+            for host, duration in zip(self._columns["host"], self._columns["duration"]):
+                if duration >= 0:
+                    by_host[host].append(duration)
+                    everything.append(duration)
+            groups = [("*", everything)] + [(self.host_names[host], values) for host, values in by_host.items()]
+            rows = []
+            for name, values in groups:
+                if values:
+                    values.sort()
+                    rows.append((name, len(values), *(_percentile(values, p) for p in percentiles)))
+        return rows[:1] + sorted(rows[1:], key=lambda row: row[1], reverse=True)
+
+    def endpoint_stats(self, percentiles=ENDPOINT_PERCENTILES):
+        """各接口模板的 [(模板, 次数, 错误率, 请求字节, 响应字节, p...)]，按次数倒序
+
+        错误为状态码 >= 400 或没有响应；耗时分位数(秒)只统计有耗时的记录，没有时为None
+        """
+        size = len(self.endpoint_names)
+        if numpy is not None:
+            endpoints = self._np("endpoint")
+            statuses = self._np("status")
+            requests = numpy.bincount(endpoints, minlength=size)
+            errors = numpy.bincount(endpoints, weights=(statuses == 0) | (statuses >= 400), minlength=size)
+            sent = numpy.bincount(endpoints, weights=self._np("request_size"), minlength=size)
+            received = numpy.bincount(endpoints, weights=self._np("response_size"), minlength=size)
+            totals = [[int(requests[i]), int(errors[i]), int(sent[i]), int(received[i])] for i in range(size)]
+            durations = self._np("duration")
+            valid = durations >= 0
+            durations, endpoints = durations[valid], endpoints[valid]
+            latencies = {}
+            if len(durations):
+                order = numpy.argsort(endpoints, kind="stable")
+                sorted_endpoints, sorted_durations = endpoints[order], durations[order]
+                starts = numpy.flatnonzero(numpy.r_[True, sorted_endpoints[1:] != sorted_endpoints[:-1]])
+                for endpoint, values in zip(sorted_endpoints[starts], numpy.split(sorted_durations, starts[1:])):
+                    latencies[int(endpoint)] = [float(v) for v in numpy.percentile(values, percentiles)]
+        else:
+            totals = [[0, 0, 0, 0] for _ in range(size)]
+            by_endpoint = defaultdict(list)
+            columns = self._columns
+            for endpoint, status, sent, received, duration in zip(
+                columns["endpoint"], columns["status"], columns["request_size"],
+                columns["response_size"], columns["duration"],
+            ):
+                total = totals[endpoint]
+                total[0] += 1
+                total[1] += status == 0 or status >= 400
+                total[2] += sent
+                total[3] += received
+                if duration >= 0:
+                    by_endpoint[endpoint].append(duration)
+            latencies = {}
+            for endpoint, values in by_endpoint.items():
+                values.sort()
+                latencies[endpoint] = [_percentile(values, p) for p in percentiles]
+        rows = [
+            (self.endpoint_names[i], count, errors / count, sent, received,
+             *latencies.get(i, [None] * len(percentiles)))
+            for i, (count, errors, sent, received) in enumerate(totals) if count
+        ]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的流量记录
+内存中的请求/响应记录使用__slots__对象代替嵌套字典，
+头部名/值、(名, 值)对和整组头部通过会话内共享的HeaderTable只保存一份，
+相同的User-Agent、Cookie、主机名等字符串在成千上万条记录之间共享。
+落盘格式不变: 写入日志时用to_dict()还原为原来的字典结构
+"""
+
+# 请求/响应字典中由固定字段保存的键，其余键放入extra
+_REQUEST_KEYS = frozenset((
+    "timestamp", "timestamp_ms", "method", "url", "scheme", "host", "path", "headers", "query_params",
+    "body", "body_encoding", "content_type", "body_size",
+))
+_RESPONSE_KEYS = frozenset((
+    "status_code", "status_text", "headers", "body", "body_encoding", "content_type",
+    "body_size", "response_time", "timing",
+))
+
+
+class HeaderTable:
+    """会话内共享的头部字典和字符串池
+
+    条目数超过max_entries后不再加入新的条目(新值原样返回)，
+    避免Date、签名等每次都不同的头部让表无限增长
+    """
+
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self._strings = {}
+        self._pairs = {}
+        self._sets = {}
+
+    def intern(self, value):
+        """返回池中与value相等的字符串"""
+        if value is None:
+            return None
+        shared = self._strings.get(value)
+        if shared is not None:
+            return shared
+        if len(self._strings) < self.max_entries:
+            self._strings[value] = value
+        return value
+
+    def headers(self, items):
+        """把头部(字典或(名, 值)序列)转换为共享的 ((名, 值), ...) 元组"""
+        if hasattr(items, 'items'):
+            items = items.items()
+        pairs = []
+        for pair in items:
+            pair = tuple(pair)
+            shared = self._pairs.get(pair)
+            if shared is None:
+                shared = (self.intern(pair[0]), self.intern(pair[1]))
+                if len(self._pairs) < self.max_entries:
+                    self._pairs[shared] = shared
+            pairs.append(shared)
+        key = tuple(pairs)
+        shared = self._sets.get(key)
+        if shared is not None:
+            return shared
+        if len(self._sets) < self.max_entries:
+            self._sets[key] = key
+        return key
+
+    def stats(self):
+        return {"strings": len(self._strings), "pairs": len(self._pairs), "header_sets": len(self._sets)}
+
+
+class FlowRecord:
+    """一条请求(及其响应)的紧凑记录"""
+
+    __slots__ = (
+        "timestamp", "timestamp_ms", "method", "url", "scheme", "host", "path", "query_params",
+        "request_headers", "request_body", "request_body_encoding", "request_content_type",
+        "request_size", "request_extra",
+        "status_code", "status_text", "response_headers", "response_body", "response_body_encoding",
+        "response_content_type", "response_size", "response_time", "timing", "response_extra",
+    )
+
+    def __init__(self):
+        self.timestamp = None
+        # 毫秒时间戳，可以直接比较和二分查找；旧日志中没有
+        self.timestamp_ms = None
+        self.method = None
+        self.url = None
+        self.scheme = None
+        self.host = None
+        self.path = None
+        self.query_params = None
+        self.request_headers = ()
+        self.request_body = None
+        self.request_body_encoding = None
+        self.request_content_type = None
+        self.request_size = 0
+        self.request_extra = None
+        # status_code为None表示还没有响应
+        self.status_code = None
+        self.status_text = None
+        self.response_headers = ()
+        self.response_body = None
+        self.response_body_encoding = None
+        self.response_content_type = None
+        self.response_size = 0
+        self.response_time = None
+        self.timing = None
+        self.response_extra = None
+
+    @property
+    def has_response(self):
+        return self.status_code is not None or self.response_extra is not None
+
+    @classmethod
+    def from_dict(cls, record, table=None):
+        """从日志记录字典创建，table为None时不共享字符串"""
+        table = table or _NO_TABLE
+        intern = table.intern
+        self = cls()
+
+        request = record.get("request") or {}
+        self.timestamp = request.get("timestamp")
+        self.timestamp_ms = request.get("timestamp_ms")
+        self.method = intern(request.get("method"))
+        self.url = intern(request.get("url"))
+        self.scheme = intern(request.get("scheme"))
+        self.host = intern(request.get("host"))
+        self.path = intern(request.get("path"))
+        self.query_params = request.get("query_params") or None
+        self.request_headers = table.headers(request.get("headers") or ())
+        self.request_body = request.get("body")
+        self.request_body_encoding = intern(request.get("body_encoding"))
+        self.request_content_type = intern(request.get("content_type"))
+        self.request_size = request.get("body_size") or 0
+        self.request_extra = _extra(request, _REQUEST_KEYS)
+
+        response = record.get("response")
+        if response is not None:
+            self.status_code = response.get("status_code")
+            self.status_text = intern(response.get("status_text"))
+            self.response_headers = table.headers(response.get("headers") or ())
+            self.response_body = response.get("body")
+            self.response_body_encoding = intern(response.get("body_encoding"))
+            self.response_content_type = intern(response.get("content_type"))
+            self.response_size = response.get("body_size") or 0
+            self.response_time = response.get("response_time")
+            self.timing = response.get("timing")
+            # 没有状态码的响应用空的extra标记"有响应"
+            self.response_extra = _extra(response, _RESPONSE_KEYS) or ({} if self.status_code is None else None)
+        return self
+
+    def request_dict(self):
+        """还原为日志中的request字典"""
+        request = {
+            "timestamp": self.timestamp,
+            "method": self.method,
+            "url": self.url,
+            "scheme": self.scheme,
+            "host": self.host,
+            "path": self.path,
+            "headers": dict(self.request_headers),
+            "query_params": self.query_params or {},
+            "body": self.request_body,
+            "body_encoding": self.request_body_encoding,
+            "content_type": self.request_content_type,
+            "body_size": self.request_size,
+        }
+        if self.timestamp_ms is not None:
+            request["timestamp_ms"] = self.timestamp_ms
+        if self.request_extra:
+            request.update(self.request_extra)
+        return request
+
+    def response_dict(self):
+        """还原为日志中的response字典，没有响应时返回None"""
+        if not self.has_response:
+            return None
+        response = {
+            "status_code": self.status_code,
+            "status_text": self.status_text,
+            "headers": dict(self.response_headers),
+            "body": self.response_body,
+            "body_encoding": self.response_body_encoding,
+            "content_type": self.response_content_type,
+            "body_size": self.response_size,
+            "response_time": self.response_time,
+            "timing": self.timing,
+        }
+        if self.response_extra:
+            response.update(self.response_extra)
+        return response
+
+    def to_dict(self):
+        """还原为完整的日志记录字典"""
+        record = {"request": self.request_dict()}
+        response = self.response_dict()
+        if response is not None:
+            record["response"] = response
+        return record
+
+
+def _extra(part, known_keys):
+    extra = {key: value for key, value in part.items() if key not in known_keys}
+    return extra or None
+
+
+class _NoTable:
+    """不共享字符串时使用的占位表"""
+
+    @staticmethod
+    def intern(value):
+        return value
+
+    @staticmethod
+    def headers(items):
+        if hasattr(items, 'items'):
+            items = items.items()
+        return tuple(tuple(pair) for pair in items)
+
+
+_NO_TABLE = _NoTable()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求耗时统计
+从mitmproxy流量的时间戳计算首字节时间、总耗时、建连和TLS握手耗时，
+并按主机维护HDR风格的延迟直方图，用于输出分位数表
+"""
+
+from array import array
+from serialization import dump_file
+
+# 直方图中记录的指标
+METRICS = ("total", "ttfb", "connect", "tls")
+
+
+def _elapsed(start, end):
+    if start is None or end is None or end < start:
+        return None
+    return round(end - start, 6)
+
+
+def flow_timings(flow):
+    """计算一个流量的各阶段耗时(秒)，拿不到的阶段为None"""
+    request = flow.request
+    response = flow.response
+    server_conn = flow.server_conn
+
+    timings = {
+        # 请求发送完成到收到响应第一个字节
+        "ttfb": _elapsed(request.timestamp_end, response.timestamp_start if response else None),
+        # 开始收到请求到响应结束
+        "total": _elapsed(request.timestamp_start, response.timestamp_end if response else None),
+        "connect": None,
+        "tls": None,
+        "connection_reused": False,
+    }
+
+    if server_conn and server_conn.timestamp_start is not None:
+        # 连接在这个请求之前就建立好了，建连耗时属于更早的请求
+        if request.timestamp_start is not None and server_conn.timestamp_start < request.timestamp_start:
+            timings["connection_reused"] = True
+        else:
+            timings["connect"] = _elapsed(server_conn.timestamp_start, server_conn.timestamp_tcp_setup)
+            timings["tls"] = _elapsed(server_conn.timestamp_tcp_setup, server_conn.timestamp_tls_setup)
+    return timings
+
+
+class LatencyHistogram:
+    """HDR风格的对数-线性直方图，以微秒为单位，相对误差约 1/2^(sub_bits-1)"""
+
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half = self.sub_count >> 1
+        self.counts = array('Q')
+        self.total_count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+
+    def _index(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return shift * self.half + (value >> shift)
+
+    def _upper_bound(self, index):
+        """桶内的最大值(微秒)"""
+        if index < self.sub_count:
+            return index
+        shift = index // self.half - 1
+        mantissa = index - shift * self.half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds):
+        """记录一个耗时(秒)"""
+        if seconds is None or seconds < 0:
+            return
+        value = int(seconds * 1_000_000)
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.total_count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        """合并另一个直方图"""
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total_count += other.total_count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p):
+        """第p百分位的耗时(秒)"""
+        if not self.total_count:
+            return None
+        target = max(1, int(round(p / 100.0 * self.total_count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index) / 1_000_000, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.total_count if self.total_count else None
+
+
+class LatencyTracker:
+    """按主机和指标维护延迟直方图"""
+
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self):
+        self.hosts = {}
+
+    def record(self, host, timings):
+        histograms = self.hosts.get(host)
+        if histograms is None:
+            histograms = self.hosts[host] = {metric: LatencyHistogram() for metric in METRICS}
+        for metric in METRICS:
+            histograms[metric].record(timings.get(metric))
+
+    def table(self, metric="total"):
+        """每个主机一行: (主机, 次数, 平均, 各分位数, 最大)，按次数倒序"""
+        rows = []
+        for host, histograms in list(self.hosts.items()):
+            histogram = histograms[metric]
+            if not histogram.total_count:
+                continue
+            rows.append((
+                host,
+                histogram.total_count,
+                histogram.mean,
+                *[histogram.percentile(p) for p in self.PERCENTILES],
+                histogram.max,
+            ))
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def format_table(self, metric="total"):
+        """格式化为文本表格(毫秒)"""
+        header = ["主机", "次数", "平均"] + [f"p{p}" for p in self.PERCENTILES] + ["最大"]
+        lines = ["  ".join(f"{h:>10}" if i else f"{h:<40}" for i, h in enumerate(header))]
+        for row in self.table(metric):
+            cells = [f"{row[0][:40]:<40}", f"{row[1]:>10}"]
+            cells += [f"{value * 1000:>8.1f}ms" for value in row[2:]]
+            lines.append("  ".join(cells))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """所有主机、所有指标的分位数(秒)"""
+        result = {}
+        for metric in METRICS:
+            result[metric] = {
+                row[0]: dict(zip(
+                    ["count", "mean"] + [f"p{p}" for p in self.PERCENTILES] + ["max"],
+                    row[1:],
+                ))
+                for row in self.table(metric)
+            }
+        return result
+
+    def save(self, path, pretty=False):
+        dump_file(self.to_dict(), path, pretty)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载链接识别规则
+代理抓包时的实时提取和离线的DownloadLinkExtractor共用这里的规则，
+实时提取到的链接追加写入 logs/download_links_*.jsonl
+"""
+
+import glob
+import os
+import re
+from serialization import loads
+
+LINKS_PREFIX = "download_links_"
+LINKS_EXT = ".jsonl"
+
+DOWNLOAD_DOMAIN = "aliyundrive.net"
+# 在原始响应字节中快速预筛的关键字
+BODY_MARKER = b"aliyundrive"
+_URL_PATTERN = re.compile(r'https://[^"\'>\s]+aliyundrive\.net[^"\'>\s]*')
+
+
+def is_link_api(request_url):
+    """是否为返回下载链接的阿里云盘API请求"""
+    return 'aliyun' in request_url and 'api.php' in request_url
+
+
+def find_download_url(response_body):
+    """从解码后的响应体中找出下载链接，返回(download_url, file_info)"""
+    if isinstance(response_body, dict):
+        # 直接是字典格式
+        if 'url' in response_body:
+            return response_body['url'], response_body
+    elif isinstance(response_body, str):
+        # 尝试解析JSON字符串
+        try:
+            json_data = loads(response_body)
+            if isinstance(json_data, dict) and 'url' in json_data:
+                return json_data['url'], json_data
+        except ValueError:
+            # 可能是HTML或其他格式，尝试正则提取
+            match = _URL_PATTERN.search(response_body)
+            if match:
+                return match.group(0), {}
+    return None, {}
+
+
+def extract_link(request_info, response_body):
+    """按规则从一条记录中提取下载链接，没有则返回None
+
+    request_info是日志记录中的request部分，response_body是解码后的响应体
+    """
+    request_url = request_info['url']
+    if not (is_link_api(request_url) or 'aliyundrive' in str(response_body)):
+        return None
+
+    download_url, file_info = find_download_url(response_body)
+    if not download_url or not isinstance(download_url, str) or DOWNLOAD_DOMAIN not in download_url:
+        return None
+    return {
+        'timestamp': request_info['timestamp'],
+        'request_url': request_url,
+        'download_url': download_url,
+        'file_info': file_info,
+        'query_params': request_info.get('query_params', {})
+    }
+
+
+def find_link_streams(log_dir="logs"):
+    """查找实时提取的链接文件，按文件名中的时间排序"""
+    return sorted(glob.glob(os.path.join(log_dir, f"{LINKS_PREFIX}*{LINKS_EXT}")))
+
+
+def iter_link_stream(path):
+    """逐条读取链接文件，跳过写了一半的末行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                continue
@@ -4,132 +4,443 @@
 API请求日志分析工具
 """
 
+import argparse
+import contextlib
+import csv
+import itertools
 import json
 import os
 import glob
+import sqlite3
+import sys
+import time
 from datetime import datetime
 from collections import defaultdict
-from colorama import init, Fore, Style
+from colorama import init, AnsiToWin32, Fore, Style
+from capture_log import (LEGACY_EXT, capture_file_order, find_capture_files, iter_capture_file, iter_capture_files,
+                         capture_session, session_capture_files, record_epoch_ms, ms_to_iso,
+                         parse_time_bound, parse_until_bound)
+from body_decoder import decode_body
+from capture_db import CaptureDatabase, find_capture_databases, is_capture_database
+from capture_diff import EndpointProfile, diff_profiles
+from flow_record import FlowRecord
+from flow_columns import ENDPOINT_PERCENTILES, FlowColumns, PERCENTILES, project_capture_file
+from parallel_ingest import map_capture_files
+from search_index import SearchIndex, INDEX_NAME
+from log_follow import CaptureTailer, DirectoryWatcher, LiveSummary
+from record_offsets import RecordOffsets, iter_records_between
+from record_query import RecordQuery
+from serialization import dumps
 
 init()
 
+def _open_offsets(path):
+    """打开日志文件的偏移索引，旧版JSON日志或无法建立索引(例如日志目录只读)时返回None"""
+    if path.endswith(LEGACY_EXT):
+        return None
+    try:
+        return RecordOffsets(path)
+    except (ValueError, OSError):
+        return None
+
 class LogAnalyzer:
-    def __init__(self, log_dir="logs"):
+    def __init__(self, log_dir="logs", workers=None):
         self.log_dir = log_dir
-        self.data = []
+        # 并行解析多个日志文件的进程数，None表示CPU核数
+        self.workers = workers
+        # 选中的日志文件，记录不整体读入内存，各项分析通过iter_records()流式读取
+        self.files = []
+        self.current_file = None
+        # 加载的是SQLite抓包数据库时，查询直接走索引
+        self.db = None
+        # 日志文件的持久化搜索索引，第一次搜索时打开
+        self.index = None
+        # 总览统计用的列数据及其对应的日志状态
+        self._columns = None
+        self._columns_key = None
         
-    def load_logs(self, log_file=None):
-        """加载日志文件"""
+    def load_logs(self, log_file=None, all_files=False):
+        """选择要分析的日志
+
+        log_file为文件路径或路径列表时只分析这些文件；all_files为True时分析目录中的所有日志；
+        否则分析最新的会话(包括多个代理进程各自的分段)或最新的数据库
+        """
         if log_file:
-            log_files = [log_file]
+            log_files = [log_file] if isinstance(log_file, str) else list(log_file)
+        elif all_files:
+            log_files = find_capture_files(self.log_dir)
         else:
-            # 自动找到最新的日志文件
-            pattern = os.path.join(self.log_dir, "api_requests_*.json")
-            log_files = glob.glob(pattern)
+            log_files = find_capture_files(self.log_dir) + find_capture_databases(self.log_dir)
+            if log_files:
+                # 使用最新的日志，包括同一会话的所有分段
+                latest_file = max(log_files, key=os.path.getctime)
+                if not is_capture_database(latest_file):
+                    log_files = session_capture_files(self.log_dir, capture_session(latest_file)) or [latest_file]
+                else:
+                    log_files = [latest_file]
             
         if not log_files:
             print(f"{Fore.RED}❌ 未找到日志文件{Style.RESET_ALL}")
             return False
         
-        # 如果有多个文件，使用最新的
-        latest_file = max(log_files, key=os.path.getctime)
-        print(f"{Fore.GREEN}📂 加载日志文件: {latest_file}{Style.RESET_ALL}")
-        
         try:
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            print(f"{Fore.GREEN}✅ 成功加载 {len(self.data)} 条记录{Style.RESET_ALL}")
+            if self.db:
+                self.db.close()
+                self.db = None
+            self.files = []
+            if len(log_files) == 1 and is_capture_database(log_files[0]):
+                print(f"{Fore.GREEN}📂 加载日志文件: {log_files[0]}{Style.RESET_ALL}")
+                self.db = CaptureDatabase(log_files[0])
+                self.current_file = log_files[0]
+                print(f"{Fore.GREEN}✅ 成功打开数据库，共 {self.db.count()} 条记录{Style.RESET_ALL}")
+                return True
+            # 按读取顺序排列，记录序号与iter_capture_files的顺序一致
+            log_files = sorted(log_files, key=capture_file_order)
+            total_size = sum(os.path.getsize(path) for path in log_files)
+            if len(log_files) == 1:
+                print(f"{Fore.GREEN}📂 加载日志文件: {log_files[0]}{Style.RESET_ALL}")
+            else:
+                print(f"{Fore.GREEN}📂 加载 {len(log_files)} 个日志文件: "
+                      f"{os.path.basename(log_files[0])} ~ {os.path.basename(log_files[-1])}{Style.RESET_ALL}")
+            self.files = log_files
+            self.current_file = log_files[-1]
+            print(f"{Fore.GREEN}✅ 共 {total_size / 1024 / 1024:.1f} MB，分析时流式读取{Style.RESET_ALL}")
             return True
         except Exception as e:
             print(f"{Fore.RED}❌ 加载日志失败: {e}{Style.RESET_ALL}")
             return False
     
-    def analyze_summary(self):
-        """分析总览"""
-        if not self.data:
-            print(f"{Fore.RED}❌ 没有数据可分析{Style.RESET_ALL}")
+    def _iter_dicts(self, since=None, until=None):
+        """按读取顺序逐条读取选中日志中的原始记录字典，可以限定请求时间范围(毫秒时间戳)"""
+        if self.db:
+            yield from self.db.iter_records(since, until)
+        elif since is None and until is None:
+            yield from iter_capture_files(self.files)
+        else:
+            # 每个文件只读取时间范围内的记录
+            yield from iter_capture_files(
+                self.files, lambda path: (record for _, record in iter_records_between(path, since, until))
+            )
+    
+    def _iter_numbered(self, since=None, until=None):
+        """按读取顺序逐条读取 (记录序号, 记录字典)，序号从1开始，搜索结果和请求详情使用这个序号
+
+        指定since/until(毫秒时间戳)时通过偏移索引只读取时间范围内的记录，序号不变
+        """
+        if since is None and until is None:
+            number = 0
+            for path in self.files:
+                for record in iter_capture_file(path):
+                    number += 1
+                    yield number, record
             return
+        base = 0
+        for path in self.files:
+            offsets = _open_offsets(path)
+            if offsets is None:
+                # 旧版JSON日志没有偏移索引(或无法建立)，逐条读取后比较
+                count = 0
+                for count, record in enumerate(iter_capture_file(path), 1):
+                    ms = record_epoch_ms(record)
+                    if ms and (since is None or ms >= since) and (until is None or ms <= until):
+                        yield base + count, record
+                base += count
+                continue
+            with offsets:
+                for ordinal, record in offsets.iter_read(offsets.between(since, until)):
+                    yield base + ordinal + 1, record
+                base += len(offsets)
+    
+    def iter_records(self):
+        """按读取顺序逐条读取选中日志中的记录(FlowRecord)，同一时刻只有当前记录在内存中"""
+        for record in self._iter_dicts():
+            yield FlowRecord.from_dict(record)
+    
+    def _has_data(self):
+        return bool(self.files) or (self.db is not None and self.db.count() > 0)
+    
+    def analyze_summary(self, columns=None):
+        """分析总览，columns为筛选后的列数据，默认为选中的全部日志"""
+        if columns is None:
+            if not self._has_data():
+                print(f"{Fore.RED}❌ 没有数据可分析{Style.RESET_ALL}")
+                return
+            
+            # 所有统计都在列数据上完成，不再逐条遍历记录
+            columns = self._flow_columns()
         
         print(f"\n{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
         print(f"{Fore.GREEN}📊 API请求分析总览{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
         
         # 基本统计
-        total_requests = len(self.data)
-        print(f"{Fore.YELLOW}📈 总请求数: {total_requests}{Style.RESET_ALL}")
-        
-        # 按域名分类
-        domains = defaultdict(int)
-        methods = defaultdict(int)
-        status_codes = defaultdict(int)
-        
-        for record in self.data:
-            request = record.get('request', {})
-            response = record.get('response', {})
-            
-            domains[request.get('host', 'unknown')] += 1
-            methods[request.get('method', 'unknown')] += 1
-            status_codes[response.get('status_code', 'unknown')] += 1
+        print(f"{Fore.YELLOW}📈 总请求数: {len(columns)}{Style.RESET_ALL}")
         
         # 显示统计信息
         print(f"\n{Fore.BLUE}🌐 请求域名分布:{Style.RESET_ALL}")
-        for domain, count in sorted(domains.items(), key=lambda x: x[1], reverse=True):
+        for domain, count in columns.value_counts("host"):
             print(f"  {domain}: {count}")
         
         print(f"\n{Fore.BLUE}📤 请求方法分布:{Style.RESET_ALL}")
-        for method, count in sorted(methods.items(), key=lambda x: x[1], reverse=True):
+        for method, count in columns.value_counts("method"):
             print(f"  {method}: {count}")
         
         print(f"\n{Fore.BLUE}📥 响应状态码分布:{Style.RESET_ALL}")
-        for status, count in sorted(status_codes.items(), key=lambda x: x[1], reverse=True):
+        for status, count in columns.value_counts("status"):
             color = Fore.GREEN if str(status).startswith('2') else Fore.RED if str(status).startswith('4') or str(status).startswith('5') else Fore.YELLOW
             print(f"  {color}{status}: {count}{Style.RESET_ALL}")
+        
+        # 每分钟请求数
+        minutes = columns.per_minute()
+        if minutes:
+            def minute_text(timestamp):
+                return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+            span = (minutes[-1][0] - minutes[0][0]) // 60 + 1
+            peak = max(minutes, key=lambda item: item[1])
+            print(f"\n{Fore.BLUE}⏱️  请求速率:{Style.RESET_ALL}")
+            print(f"  时间范围: {minute_text(minutes[0][0])} ~ {minute_text(minutes[-1][0])} ({span} 分钟)")
+            print(f"  平均: {sum(count for _, count in minutes) / span:.1f} 次/分钟, "
+                  f"峰值: {peak[1]} 次/分钟 ({minute_text(peak[0])})")
+        
+        # 各主机流量
+        print(f"\n{Fore.BLUE}📦 各主机流量 (前10):{Style.RESET_ALL}")
+        print(f"  {'主机':<40}{'请求数':>8}{'上行':>12}{'下行':>12}")
+        for host, requests, sent, received in columns.host_traffic()[:10]:
+            print(f"  {host[:40]:<40}{requests:>8}{sent / 1024:>10.1f}KB{received / 1024:>10.1f}KB")
+        
+        # 主机×状态码
+        hosts, statuses, rows = columns.status_by_host()
+        print(f"\n{Fore.BLUE}🧮 各主机状态码 (前10):{Style.RESET_ALL}")
+        print(f"  {'主机':<40}" + "".join(f"{status:>8}" for status in statuses))
+        for host, row in list(zip(hosts, rows))[:10]:
+            print(f"  {host[:40]:<40}" + "".join(f"{count:>8}" for count in row))
+        
+        # 耗时分位数
+        latencies = columns.latency_percentiles()
+        if latencies:
+            print(f"\n{Fore.BLUE}⏱️  响应耗时分位数 (前10个主机):{Style.RESET_ALL}")
+            print(f"  {'主机':<40}{'次数':>8}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES))
+            for host, count, *values in latencies[:11]:
+                label = "全部" if host == "*" else host[:40]
+                print(f"  {label:<40}{count:>8}" + "".join(f"{value * 1000:>8.1f}ms" for value in values))
+        
+        # 接口模板: URL中的ID和易变查询值归一化后再统计
+        endpoints = columns.endpoint_stats()
+        print(f"\n{Fore.BLUE}🧭 接口模板 (共{len(endpoints)}个, 前15):{Style.RESET_ALL}")
+        print(f"  {'次数':>6}{'错误率':>8}" + "".join(f"{'p' + str(p):>10}" for p in ENDPOINT_PERCENTILES)
+              + f"{'上行':>12}{'下行':>12}  接口")
+        for template, count, error_rate, sent, received, *values in endpoints[:15]:
+            color = Fore.RED if error_rate >= 0.5 else Fore.YELLOW if error_rate > 0 else ""
+            print(f"  {count:>6}{color}{error_rate:>8.1%}{Style.RESET_ALL if color else ''}"
+                  + "".join(f"{value * 1000:>8.1f}ms" if value is not None else f"{'-':>10}" for value in values)
+                  + f"{sent / 1024:>10.1f}KB{received / 1024:>10.1f}KB  {template[:100]}")
+    
+    def _flow_columns(self):
+        """选中日志的列数据(只遍历一次记录)，日志没有变化时复用上次的结果"""
+        if self.db:
+            key = (self.db.path, self.db.count())
+        else:
+            key = tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in self.files)
+        if self._columns_key != key:
+            if self.db:
+                # 数据库直接取出列，不解析完整记录
+                self._columns = FlowColumns.from_rows(self.db.iter_columns())
+            else:
+                # 各文件在进程池中并行投影，再按文件顺序合并
+                self._columns = FlowColumns()
+                for _, file_columns in map_capture_files(project_capture_file, self.files, self.workers):
+                    self._columns.extend(file_columns)
+            self._columns_key = key
+        return self._columns
     
-    def search_requests(self, keyword=None, method=None, status_code=None):
-        """搜索特定请求"""
-        if not self.data:
+    def search_requests(self, keyword=None, method=None, status_code=None, since=None, until=None):
+        """搜索特定请求，since/until为请求时间范围(毫秒时间戳)"""
+        if not self._has_data():
             print(f"{Fore.RED}❌ 没有数据可搜索{Style.RESET_ALL}")
             return
         
-        filtered_data = self.data
-        
-        # 按关键词过滤
-        if keyword:
-            filtered_data = [
-                record for record in filtered_data
-                if keyword.lower() in record.get('request', {}).get('url', '').lower()
-                or keyword.lower() in record.get('request', {}).get('host', '').lower()
-            ]
-        
-        # 按方法过滤
-        if method:
-            filtered_data = [
-                record for record in filtered_data
-                if record.get('request', {}).get('method', '').upper() == method.upper()
-            ]
-        
-        # 按状态码过滤
-        if status_code:
-            filtered_data = [
-                record for record in filtered_data
-                if record.get('response', {}).get('status_code') == status_code
-            ]
-        
-        print(f"\n{Fore.GREEN}🔍 搜索结果: 找到 {len(filtered_data)} 条记录{Style.RESET_ALL}")
-        
-        for i, record in enumerate(filtered_data[:10]):  # 只显示前10条
-            self._print_record_summary(record, i+1)
-        
-        if len(filtered_data) > 10:
-            print(f"{Fore.YELLOW}... 还有 {len(filtered_data)-10} 条记录{Style.RESET_ALL}")
+        if self.db:
+            # 走索引和全文索引，只取出要显示的10条
+            total = self.db.search_count(keyword, method, status_code, since=since, until=until)
+            print(f"\n{Fore.GREEN}🔍 搜索结果: 找到 {total} 条记录{Style.RESET_ALL}")
+            for index, record in self.db.search(keyword, method, status_code, since=since, until=until, limit=10):
+                self._print_record_summary(FlowRecord.from_dict(record), index)
+            if total > 10:
+                print(f"{Fore.YELLOW}... 还有 {total-10} 条记录{Style.RESET_ALL}")
+            return
+        
+        index = self._search_index()
+        if index:
+            # 倒排索引直接给出所有命中记录的位置，只读取要显示的10条
+            hits = index.search(self.files, keyword, method, status_code or None)
+            if since is not None or until is not None:
+                hits = self._hits_between(hits, since, until)
+            offsets = list(itertools.accumulate([0] + index.record_counts(self.files)))
+            print(f"\n{Fore.GREEN}🔍 搜索结果: 找到 {len(hits)} 条记录{Style.RESET_ALL}")
+            shown = hits[:10]
+            wanted = defaultdict(list)
+            for position, ordinal in shown:
+                wanted[position].append(ordinal)
+            records = {position: self._read_records(self.files[position], ordinals)
+                       for position, ordinals in wanted.items()}
+            for position, ordinal in shown:
+                record = records[position].get(ordinal)
+                if record is not None:
+                    self._print_record_summary(FlowRecord.from_dict(record), offsets[position] + ordinal + 1)
+            if len(hits) > 10:
+                print(f"{Fore.YELLOW}... 还有 {len(hits)-10} 条记录{Style.RESET_ALL}")
+            return
+        
+        # 没有索引时流式过滤，只保留要显示的前10条
+        keyword = keyword.lower() if keyword else None
+        total = 0
+        matches = []
+        for index, record in self._iter_numbered(since, until):
+            record = FlowRecord.from_dict(record)
+            # 按关键词过滤
+            if keyword and keyword not in (record.url or '').lower() and keyword not in (record.host or '').lower():
+                continue
+            # 按方法过滤
+            if method and (record.method or '').upper() != method.upper():
+                continue
+            # 按状态码过滤
+            if status_code and record.status_code != status_code:
+                continue
+            total += 1
+            if len(matches) < 10:
+                matches.append((index, record))
+        
+        print(f"\n{Fore.GREEN}🔍 搜索结果: 找到 {total} 条记录{Style.RESET_ALL}")
+        
+        for index, record in matches:  # 只显示前10条
+            self._print_record_summary(record, index)
+        
+        if total > 10:
+            print(f"{Fore.YELLOW}... 还有 {total-10} 条记录{Style.RESET_ALL}")
+    
+    def iter_query(self, query=None, since=None, until=None):
+        """逐条返回满足过滤表达式(RecordQuery或字符串)的 (记录序号, 记录字典)，按序号顺序
+
+        表达式中的关键词、方法、状态码和时间条件先交给数据库或搜索索引筛选，
+        没有这些条件时按时间范围流式读取；生成器是惰性的，只取前几条时后面的记录不会被读取
+        """
+        if not isinstance(query, RecordQuery):
+            query = RecordQuery(query)
+        since, until = query.time_range(since, until)
+        hints = query.hints
+        if self.db:
+            source = self.db.iter_search(hints.get("keyword"), hints.get("method"), hints.get("status_code"),
+                                         since=since, until=until)
+        elif any(key in hints for key in ("keyword", "method", "status_code")) and self._search_index():
+            source = self._iter_hits(hints, since, until)
+        else:
+            source = self._iter_numbered(since, until)
+        for number, record in source:
+            if query.match(record):
+                yield number, record
+    
+    def _iter_hits(self, hints, since, until, chunk_size=256):
+        """按搜索索引的命中位置分批读取记录，逐条返回 (记录序号, 记录字典)"""
+        hits = self.index.search(self.files, hints.get("keyword"), hints.get("method"), hints.get("status_code"))
+        if since is not None or until is not None:
+            hits = self._hits_between(hits, since, until)
+        offsets = list(itertools.accumulate([0] + self.index.record_counts(self.files)))
+        for start in range(0, len(hits), chunk_size):
+            chunk = hits[start:start + chunk_size]
+            wanted = defaultdict(list)
+            for position, ordinal in chunk:
+                wanted[position].append(ordinal)
+            records = {position: self._read_records(self.files[position], ordinals)
+                       for position, ordinals in wanted.items()}
+            for position, ordinal in chunk:
+                record = records[position].get(ordinal)
+                if record is not None:
+                    yield offsets[position] + ordinal + 1, record
     
-    def show_request_detail(self, index):
-        """显示请求详情"""
-        if not self.data or index < 1 or index > len(self.data):
+    def _hits_between(self, hits, since, until):
+        """只保留请求时间在范围内的索引命中 [(文件位置, 序号)]，时间从偏移索引中读取"""
+        by_file = defaultdict(list)
+        for position, ordinal in hits:
+            by_file[position].append(ordinal)
+        kept = set()
+        for position, ordinals in by_file.items():
+            path = self.files[position]
+            offsets = _open_offsets(path)
+            if offsets is None:
+                allowed = {ordinal for ordinal, _ in iter_records_between(path, since, until)}
+                kept.update((position, ordinal) for ordinal in ordinals if ordinal in allowed)
+                continue
+            with offsets:
+                for ordinal in ordinals:
+                    ms = offsets.timestamp(ordinal) if ordinal < len(offsets) else 0
+                    if ms and (since is None or ms >= since) and (until is None or ms <= until):
+                        kept.add((position, ordinal))
+        return [hit for hit in hits if hit in kept]
+    
+    def _search_index(self):
+        """打开日志目录中的搜索索引并为新增或变化的日志文件建立索引，无法使用时返回None"""
+        try:
+            if self.index is None:
+                self.index = SearchIndex(os.path.join(self.log_dir, INDEX_NAME))
+            updated = self.index.update(self.files, self.workers)
+        except (sqlite3.Error, OSError) as e:
+            print(f"{Fore.YELLOW}⚠️  搜索索引不可用，改为逐条扫描: {e}{Style.RESET_ALL}")
+            return None
+        if updated:
+            print(f"{Fore.GREEN}🗂️  已为 {len(updated)} 个日志文件更新搜索索引{Style.RESET_ALL}")
+        return self.index
+    
+    def _read_records(self, path, ordinals):
+        """读取日志文件中指定序号(从0开始)的记录，返回 {序号: 记录}"""
+        try:
+            # 通过偏移索引只读取并解码这几条记录
+            with RecordOffsets(path) as offsets:
+                return offsets.read_many(ordinals)
+        except (ValueError, OSError):
+            pass
+        # 旧版JSON日志没有偏移索引，逐条读取
+        wanted = set(ordinals)
+        last = max(wanted)
+        records = {}
+        for ordinal, record in enumerate(iter_capture_file(path)):
+            if ordinal in wanted:
+                records[ordinal] = record
+            if ordinal >= last:
+                break
+        return records
+    
+    def _get_record(self, number):
+        """按记录序号取出记录，不存在时返回None"""
+        if number < 1:
+            return None
+        for path in self.files:
+            try:
+                # 偏移索引中的记录数用来定位文件，只解码目标记录
+                with RecordOffsets(path) as offsets:
+                    if number <= len(offsets):
+                        return offsets.read(number - 1)
+                    number -= len(offsets)
+                    continue
+            except (ValueError, OSError):
+                pass
+            for record in iter_capture_file(path):
+                number -= 1
+                if number == 0:
+                    return record
+        return None
+    
+    def record_at(self, index):
+        """按记录序号取出记录(数据库或日志文件)，不存在时返回None"""
+        return self.db.get(index) if self.db else self._get_record(index)
+
+    def show_request_detail(self, index, record=None):
+        """显示请求详情，record为已经取出的记录"""
+        if record is None:
+            record = self.record_at(index)
+        if record is None:
             print(f"{Fore.RED}❌ 无效的记录索引{Style.RESET_ALL}")
             return
         
-        record = self.data[index-1]
         request = record.get('request', {})
         response = record.get('response', {})
         
@@ -156,13 +467,14 @@ class LogAnalyzer:
             print(f"\n{Fore.CYAN}🔍 查询参数:{Style.RESET_ALL}")
             print(json.dumps(request['query_params'], ensure_ascii=False, indent=2))
         
-        # 请求体
-        if request.get('body'):
+        # 请求体(存在blob中的body此时才读取)
+        request_body = self._body(request)
+        if request_body:
             print(f"\n{Fore.YELLOW}📦 请求体:{Style.RESET_ALL}")
-            if isinstance(request['body'], (dict, list)):
-                print(json.dumps(request['body'], ensure_ascii=False, indent=2))
+            if isinstance(request_body, (dict, list)):
+                print(json.dumps(request_body, ensure_ascii=False, indent=2))
             else:
-                print(request['body'])
+                print(request_body)
         
         # 响应信息
         print(f"\n{Fore.BLUE}📥 响应信息:{Style.RESET_ALL}")
@@ -176,43 +488,166 @@ class LogAnalyzer:
                 print(f"  {key}: {value}")
         
         # 响应体
-        if response.get('body'):
+        response_body = self._body(response)
+        if response_body:
             print(f"\n{Fore.GREEN}📄 响应体:{Style.RESET_ALL}")
-            if isinstance(response['body'], (dict, list)):
-                print(json.dumps(response['body'], ensure_ascii=False, indent=2))
+            if isinstance(response_body, (dict, list)):
+                print(json.dumps(response_body, ensure_ascii=False, indent=2))
             else:
-                print(str(response['body'])[:1000] + "..." if len(str(response['body'])) > 1000 else response['body'])
+                print(str(response_body)[:1000] + "..." if len(str(response_body)) > 1000 else response_body)
+    
+    def _body(self, part):
+        """按需解码请求或响应的body(包括读取blob)，结果由共享解码器缓存"""
+        return decode_body(part, self.current_file)
     
-    def _print_record_summary(self, record, index):
+    def _print_record_summary(self, record, index, file=None):
         """打印记录摘要"""
-        request = record.get('request', {})
-        response = record.get('response', {})
+        method = record.method or 'N/A'
+        url = record.url or 'N/A'
+        status = record.status_code if record.status_code is not None else 'N/A'
+        timestamp = record.timestamp or 'N/A'
         
-        method = request.get('method', 'N/A')
-        url = request.get('url', 'N/A')
-        status = response.get('status_code', 'N/A')
-        timestamp = request.get('timestamp', 'N/A')
+        if isinstance(status, int):
+            status_color = Fore.GREEN if 200 <= status < 300 else Fore.RED if status >= 400 else Fore.YELLOW
+        else:
+            status_color = Fore.YELLOW
         
-        status_color = Fore.GREEN if 200 <= status < 300 else Fore.RED if status >= 400 else Fore.YELLOW
+        print(f"{Fore.CYAN}[{index}]{Style.RESET_ALL} {method} {url}", file=file)
+        print(f"     状态: {status_color}{status}{Style.RESET_ALL} | 时间: {timestamp}", file=file)
+    
+    def follow(self, refresh=1.0):
+        """实时跟踪日志: 只读取新追加的记录，增量更新总览统计和搜索索引，
+        每refresh秒刷新一次简要视图(与流量大小无关)，按Ctrl+C返回
+        """
+        if self.db:
+            print(f"{Fore.YELLOW}⚠️  实时跟踪只支持JSONL日志，不支持数据库{Style.RESET_ALL}")
+            return
+        if not self.files:
+            print(f"{Fore.RED}❌ 没有可跟踪的日志{Style.RESET_ALL}")
+            return
         
-        print(f"{Fore.CYAN}[{index}]{Style.RESET_ALL} {method} {url}")
-        print(f"     状态: {status_color}{status}{Style.RESET_ALL} | 时间: {timestamp}")
+        tailer = CaptureTailer(self.log_dir, self.files)
+        watcher = DirectoryWatcher(self.log_dir)
+        index = self._search_index_handle()
+        columns = FlowColumns()
+        live = LiveSummary()
+        # 各文件读到末尾时的状态，退出时用来判断列数据是否完整
+        stats = {}
+        catching_up = True
+        next_refresh = 0.0
+        try:
+            while True:
+                new_files, moved = tailer.discover()
+                for old_path, new_path in moved:
+                    self.files[self.files.index(old_path)] = new_path
+                    stats.pop(old_path, None)
+                    if index:
+                        index.rename(old_path, new_path)
+                self.files.extend(new_files)
+                
+                for path, first_ordinal, records, stat in tailer.read():
+                    for record in records:
+                        columns.add_record(record)
+                    live.add(records, arrived=not catching_up)
+                    if index:
+                        index.append(path, first_ordinal, records, stat)
+                    if stat:
+                        stats[path] = stat
+                    # 启动时读取已有日志也按固定频率刷新
+                    if time.monotonic() >= next_refresh:
+                        self._render_live(live, watcher.backend, refresh)
+                        next_refresh = time.monotonic() + refresh
+                catching_up = False
+                
+                if time.monotonic() >= next_refresh:
+                    self._render_live(live, watcher.backend, refresh)
+                    next_refresh = time.monotonic() + refresh
+                watcher.wait(max(next_refresh - time.monotonic(), 0))
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⏹️  已停止跟踪，共 {live.total} 条记录{Style.RESET_ALL}")
+        finally:
+            watcher.close()
+            # 增量得到的列数据留给总览统计使用，文件在读取后又有变化时会重新投影
+            self._columns = columns
+            self._columns_key = None
+            if all(path in stats for path in self.files):
+                self._columns_key = tuple(
+                    (path, stats[path].st_mtime, stats[path].st_size) for path in self.files
+                )
     
-    def export_summary(self, output_file="api_summary.txt"):
-        """导出分析摘要"""
-        if not self.data:
+    def _search_index_handle(self):
+        """打开搜索索引但不更新，无法使用时返回None"""
+        try:
+            if self.index is None:
+                self.index = SearchIndex(os.path.join(self.log_dir, INDEX_NAME))
+        except (sqlite3.Error, OSError) as e:
+            print(f"{Fore.YELLOW}⚠️  搜索索引不可用: {e}{Style.RESET_ALL}")
+        return self.index
+    
+    def _render_live(self, live, backend, refresh):
+        """重绘实时视图(清屏后从左上角输出)"""
+        lines = [
+            f"{Fore.GREEN}📡 实时跟踪 {self.log_dir}/ ({backend}, 每{refresh:g}秒刷新, Ctrl+C返回){Style.RESET_ALL}",
+            f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}",
+            f"{Fore.YELLOW}📈 总请求数: {live.total} | 最近{live.window}秒: {live.rate():.1f} 次/秒 | "
+            f"文件: {len(self.files)}{Style.RESET_ALL}",
+        ]
+        latency = live.latency()
+        if latency:
+            lines.append(f"⏱️  耗时(最近{len(live.durations)}条): p50 {latency[0] * 1000:.1f}ms, "
+                         f"p90 {latency[1] * 1000:.1f}ms")
+        lines.append(f"{Fore.BLUE}🌐 主机 (前5):{Style.RESET_ALL} " +
+                     ", ".join(f"{host}: {count}" for host, count in live.hosts.most_common(5)))
+        lines.append(f"{Fore.BLUE}📥 状态码:{Style.RESET_ALL} " +
+                     ", ".join(f"{status}: {count}" for status, count in live.statuses.most_common(8)))
+        lines.append(f"{Fore.BLUE}🕒 最近请求:{Style.RESET_ALL}")
+        for record in reversed(live.recent):
+            request = record.get('request') or {}
+            response = record.get('response') or {}
+            status = response.get('status_code', 'N/A')
+            lines.append(f"  {status} {request.get('method', 'N/A')} {(request.get('url') or 'N/A')[:100]}")
+        print("\033[H\033[J" + "\n".join(lines), flush=True)
+    
+    def endpoint_profile(self, since=None, until=None, label=None, templates=None):
+        """流式读取一遍选中的日志，按接口模板统计(用于两次抓包的对比)"""
+        return EndpointProfile(label or self.current_file, templates).add_records(self._iter_dicts(since, until))
+    
+    def export_summary(self, output_file="api_summary.txt", since=None, until=None, query=None, limit=None, offset=0):
+        """导出分析摘要，since/until为请求时间范围(毫秒时间戳)
+
+        指定过滤表达式query时只导出满足条件的记录，编号为记录序号(可用于查看详情)；
+        limit/offset只导出其中的一段，末尾的总请求数是满足条件的全部记录数
+        """
+        if not self._has_data():
             print(f"{Fore.RED}❌ 没有数据可导出{Style.RESET_ALL}")
             return
         
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write("API请求分析摘要\n")
             f.write("="*60 + "\n\n")
+            if since is not None or until is not None:
+                f.write(f"时间范围: {ms_to_iso(since) if since is not None else '-'} ~ "
+                        f"{ms_to_iso(until) if until is not None else '-'}\n")
+            if query:
+                f.write(f"过滤条件: {query.text if isinstance(query, RecordQuery) else query}\n")
+            if since is not None or until is not None or query:
+                f.write("\n")
             
-            # 基本统计
-            f.write(f"总请求数: {len(self.data)}\n\n")
-            
-            # 详细记录
-            for i, record in enumerate(self.data, 1):
+            # 详细记录，编号为记录序号(与搜索结果、请求详情相同)；数据库按其中的序号
+            if query or self.db:
+                numbered = self.iter_query(query, since, until)
+            else:
+                numbered = self._iter_numbered(since, until)
+            start = offset or 0
+            end = None if limit is None else start + limit
+            total = 0
+            shown = 0
+            for i, record in numbered:
+                # 总数要数完所有记录，limit/offset之外的记录只计数
+                total += 1
+                if total <= start or (end is not None and total > end):
+                    continue
+                shown += 1
                 request = record.get('request', {})
                 response = record.get('response', {})
                 
@@ -223,16 +658,325 @@ class LogAnalyzer:
                 if request.get('query_params'):
                     f.write(f"    查询参数: {json.dumps(request['query_params'], ensure_ascii=False)}\n")
                 
-                if request.get('body'):
-                    f.write(f"    请求体: {json.dumps(request['body'], ensure_ascii=False) if isinstance(request['body'], (dict, list)) else request['body']}\n")
+                request_body = self._body(request)
+                if request_body:
+                    f.write(f"    请求体: {json.dumps(request_body, ensure_ascii=False) if isinstance(request_body, (dict, list)) else request_body}\n")
                 
                 f.write("\n")
+            
+            # 基本统计写在末尾，不需要回头修改文件
+            f.write("="*60 + "\n")
+            f.write(f"总请求数: {total}\n")
+            if shown != total:
+                f.write(f"本次导出: {shown} 条 (从第 {start + 1} 条起)\n")
         
         print(f"{Fore.GREEN}✅ 摘要已导出到: {output_file}{Style.RESET_ALL}")
 
+def ask_time_range(default_since=None, default_until=None):
+    """在菜单中询问时间范围，直接回车使用命令行中的--since/--until；格式错误时返回None"""
+    since_text = input(f"{Fore.CYAN}开始时间 (可选，如 17:16): {Style.RESET_ALL}").strip()
+    until_text = input(f"{Fore.CYAN}结束时间 (可选，如 17:19): {Style.RESET_ALL}").strip()
+    try:
+        since = parse_time_bound(since_text) if since_text else default_since
+        until = parse_until_bound(until_text) if until_text else default_until
+    except ValueError:
+        print(f"{Fore.RED}❌ 无法识别的时间，可用格式: 17:16、2025-05-28T17:16、2025-05-28{Style.RESET_ALL}")
+        return None
+    return since, until
+
+def paginate(rows, limit=None, offset=0):
+    """跳过前offset条，最多返回limit条(None表示不限)；取够后不再从rows中读取"""
+    return itertools.islice(rows, offset or 0, None if limit is None else (offset or 0) + limit)
+
+# CSV输出的列(search/detail/export)
+CSV_FIELDS = ("index", "timestamp", "method", "status", "host", "url",
+              "duration_ms", "request_size", "response_size")
+
+def record_row(number, record):
+    """记录的一行摘要，用于CSV输出"""
+    request = record.get('request') or {}
+    response = record.get('response') or {}
+    duration = response.get('response_time')
+    return {
+        "index": number,
+        "timestamp": request.get('timestamp'),
+        "method": request.get('method'),
+        "status": response.get('status_code'),
+        "host": request.get('host'),
+        "url": request.get('url'),
+        "duration_ms": round(duration * 1000, 3) if duration is not None else None,
+        "request_size": request.get('body_size'),
+        "response_size": response.get('body_size'),
+    }
+
+def write_records(analyzer, rows, output_format, out):
+    """把 (记录序号, 记录字典) 逐条写出: text为带颜色的摘要，jsonl为完整记录(加上index)，csv为摘要列，返回条数"""
+    count = 0
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+    for number, record in rows:
+        count += 1
+        if output_format == "jsonl":
+            out.write(dumps({"index": number, **record}) + "\n")
+        elif writer:
+            writer.writerow(record_row(number, record))
+        else:
+            analyzer._print_record_summary(FlowRecord.from_dict(record), number, file=out)
+    return count
+
+def _milliseconds(value):
+    return round(value * 1000, 3) if value is not None else None
+
+def summary_rows(columns, limit=None, offset=0):
+    """总览统计的JSON行: total，以及host/method/status分布、各主机耗时分位数、接口模板(每节按limit/offset截取)"""
+    yield {"section": "total", "count": len(columns)}
+    for name in ("host", "method", "status"):
+        for value, count in paginate(columns.value_counts(name), limit, offset):
+            yield {"section": name, "value": value, "count": count}
+    for host, count, *values in paginate(columns.latency_percentiles(), limit, offset):
+        yield {"section": "latency", "host": host, "count": count,
+               **{f"p{p}_ms": _milliseconds(value) for p, value in zip(PERCENTILES, values)}}
+    for row in paginate(columns.endpoint_stats(), limit, offset):
+        yield {"section": "endpoint", **endpoint_row(row)}
+
+def endpoint_row(row):
+    """endpoint_stats的一行转为字典，耗时为毫秒"""
+    template, count, error_rate, sent, received, *values = row
+    return {"endpoint": template, "count": count, "error_rate": round(error_rate, 4),
+            "request_bytes": sent, "response_bytes": received,
+            **{f"p{p}_ms": _milliseconds(value) for p, value in zip(ENDPOINT_PERCENTILES, values)}}
+
+def resolve_capture(spec, log_dir="logs"):
+    """命令行中的抓包: 日志文件或数据库路径、日志目录、会话名(api_requests_YYYYMMDD_HHMMSS
+    或YYYYMMDD_HHMMSS)、all(目录中的所有日志)或latest(最新的会话)，返回文件列表，latest返回None
+    """
+    if spec == "latest":
+        return None
+    if spec == "all":
+        return find_capture_files(log_dir)
+    if os.path.isdir(spec):
+        return find_capture_files(spec)
+    if os.path.isfile(spec):
+        return [spec]
+    session = spec if spec.startswith("api_requests_") else f"api_requests_{spec}"
+    return session_capture_files(log_dir, session)
+
+def load_capture(spec, log_dir="logs", workers=None):
+    """按resolve_capture加载一份抓包，加载信息输出到stderr，找不到时返回None"""
+    analyzer = LogAnalyzer(log_dir, workers)
+    files = resolve_capture(spec, log_dir)
+    if files == []:
+        print(f"{Fore.RED}❌ 未找到抓包: {spec}{Style.RESET_ALL}", file=sys.stderr)
+        return None
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = analyzer.load_logs(files)
+    return analyzer if loaded else None
+
+def run_diff(args):
+    """diff命令: 按接口比较两份抓包，结果以JSON输出"""
+    before = load_capture(args.before, args.log_dir)
+    after = load_capture(args.after, args.log_dir)
+    if before is None or after is None:
+        return 1
+    # 两边共用前缀树缓存，同一个URL只归一化一次
+    before_profile = before.endpoint_profile(args.before_since, args.before_until, args.before)
+    after_profile = after.endpoint_profile(args.after_since, args.after_until, args.after,
+                                           before_profile._templates)
+    result = diff_profiles(before_profile, after_profile, min_count=args.min_count)
+    for profile, since, until in ((result["before"], args.before_since, args.before_until),
+                                  (result["after"], args.after_since, args.after_until)):
+        profile["since"] = ms_to_iso(since) if since is not None else None
+        profile["until"] = ms_to_iso(until) if until is not None else None
+    text = dumps(result, pretty=args.pretty)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        totals = result["totals"]
+        print(f"{Fore.GREEN}✅ 对比结果已写入: {args.output} (新增接口 {totals['new_endpoints']}, "
+              f"消失 {totals['vanished_endpoints']}, 变化 {totals['changed_endpoints']}){Style.RESET_ALL}",
+              file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+@contextlib.contextmanager
+def _command_output(args):
+    """命令的输出流: -o指定的文件或stdout；输出JSONL/CSV时加载和索引信息改为输出到stderr，不混入结果"""
+    machine = args.format != "text"
+    if args.output:
+        f = open(args.output, 'w', encoding='utf-8', newline='' if args.format == "csv" else None)
+        # 文本写入文件时去掉颜色
+        out = f if machine else AnsiToWin32(f, strip=True).stream
+    else:
+        f = None
+        out = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr) if machine or args.output else contextlib.nullcontext():
+            yield out
+    finally:
+        if f:
+            f.close()
+
+def _command_query(args):
+    """命令行中的过滤表达式，格式错误时输出原因并返回None"""
+    try:
+        return RecordQuery(args.query)
+    except ValueError as e:
+        print(f"{Fore.RED}❌ {e}{Style.RESET_ALL}", file=sys.stderr)
+        return None
+
+def run_summary(args):
+    """summary命令: 总览统计，有过滤表达式或时间范围时只统计满足条件的记录"""
+    query = _command_query(args)
+    if query is None:
+        return 2
+    analyzer = load_capture(args.capture, args.log_dir, args.workers)
+    if analyzer is None:
+        return 1
+    with _command_output(args) as out:
+        if query.text or args.since is not None or args.until is not None:
+            columns = FlowColumns.from_records(record for _, record in analyzer.iter_query(query, args.since, args.until))
+        else:
+            columns = analyzer._flow_columns()
+        if args.format == "text":
+            with contextlib.redirect_stdout(out):
+                analyzer.analyze_summary(columns)
+        elif args.format == "jsonl":
+            for row in summary_rows(columns, args.limit, args.offset):
+                out.write(dumps(row) + "\n")
+        else:
+            rows = [endpoint_row(row) for row in paginate(columns.endpoint_stats(), args.limit, args.offset)]
+            writer = csv.DictWriter(out, fieldnames=["endpoint", "count", "error_rate", "request_bytes", "response_bytes"]
+                                    + [f"p{p}_ms" for p in ENDPOINT_PERCENTILES])
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+def run_search(args):
+    """search命令: 按过滤表达式惰性地查找记录，取够--limit条后停止读取"""
+    query = _command_query(args)
+    if query is None:
+        return 2
+    analyzer = load_capture(args.capture, args.log_dir, args.workers)
+    if analyzer is None:
+        return 1
+    with _command_output(args) as out:
+        rows = paginate(analyzer.iter_query(query, args.since, args.until), args.limit, args.offset)
+        count = write_records(analyzer, rows, args.format, out)
+    if args.format == "text" or args.output:
+        print(f"{Fore.GREEN}🔍 输出 {count} 条记录{Style.RESET_ALL}", file=sys.stderr)
+    return 0
+
+def run_detail(args):
+    """detail命令: 按记录序号输出完整记录"""
+    analyzer = load_capture(args.capture, args.log_dir, args.workers)
+    if analyzer is None:
+        return 1
+    missing = []
+    with _command_output(args) as out:
+        found = []
+        for index in args.indices:
+            record = analyzer.record_at(index)
+            if record is None:
+                missing.append(index)
+            else:
+                found.append((index, record))
+        if args.format == "text":
+            with contextlib.redirect_stdout(out):
+                for index, record in found:
+                    analyzer.show_request_detail(index, record)
+        else:
+            write_records(analyzer, found, args.format, out)
+    if missing:
+        print(f"{Fore.RED}❌ 无效的记录索引: {', '.join(map(str, missing))}{Style.RESET_ALL}", file=sys.stderr)
+        return 1
+    return 0
+
+def run_export(args):
+    """export命令: 导出满足条件的记录，text为交互菜单中的摘要格式"""
+    query = _command_query(args)
+    if query is None:
+        return 2
+    analyzer = load_capture(args.capture, args.log_dir, args.workers)
+    if analyzer is None:
+        return 1
+    if args.format == "text":
+        with contextlib.redirect_stdout(sys.stderr):
+            analyzer.export_summary(args.output or "api_summary.txt", args.since, args.until,
+                                    query if query.text else None, args.limit, args.offset)
+        return 0
+    with _command_output(args) as out:
+        rows = paginate(analyzer.iter_query(query, args.since, args.until), args.limit, args.offset)
+        count = write_records(analyzer, rows, args.format, out)
+    print(f"{Fore.GREEN}✅ 已导出 {count} 条记录{Style.RESET_ALL}", file=sys.stderr)
+    return 0
+
+def _non_negative(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError("不能小于0")
+    return value
+
 def main():
-    """主函数"""
-    analyzer = LogAnalyzer()
+    """主函数: 不带命令时进入交互菜单"""
+    parser = argparse.ArgumentParser(description="API请求日志分析工具")
+    parser.add_argument("--log-dir", default="logs", help="日志目录 (默认: logs)")
+    parser.add_argument("--since", type=parse_time_bound, default=None,
+                        help="搜索和导出默认只包含此时间之后的请求，如 17:16、2025-05-28T17:16")
+    parser.add_argument("--until", type=parse_until_bound, default=None,
+                        help="搜索和导出默认只包含此时间之前的请求，如 17:19 (包含17:19这一分钟)")
+    commands = parser.add_subparsers(dest="command")
+    
+    diff = commands.add_parser("diff", help="按接口对比两份抓包或两个时间范围，输出JSON")
+    diff.add_argument("before", help="基准抓包: 日志文件/数据库/目录、会话名(如20250528_171628)、all或latest")
+    diff.add_argument("after", help="对比的抓包，格式同上；对比同一份抓包的两个时间范围时两者相同")
+    for side in ("before", "after"):
+        diff.add_argument(f"--{side}-since", type=parse_time_bound, default=None,
+                          help=f"{side}只包含此时间之后的请求")
+        diff.add_argument(f"--{side}-until", type=parse_until_bound, default=None,
+                          help=f"{side}只包含此时间之前的请求")
+    diff.add_argument("--min-count", type=int, default=1, help="两边调用次数都小于此值的接口不列出")
+    diff.add_argument("-o", "--output", help="写入文件 (默认输出到stdout)")
+    diff.add_argument("--pretty", action="store_true", help="缩进格式的JSON")
+    
+    # summary/search/detail/export的公共选项，--since/--until也可以写在命令之后
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-c", "--capture", default="latest",
+                        help="要分析的抓包: 日志文件/数据库/目录、会话名、all或latest (默认: latest)")
+    common.add_argument("--since", type=parse_time_bound, default=argparse.SUPPRESS, help="只包含此时间之后的请求")
+    common.add_argument("--until", type=parse_until_bound, default=argparse.SUPPRESS, help="只包含此时间之前的请求")
+    common.add_argument("--limit", type=_non_negative, default=None, help="最多输出的条数")
+    common.add_argument("--offset", type=_non_negative, default=0, help="跳过前面的条数")
+    common.add_argument("-f", "--format", choices=("text", "jsonl", "csv"), default="text", help="输出格式 (默认: text)")
+    common.add_argument("-o", "--output", help="写入文件 (默认输出到stdout)")
+    common.add_argument("--workers", type=int, default=None, help="并行读取日志的进程数 (默认: CPU核数)")
+    query_help = "过滤表达式，如 'host~aliyun status>=400'、'api.php and duration>500' (字段见record_query.py)"
+    
+    summary = commands.add_parser("summary", parents=[common], help="总览统计 (csv为各接口模板的统计)")
+    summary.add_argument("query", nargs="?", help=query_help)
+    search = commands.add_parser("search", parents=[common], help="按过滤表达式搜索请求")
+    search.add_argument("query", nargs="?", help=query_help)
+    detail = commands.add_parser("detail", parents=[common], help="按记录序号查看请求详情")
+    detail.add_argument("indices", type=int, nargs="+", help="记录序号 (search输出中的index)")
+    export = commands.add_parser("export", parents=[common],
+                                 help="导出满足条件的记录 (text格式默认写入api_summary.txt)")
+    export.add_argument("query", nargs="?", help=query_help)
+    args = parser.parse_args()
+    
+    handlers = {"diff": run_diff, "summary": run_summary, "search": run_search,
+                "detail": run_detail, "export": run_export}
+    if args.command in handlers:
+        try:
+            return handlers[args.command](args)
+        except BrokenPipeError:
+            # 输出被管道另一端提前关闭(例如 | head)，不再输出
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+    
+    analyzer = LogAnalyzer(args.log_dir)
     
     if not analyzer.load_logs():
         return
@@ -246,6 +990,8 @@ def main():
         print(f"{Fore.YELLOW}3. 查看请求详情{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}4. 导出摘要{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}5. 重新加载日志{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}6. 加载所有日志{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}7. 实时跟踪日志{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}0. 退出{Style.RESET_ALL}")
         
         choice = input(f"\n{Fore.CYAN}请选择操作: {Style.RESET_ALL}").strip()
@@ -257,7 +1003,9 @@ def main():
             method = input(f"{Fore.CYAN}请求方法 (可选): {Style.RESET_ALL}").strip() or None
             status = input(f"{Fore.CYAN}状态码 (可选): {Style.RESET_ALL}").strip()
             status_code = int(status) if status.isdigit() else None
-            analyzer.search_requests(keyword, method, status_code)
+            time_range = ask_time_range(args.since, args.until)
+            if time_range:
+                analyzer.search_requests(keyword, method, status_code, *time_range)
         elif choice == "3":
             index = input(f"{Fore.CYAN}请求记录索引: {Style.RESET_ALL}").strip()
             if index.isdigit():
@@ -266,9 +1014,15 @@ def main():
                 print(f"{Fore.RED}❌ 请输入有效的数字{Style.RESET_ALL}")
         elif choice == "4":
             output_file = input(f"{Fore.CYAN}输出文件名 (默认: api_summary.txt): {Style.RESET_ALL}").strip() or "api_summary.txt"
-            analyzer.export_summary(output_file)
+            time_range = ask_time_range(args.since, args.until)
+            if time_range:
+                analyzer.export_summary(output_file, *time_range)
         elif choice == "5":
             analyzer.load_logs()
+        elif choice == "6":
+            analyzer.load_logs(all_files=True)
+        elif choice == "7":
+            analyzer.follow()
         elif choice == "0":
             print(f"{Fore.GREEN}👋 再见！{Style.RESET_ALL}")
             break
@@ -276,4 +1030,4 @@ def main():
             print(f"{Fore.RED}❌ 无效选择{Style.RESET_ALL}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时跟踪抓包日志
+监视日志目录(安装了inotify_simple时使用inotify，否则定时轮询)，记住每个日志文件已读到的字节位置，
+只读取新追加的完整行；分段写满被压缩后，从压缩文件中解压后的同一位置继续，不会重复或遗漏记录
+"""
+
+import os
+import time
+from collections import Counter, deque
+from capture_log import (COMPRESSION_EXTS, LEGACY_EXT, find_capture_files, iter_capture_file,
+                         open_capture_binary)
+from serialization import loads
+
+# inotify_simple可选(仅Linux)，未安装时轮询目录
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+
+def _segment_key(path):
+    """分段压缩前后是同一个键(去掉压缩扩展名的绝对路径)"""
+    for ext in COMPRESSION_EXTS.values():
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+            break
+    return os.path.abspath(path)
+
+
+class DirectoryWatcher:
+    """等待日志目录发生变化"""
+
+    def __init__(self, directory, poll_interval=0.5):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                self._inotify.add_watch(
+                    directory,
+                    inotify_flags.CREATE | inotify_flags.MODIFY | inotify_flags.MOVED_TO | inotify_flags.CLOSE_WRITE,
+                )
+            except OSError:
+                # 例如超过了fs.inotify.max_user_watches
+                self.close()
+
+    @property
+    def backend(self):
+        return "inotify" if self._inotify is not None else "polling"
+
+    def wait(self, timeout):
+        """最多等待timeout秒，目录可能有变化时返回True"""
+        if self._inotify is not None:
+            # 收到第一个事件后再等50ms，把连续写入合并为一次读取
+            return bool(self._inotify.read(timeout=int(timeout * 1000), read_delay=50))
+        time.sleep(min(timeout, self.poll_interval))
+        return True
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class _TailState:
+    """一个被跟踪的日志文件: 当前路径、已读字节数(解压后)、已读记录数"""
+
+    __slots__ = ("path", "offset", "records", "done")
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.records = 0
+        # 已压缩的分段和旧版JSON文件不会再追加，读完一次即可
+        self.done = False
+
+
+class CaptureTailer:
+    """增量读取日志文件中新追加的记录
+
+    files中的文件从头读取，之后日志目录中新出现的文件也会被跟踪；
+    启动时目录中已有但不在files中的文件(其他会话)不跟踪
+    """
+
+    def __init__(self, log_dir, files, batch_size=5000):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self._files = {}
+        for path in files:
+            self._files[_segment_key(path)] = _TailState(path)
+        self._ignored = {_segment_key(path) for path in find_capture_files(log_dir)} - set(self._files)
+
+    def discover(self):
+        """查找新出现的日志文件和被压缩的分段，返回 (新文件列表, [(旧路径, 新路径)])"""
+        new_files = []
+        moved = []
+        for path in find_capture_files(self.log_dir):
+            key = _segment_key(path)
+            if key in self._ignored:
+                continue
+            state = self._files.get(key)
+            if state is None:
+                self._files[key] = _TailState(path)
+                new_files.append(path)
+            elif state.path != path and not os.path.exists(state.path):
+                # 分段写满后被压缩，压缩文件的内容与原文件相同
+                moved.append((state.path, path))
+                state.path = path
+        return new_files, moved
+
+    def read(self):
+        """读取所有跟踪文件中新追加的完整记录，逐批返回 (路径, 第一条记录的序号, 记录列表, 文件状态)
+
+        序号是记录在文件中的位置(从0开始)，与iter_capture_file的顺序相同；
+        文件状态是读取前的os.stat，只在读到文件末尾的那一批给出，其余批次为None
+        """
+        for state in list(self._files.values()):
+            yield from self._read(state)
+
+    def _read(self, state):
+        if state.done:
+            return
+        try:
+            stat = os.stat(state.path)
+        except OSError:
+            return
+        compressed = _segment_key(state.path) != os.path.abspath(state.path)
+        first = state.records
+        batch = []
+
+        if state.path.endswith(LEGACY_EXT):
+            for record in iter_capture_file(state.path):
+                batch.append(record)
+                state.records += 1
+                if len(batch) >= self.batch_size:
+                    yield state.path, first, batch, None
+                    first, batch = state.records, []
+            state.done = True
+            yield state.path, first, batch, stat
+            return
+
+        # 日志只会追加，大小没有变化就没有新记录
+        if not compressed and stat.st_size <= state.offset:
+            return
+        with open_capture_binary(state.path) as f:
+            if compressed:
+                remaining = state.offset
+                while remaining > 0:
+                    skipped = len(f.read(min(remaining, 1024 * 1024)))
+                    if not skipped:
+                        break
+                    remaining -= skipped
+            else:
+                f.seek(state.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 还没写完的行，下次再读
+                    break
+                state.offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = loads(line)
+                except ValueError:
+                    continue
+                # 与iter_capture_file一样只保留对象记录，序号才能对应
+                if not isinstance(record, dict):
+                    continue
+                batch.append(record)
+                state.records += 1
+                if len(batch) >= self.batch_size:
+                    yield state.path, first, batch, None
+                    first, batch = state.records, []
+        state.done = compressed
+        yield state.path, first, batch, stat
+
+
+class LiveSummary:
+    """实时视图的增量计数: 总数、主机和状态码分布、最近的请求速率、耗时和请求"""
+
+    def __init__(self, window=10, recent=5, latency_samples=1000):
+        self.window = window
+        self.total = 0
+        self.hosts = Counter()
+        self.statuses = Counter()
+        self.recent = deque(maxlen=recent)
+        self.durations = deque(maxlen=latency_samples)
+        # (到达时间, 条数)，只保留最近window秒
+        self._arrivals = deque()
+
+    def add(self, records, arrived=True):
+        """计入一批记录，arrived为False时(启动时读取已有日志)不计入速率"""
+        for record in records:
+            request = record.get('request') or {}
+            response = record.get('response') or {}
+            self.total += 1
+            self.hosts[request.get('host') or 'unknown'] += 1
+            self.statuses[response.get('status_code') or 'unknown'] += 1
+            if response.get('response_time') is not None:
+                self.durations.append(response['response_time'])
+        if records:
+            self.recent.extend(records[-self.recent.maxlen:])
+            if arrived:
+                self._arrivals.append((time.monotonic(), len(records)))
+
+    def rate(self):
+        """最近window秒的平均请求数/秒"""
+        cutoff = time.monotonic() - self.window
+        while self._arrivals and self._arrivals[0][0] < cutoff:
+            self._arrivals.popleft()
+        return sum(count for _, count in self._arrivals) / self.window
+
+    def latency(self, percentiles=(50, 90)):
+        """最近latency_samples条响应的耗时分位数(秒)，没有数据时为空列表"""
+        values = sorted(self.durations)
+        if not values:
+            return []
+        return [values[round((len(values) - 1) * p / 100)] for p in percentiles]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代理运行指标
+在本地端口以Prometheus文本格式提供抓包代理的实时指标，
+并提供读取/解析指标的辅助函数供启动工具使用
+"""
+
+import os
+import re
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_PORT = 9108
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsWriter:
+    """拼装Prometheus文本格式"""
+
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def add(self, name, value, help_text, metric_type="gauge", labels=None):
+        if value is None:
+            return
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {metric_type}")
+        label_text = ""
+        if labels:
+            label_text = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+        self.lines.append(f"{name}{label_text} {value}")
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def process_memory_bytes():
+    """当前进程的常驻内存(字节)，拿不到时返回峰值内存"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS单位是字节，Linux是KB
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 接口，collect()返回指标文本"""
+
+    def __init__(self, collect, host="127.0.0.1", port=DEFAULT_METRICS_PORT):
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        collect = self.collect
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = collect().encode('utf-8')
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不把访问日志打到代理的控制台输出里
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="capture-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_LINE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text):
+    """解析Prometheus文本，返回 {指标名: [(标签字典, 数值), ...]}"""
+    metrics = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        name, label_text, value = match.groups()
+        labels = {k: v.replace('\\"', '"').replace('\\\\', '\\') for k, v in _LABEL_RE.findall(label_text or "")}
+        try:
+            metrics.setdefault(name, []).append((labels, float(value)))
+        except ValueError:
+            continue
+    return metrics
+
+
+def fetch_metrics(port=DEFAULT_METRICS_PORT, host="127.0.0.1", timeout=2):
+    """读取正在运行的代理的指标，连接失败时返回None"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=timeout) as response:
+            return parse_metrics(response.read().decode('utf-8'))
+    except OSError:
+        return None
+
+
+def metric_value(metrics, name, default=0.0):
+    """取不带标签(或所有标签求和)的指标值"""
+    samples = metrics.get(name)
+    if not samples:
+        return default
+    return sum(value for _, value in samples)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程并行读取抓包日志
+把逐个文件(分段)的解析、链接提取、统计投影和索引扫描分发到进程池，
+结果按输入文件的顺序返回，调用方再按时间戳合并，输出与单进程完全相同
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def map_capture_files(func, paths, workers=None):
+    """对每个文件调用func(path)，按paths的顺序逐个返回 (path, 结果)
+
+    func必须是模块级函数(子进程中按名字导入)；workers为None时使用CPU核数，
+    只有一个文件、workers<=1或无法创建进程池时在当前进程中依次处理
+    """
+    paths = list(paths)
+    workers = min(workers or default_workers(), len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield path, func(path)
+        return
+
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError, ImportError):
+        # 受限环境中没有可用的多进程支持
+        for path in paths:
+            yield path, func(path)
+        return
+    with executor:
+        # map按提交顺序返回结果，保证合并结果确定
+        yield from zip(paths, executor.map(func, paths))
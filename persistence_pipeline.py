@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台持久化管道
+把日志写入从mitmproxy事件循环中移到独立的写入线程，按数量或时间批量落盘
+"""
+
+import queue
+import threading
+import time
+from serialization import dumps
+
+# 队列满时的背压策略:
+#   block - 阻塞调用方直到队列有空位(不丢数据)
+#   drop  - 丢弃新记录并计数
+#   spill - 把溢出的记录直接追加到溢出文件，稍后可单独分析
+BACKPRESSURE_POLICIES = ("block", "drop", "spill")
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """有界队列 + 单个写入线程，批量调用handler处理记录"""
+
+    def __init__(self, handler, max_queue=10000, batch_size=256, flush_interval=0.5,
+                 backpressure="block", spill_path=None, spill_encoder=None, name="capture-writer"):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"未知的背压策略: {backpressure} (可选: {', '.join(BACKPRESSURE_POLICIES)})")
+        if backpressure == "spill" and not spill_path:
+            raise ValueError("spill策略需要指定spill_path")
+
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.spill_path = spill_path
+        # spill_encoder把记录转为要写入溢出文件的对象，返回None表示直接丢弃
+        self.spill_encoder = spill_encoder or (lambda item: item)
+
+        # 统计信息
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_seconds = 0.0
+        self.batch_seconds_total = 0.0
+
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        # 需要在写入线程中执行的调用(如修改写入器的设置)，不占队列位置，不受背压策略影响
+        self._calls = []
+        self._calls_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._spill_file = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """当前排队中的记录数"""
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """提交一条记录，返回是否进入了队列"""
+        if self._closed:
+            return False
+
+        if self.backpressure == "block":
+            self._queue.put(item)
+            self.enqueued += 1
+            return True
+
+        try:
+            self._queue.put_nowait(item)
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            if self.backpressure == "drop":
+                self.dropped += 1
+            else:
+                self._spill(item)
+            return False
+
+    def call_in_writer(self, func):
+        """让写入线程在处理下一批记录之前调用func()"""
+        with self._calls_lock:
+            self._calls.append(func)
+
+    def _run_calls(self):
+        with self._calls_lock:
+            calls, self._calls = self._calls, []
+        for func in calls:
+            try:
+                func()
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ 后台调用失败: {e}")
+
+    def _spill(self, item):
+        """队列已满时把记录写入溢出文件"""
+        record = self.spill_encoder(item)
+        if record is None:
+            self.dropped += 1
+            return
+        with self._spill_lock:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self._spill_file.write(dumps(record) + "\n")
+            self._spill_file.flush()
+            self.spilled += 1
+
+    def _run(self):
+        """写入线程主循环"""
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(batch)
+                batch = []
+                continue
+
+            if item is _STOP:
+                self._flush(batch)
+                break
+
+            batch.append(item)
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        """把一批记录交给handler处理"""
+        if not batch:
+            return
+        self._run_calls()
+        started = time.perf_counter()
+        try:
+            self.handler(batch)
+            self.processed += len(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ 后台写入失败: {e}")
+        self.batches += 1
+        self.last_batch_seconds = time.perf_counter() - started
+        self.batch_seconds_total += self.last_batch_seconds
+
+    def close(self, timeout=None):
+        """停止接收新记录，等待队列中的记录全部写完"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        with self._spill_lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def stats(self):
+        """返回统计信息"""
+        return {
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "batches": self.batches,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "last_batch_seconds": self.last_batch_seconds,
+            "batch_seconds_total": self.batch_seconds_total,
+        }
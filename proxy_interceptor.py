@@ -16,119 +16,359 @@ from colorama import init, Fore, Style
 import threading
 import signal
 import sys
+from capture_log import CaptureWriter, SegmentedCaptureWriter, FSYNC_POLICIES, COMPRESSIONS, JSONL_EXT
+from persistence_pipeline import BackgroundWriter, BACKPRESSURE_POLICIES
+from blob_store import BlobStore, BLOB_DIR
+from flow_buffer import FlowRingBuffer
+from flow_record import FlowRecord, HeaderTable
+from body_decoder import encode_body, parse_body, BASE64_ENCODING
+from capture_filter import CaptureFilter
+from flow_timing import flow_timings, LatencyTracker
+from metrics_server import MetricsServer, MetricsWriter, process_memory_bytes
+from capture_db import CaptureDatabase, DB_EXT
+from serialization import BACKEND as JSON_BACKEND
+from link_rules import BODY_MARKER, LINKS_EXT, LINKS_PREFIX, extract_link, is_link_api
 
 # 初始化colorama
 init()
 
+# 默认直接透传(不缓存、不解析)的响应类型
+DEFAULT_STREAM_TYPES = "video/,audio/,application/octet-stream,application/zip,application/vnd.android.package-archive"
+# 抓包存储后端
+BACKENDS = ("jsonl", "sqlite")
+
+class _StreamCounter:
+    """透传响应体时只统计字节数和时间，不保留内容"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.first_chunk_time = None
+        self.last_chunk_time = None
+
+    def __call__(self, data):
+        if data:
+            now = time.time()
+            if self.first_chunk_time is None:
+                self.first_chunk_time = now
+            self.last_chunk_time = now
+            self.bytes += len(data)
+        return data
+
 class HTTPSInterceptor:
     def __init__(self):
-        self.requests_log = []
-        self.log_file = f"api_requests_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        self.console_log_file = f"console_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        # 最近流量的紧凑摘要，容量固定
+        self.buffer_entries = 10000
+        self.buffer_bytes = 0
+        self.flow_buffer = FlowRingBuffer(self.buffer_entries)
+        # 进行中和等待写入的请求记录共享头部和字符串
+        self.header_table = HeaderTable()
+        # 多进程模式下由启动工具指定共同的会话时间和工作进程编号
+        self.session = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.worker = 0
         
         # 创建日志目录
         os.makedirs("logs", exist_ok=True)
-        self.log_file = os.path.join("logs", self.log_file)
-        self.console_log_file = os.path.join("logs", self.console_log_file)
+        self._set_log_paths()
+        
+        # JSONL写入器和后台写入线程在第一次保存时创建，以便先应用mitmproxy选项
+        self.fsync_policy = "flush"
+        self.fsync_interval = 1.0
+        self.segment_bytes = 64 * 1024 * 1024
+        self.segment_seconds = 0
+        self.segment_compression = "gzip"
+        # jsonl: 分段JSONL文件; sqlite: 写入 logs/api_requests_*.db
+        self.backend = "jsonl"
+        self.queue_size = 10000
+        self.batch_size = 256
+        self.flush_interval = 0.5
+        self.backpressure = "block"
+        self.stream_threshold = 1024 * 1024
+        self.stream_types = tuple(t for t in DEFAULT_STREAM_TYPES.split(',') if t)
+        self.blob_store = BlobStore(os.path.join("logs", BLOB_DIR))
+        # 按主机统计的延迟直方图，退出时输出分位数表
+        self.latency = LatencyTracker()
+        # 退出时保存的统计JSON是否缩进(JSONL日志始终是紧凑的一行一条)
+        self.pretty_json = False
+        # 按主机统计的 [请求数, 请求字节, 响应字节]
+        self.host_traffic = {}
+        self.started_at = time.time()
+        self.metrics_port = 0
+        self.metrics_server = None
+        # 未配置规则文件时记录所有请求
+        self.capture_filter = None
+        self.writer = None
+        self.pipeline = None
+        self._console_file = None
+        # 实时提取到的下载链接，第一次发现时才创建文件
+        self.links_writer = None
+        self.links_found = 0
         
         print(f"{Fore.GREEN}🚀 HTTP/HTTPS接口抓取器已启动{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}📝 日志文件: {self.log_file}{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}📝 日志文件: {self.log_base}_*{JSONL_EXT}{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}📊 控制台日志: {self.console_log_file}{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}🧾 JSON编码: {JSON_BACKEND}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
 
+    def _set_log_paths(self):
+        """按会话和工作进程编号生成日志文件路径，每个工作进程写自己的分段"""
+        suffix = f"{self.session}_w{self.worker}" if self.worker else self.session
+        self.log_base = os.path.join("logs", f"api_requests_{suffix}")
+        self.console_log_file = os.path.join("logs", f"console_log_{suffix}.txt")
+        self.links_file = os.path.join("logs", f"{LINKS_PREFIX}{suffix}{LINKS_EXT}")
+
     def request(self, flow: http.HTTPFlow):
         """处理HTTP请求"""
         request = flow.request
         
-        # 记录所有HTTP和HTTPS请求
-        request_info = {
-            "timestamp": datetime.now().isoformat(),
-            "method": request.method,
-            "url": request.pretty_url,
-            "scheme": request.scheme,  # 添加协议类型
-            "host": request.host,
-            "path": request.path,
-            "headers": dict(request.headers),
-            "query_params": dict(request.query) if request.query else {},
-            "body": None,
-            "body_size": len(request.content) if request.content else 0
-        }
+        # 先按过滤规则决定处理方式，被丢弃的请求不做任何body处理
+        action = "keep"
+        if self.capture_filter:
+            rule = self.capture_filter.match_rule(
+                request.host, request.path, request.method, request.headers.get('content-type', '')
+            )
+            self.capture_filter.count(rule)
+            action = self.capture_filter.action(rule)
+            setattr(flow, 'capture_rule', rule)
+        setattr(flow, 'capture_action', action)
+        if action == "drop":
+            return
         
-        # 处理请求体
-        if request.content:
-            try:
-                # 尝试解析JSON
-                if 'application/json' in request.headers.get('content-type', ''):
-                    request_info["body"] = json.loads(request.content.decode('utf-8'))
-                # 尝试解析表单数据
-                elif 'application/x-www-form-urlencoded' in request.headers.get('content-type', ''):
-                    from urllib.parse import parse_qs
-                    request_info["body"] = dict(parse_qs(request.content.decode('utf-8')))
-                else:
-                    # 其他格式保存为字符串（如果是文本）
-                    try:
-                        request_info["body"] = request.content.decode('utf-8')
-                    except:
-                        request_info["body"] = f"<二进制数据: {len(request.content)} 字节>"
-            except Exception as e:
-                request_info["body"] = f"<解析失败: {str(e)}>"
+        # 记录HTTP和HTTPS请求，头部和常见字符串在会话内共享
+        intern = self.header_table.intern
+        record = FlowRecord()
+        now = time.time()
+        record.timestamp = datetime.fromtimestamp(now).isoformat()
+        record.timestamp_ms = int(now * 1000)
+        record.method = intern(request.method)
+        record.url = request.pretty_url
+        record.scheme = intern(request.scheme)  # 添加协议类型
+        record.host = intern(request.host)
+        record.path = request.path
+        record.request_headers = self.header_table.headers(request.headers.items())
+        record.query_params = dict(request.query) if request.query else None
+        record.request_content_type = intern(request.headers.get('content-type', ''))
+        
+        # 只保存原始请求体，JSON/表单解析推迟到分析时进行
+        if action == "keep":
+            content = request.content
+            if content:
+                record.request_body, record.request_body_encoding = encode_body(content)
+                record.request_size = len(content)
+        else:
+            # 只记录头部时不解压body，只统计原始大小
+            record.request_size = len(request.raw_content or b"")
         
         # 保存到内存
-        setattr(flow, 'request_info', request_info)
+        setattr(flow, 'capture_record', record)
+        
+        # 显示和写入交给后台线程
+        self._submit("request", record)
+
+    def responseheaders(self, flow: http.HTTPFlow):
+        """收到响应头时决定是否透传大文件/二进制响应"""
+        action = getattr(flow, 'capture_action', "keep")
         
-        # 实时显示请求信息
-        self._print_request(request_info)
+        # 带content_type条件的规则在拿到响应类型后再匹配一次
+        if action != "drop" and self.capture_filter and self.capture_filter.has_content_type_rules:
+            request = flow.request
+            rule = self.capture_filter.rematch(
+                getattr(flow, 'capture_rule', None),
+                request.host, request.path, request.method, flow.response.headers.get('content-type', '')
+            )
+            if rule is not None:
+                action = rule.action
+                setattr(flow, 'capture_action', action)
+        
+        # 不需要保存响应体的请求也直接透传，不在内存中缓存
+        if action != "keep" or self._should_stream(flow.response):
+            counter = _StreamCounter()
+            flow.response.stream = counter
+            setattr(flow, 'stream_counter', counter)
+
+    def _should_stream(self, response):
+        """大于阈值或二进制类型的响应体不进入内存"""
+        content_type = response.headers.get('content-type', '').lower()
+        if self.stream_types and content_type.startswith(self.stream_types):
+            return True
+        content_length = response.headers.get('content-length', '')
+        return content_length.isdigit() and int(content_length) > self.stream_threshold
 
     def response(self, flow: http.HTTPFlow):
         """处理HTTP响应"""
-        if hasattr(flow, 'request_info'):
+        if hasattr(flow, 'stream_counter'):
+            self._streamed_response(flow)
+        elif hasattr(flow, 'capture_record'):
             response = flow.response
-            request_info = getattr(flow, 'request_info')
-            
-            response_info = {
-                "status_code": response.status_code,
-                "status_text": response.reason,
-                "headers": dict(response.headers),
-                "body": None,
-                "body_size": len(response.content) if response.content else 0,
-                "response_time": None  # mitmproxy不直接提供响应时间
-            }
-            
-            # 处理响应体 - 显示完整内容
-            if response.content:
-                try:
-                    # 尝试解析JSON
-                    if 'application/json' in response.headers.get('content-type', ''):
-                        response_info["body"] = json.loads(response.content.decode('utf-8'))
-                    # HTML内容 - 显示完整内容
-                    elif 'text/html' in response.headers.get('content-type', ''):
-                        response_info["body"] = response.content.decode('utf-8')
-                    # 纯文本 - 显示完整内容
-                    elif 'text/plain' in response.headers.get('content-type', ''):
-                        response_info["body"] = response.content.decode('utf-8')
-                    else:
-                        # 其他格式 - 尝试显示完整文本内容
-                        try:
-                            response_info["body"] = response.content.decode('utf-8')
-                        except:
-                            response_info["body"] = f"<二进制数据: {len(response.content)} 字节>"
-                except Exception as e:
-                    response_info["body"] = f"<解析失败: {str(e)}>"
+            record = getattr(flow, 'capture_record')
+            timings = flow_timings(flow)
+            self._set_response_fields(record, response, timings)
             
-            # 合并请求和响应信息
-            complete_info = {
-                "request": request_info,
-                "response": response_info
-            }
+            # 只保存原始响应体，解析推迟到分析时进行
+            content = response.content
+            if content:
+                record.response_body, record.response_body_encoding = encode_body(content)
+                record.response_size = len(content)
+                # 先用URL和原始字节快速预筛，绝大多数响应不需要解码；解析和写入链接文件交给后台线程
+                if is_link_api(record.url) or BODY_MARKER in content:
+                    self._submit("link", record)
             
-            # 添加到日志列表
-            self.requests_log.append(complete_info)
+            # 添加到最近流量缓冲区
+            self._record_summary(flow, record.response_size, timings)
             
-            # 实时显示响应信息
-            self._print_response(response_info)
-            
-            # 保存到文件
-            self._save_to_file(complete_info)
+            # 显示响应信息并保存到文件，交给后台线程
+            self._submit("response", record)
+
+    def _set_response_fields(self, record, response, timings):
+        """把响应行、头部和耗时写入记录"""
+        intern = self.header_table.intern
+        record.status_code = response.status_code
+        record.status_text = intern(response.reason)
+        record.response_headers = self.header_table.headers(response.headers.items())
+        record.response_content_type = intern(response.headers.get('content-type', ''))
+        record.response_time = timings["total"]
+        record.timing = timings
+
+    def _extract_link(self, record):
+        """后台线程: 从预筛过的响应中提取下载链接，没有时返回None"""
+        try:
+            body = parse_body(record.response_body, record.response_body_encoding, record.response_content_type)
+            return extract_link(record.request_dict(), body)
+        except Exception as e:
+            print(f"{Fore.RED}❌ 提取下载链接失败: {str(e)}{Style.RESET_ALL}")
+            return None
+
+    def _save_links(self, links):
+        """后台线程: 把一批下载链接追加到链接文件，并记入控制台日志"""
+        if not links:
+            return
+        try:
+            if self.links_writer is None:
+                self.links_writer = CaptureWriter(self.links_file, fsync_policy="flush")
+            self.links_writer.write_many(links)
+            self.links_found += len(links)
+            self._get_console_file().write(f"发现 {len(links)} 个下载链接，已写入 {self.links_file}\n")
+        except Exception as e:
+            print(f"{Fore.RED}❌ 保存下载链接失败: {str(e)}{Style.RESET_ALL}")
+
+    def _streamed_response(self, flow):
+        """透传的响应只记录响应头、字节数和耗时"""
+        action = getattr(flow, 'capture_action', "keep")
+        if action == "drop" or not hasattr(flow, 'capture_record'):
+            return
+        record = getattr(flow, 'capture_record')
+        counter = getattr(flow, 'stream_counter')
+        timings = flow_timings(flow)
+        
+        self._set_response_fields(record, flow.response, timings)
+        record.response_body = f"<透传数据: {counter.bytes} 字节>" if action == "keep" else None
+        record.response_size = counter.bytes
+        record.response_extra = {
+            "streamed": True,
+            "stream_duration": (
+                round(counter.last_chunk_time - counter.first_chunk_time, 6)
+                if counter.first_chunk_time is not None else 0.0
+            ),
+        }
+        if action == "headers":
+            record.response_extra["headers_only"] = True
+        
+        self._record_summary(flow, counter.bytes, timings)
+        self._submit("response", record)
+
+    def _record_summary(self, flow, response_size, timings):
+        """把流量摘要写入环形缓冲区，并更新延迟直方图"""
+        request = flow.request
+        request_size = getattr(flow, 'capture_record').request_size
+        self.latency.record(request.host, timings)
+        traffic = self.host_traffic.get(request.host)
+        if traffic is None:
+            traffic = self.host_traffic[request.host] = [0, 0, 0]
+        traffic[0] += 1
+        traffic[1] += request_size
+        traffic[2] += response_size
+        self.flow_buffer.append(
+            request.timestamp_start or time.time(),
+            request.method,
+            request.host,
+            flow.response.status_code,
+            request_size,
+            response_size,
+            timings["total"],
+        )
+
+    def recent_flows(self, n=20, **filters):
+        """最近的流量摘要，可按host/method/status/since过滤"""
+        if filters:
+            return self.flow_buffer.query(**filters)[-n:]
+        return self.flow_buffer.recent(n)
+
+    def metrics_text(self):
+        """Prometheus文本格式的运行指标(在指标线程中调用)"""
+        m = MetricsWriter()
+        now = time.time()
+        m.add("capture_uptime_seconds", round(now - self.started_at, 3), "代理运行时间")
+        m.add("capture_flows_total", self.flow_buffer.total, "已记录的请求数", "counter")
+        m.add("capture_download_links_total", self.links_found, "实时提取到的下载链接数", "counter")
+        m.add("capture_flows_per_second", round(self.flow_buffer.count_since(now - 10) / 10, 3),
+              "最近10秒平均每秒请求数")
+        # 同一指标的所有样本必须连续输出
+        traffic = sorted(list(self.host_traffic.items()))
+        for column, name, help_text in ((0, "capture_host_flows_total", "按主机的请求数"),
+                                        (1, "capture_host_request_bytes_total", "按主机的请求体字节数"),
+                                        (2, "capture_host_response_bytes_total", "按主机的响应体字节数")):
+            for host, values in traffic:
+                m.add(name, values[column], help_text, "counter", {"host": host})
+
+        pipeline = self.pipeline
+        if pipeline:
+            stats = pipeline.stats()
+            m.add("capture_writer_queue_depth", stats["queue_depth"], "后台写入队列中等待的记录数")
+            m.add("capture_writer_records_total", stats["processed"], "后台线程已处理的记录数", "counter")
+            m.add("capture_writer_dropped_total", stats["dropped"], "队列满时丢弃的记录数", "counter")
+            m.add("capture_writer_spilled_total", stats["spilled"], "队列满时写入溢出文件的记录数", "counter")
+            m.add("capture_writer_errors_total", stats["errors"], "写入失败的批次数", "counter")
+            m.add("capture_persist_last_batch_seconds", round(stats["last_batch_seconds"], 6), "最近一批写入耗时")
+            m.add("capture_persist_batch_seconds_sum", round(stats["batch_seconds_total"], 6), "写入耗时总和", "counter")
+            m.add("capture_persist_batch_seconds_count", stats["batches"], "写入批次数", "counter")
+
+        m.add("capture_blobs_stored_total", self.blob_store.stored, "新写入的blob数", "counter")
+        m.add("capture_blobs_deduplicated_total", self.blob_store.deduplicated, "因内容相同而复用的blob数", "counter")
+
+        if self.capture_filter:
+            for name, action, hits in self.capture_filter.stats():
+                m.add("capture_filter_hits_total", hits, "过滤规则命中次数", "counter",
+                      {"rule": name, "action": action})
+
+        for row in self.latency.table("total"):
+            host = row[0]
+            for p, value in zip(self.latency.PERCENTILES, row[3:3 + len(self.latency.PERCENTILES)]):
+                m.add("capture_latency_seconds", round(value, 6), "按主机的请求总耗时分位数",
+                      "gauge", {"host": host, "quantile": p / 100})
+
+        m.add("capture_process_resident_memory_bytes", process_memory_bytes(), "代理进程常驻内存")
+        m.add("capture_flow_buffer_entries", len(self.flow_buffer), "流量摘要缓冲区中的条数")
+        return m.render()
+
+    def _start_metrics(self):
+        """按capture_metrics_port启动或停止指标服务"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics_text, port=self.metrics_port)
+                self.metrics_server.start()
+                print(f"{Fore.YELLOW}📈 运行指标: http://127.0.0.1:{self.metrics_server.port}/metrics{Style.RESET_ALL}")
+            except OSError as e:
+                self.metrics_server = None
+                print(f"{Fore.RED}❌ 指标服务启动失败(端口 {self.metrics_port}): {str(e)}{Style.RESET_ALL}")
+
+    @staticmethod
+    def _display_body(info):
+        """控制台显示用的body文本，二进制内容只显示大小"""
+        if info.get('body_encoding') == BASE64_ENCODING:
+            return f"<二进制数据: {info['body_size']} 字节>"
+        return info['body']
 
     def _print_request(self, request_info):
         """打印请求信息到控制台"""
@@ -139,62 +379,348 @@ class HTTPSInterceptor:
         if request_info['query_params']:
             print(f"{Fore.CYAN}🔍 查询参数: {json.dumps(request_info['query_params'], ensure_ascii=False, indent=2)}{Style.RESET_ALL}")
         
-        if request_info['body']:
-            print(f"{Fore.MAGENTA}📦 请求体: {json.dumps(request_info['body'], ensure_ascii=False, indent=2) if isinstance(request_info['body'], (dict, list)) else request_info['body']}{Style.RESET_ALL}")
+        body_display = self._display_body(request_info)
+        if body_display:
+            print(f"{Fore.MAGENTA}📦 请求体: {body_display}{Style.RESET_ALL}")
         
         # 同时写入控制台日志文件
-        with open(self.console_log_file, 'a', encoding='utf-8') as f:
-            f.write(f"\n[{request_info['scheme'].upper()}请求] {request_info['method']} {request_info['url']}\n")
-            f.write(f"时间: {request_info['timestamp']}\n")
-            if request_info['query_params']:
-                f.write(f"查询参数: {json.dumps(request_info['query_params'], ensure_ascii=False, indent=2)}\n")
-            if request_info['body']:
-                f.write(f"请求体: {json.dumps(request_info['body'], ensure_ascii=False, indent=2) if isinstance(request_info['body'], (dict, list)) else request_info['body']}\n")
+        f = self._get_console_file()
+        f.write(f"\n[{request_info['scheme'].upper()}请求] {request_info['method']} {request_info['url']}\n")
+        f.write(f"时间: {request_info['timestamp']}\n")
+        if request_info['query_params']:
+            f.write(f"查询参数: {json.dumps(request_info['query_params'], ensure_ascii=False, indent=2)}\n")
+        if body_display:
+            f.write(f"请求体: {body_display}\n")
 
     def _print_response(self, response_info):
         """打印响应信息到控制台"""
         status_color = Fore.GREEN if 200 <= response_info['status_code'] < 300 else Fore.RED
         print(f"{status_color}📥 [响应] {response_info['status_code']} {response_info['status_text']}{Style.RESET_ALL}")
         
-        if response_info['body']:
-            # 显示完整的响应体内容
-            if isinstance(response_info['body'], (dict, list)):
-                body_display = json.dumps(response_info['body'], ensure_ascii=False, indent=2)
-            else:
-                body_display = str(response_info['body'])
-            
+        # 显示完整的响应体内容
+        body_display = self._display_body(response_info)
+        if body_display:
             print(f"{Fore.GREEN}📄 响应体完整内容: {body_display}{Style.RESET_ALL}")
         
         print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
         
         # 同时写入控制台日志文件
-        with open(self.console_log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[响应] {response_info['status_code']} {response_info['status_text']}\n")
-            if response_info['body']:
-                if isinstance(response_info['body'], (dict, list)):
-                    body_display = json.dumps(response_info['body'], ensure_ascii=False, indent=2)
-                else:
-                    body_display = str(response_info['body'])
-                f.write(f"响应体: {body_display}\n")
-            f.write("="*60 + "\n")
-
-    def _save_to_file(self, complete_info):
-        """保存完整的请求响应信息到JSON文件"""
-        try:
-            # 读取现有数据
-            if os.path.exists(self.log_file):
-                with open(self.log_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+        f = self._get_console_file()
+        f.write(f"[响应] {response_info['status_code']} {response_info['status_text']}\n")
+        if body_display:
+            f.write(f"响应体: {body_display}\n")
+        f.write("="*60 + "\n")
+
+    def load(self, loader):
+        """注册mitmproxy选项"""
+        loader.add_option(
+            name="capture_session",
+            typespec=str,
+            default="",
+            help="抓包会话时间(YYYYMMDD_HHMMSS)，多进程模式下由启动工具统一指定",
+        )
+        loader.add_option(
+            name="capture_worker",
+            typespec=int,
+            default=self.worker,
+            help="工作进程编号，大于0时日志文件名带 _w<编号> 后缀",
+        )
+        loader.add_option(
+            name="capture_backend",
+            typespec=str,
+            default=self.backend,
+            help=f"抓包存储后端: {', '.join(BACKENDS)}",
+        )
+        loader.add_option(
+            name="capture_fsync",
+            typespec=str,
+            default=self.fsync_policy,
+            help=f"抓包日志fsync策略: {', '.join(FSYNC_POLICIES)}",
+        )
+        loader.add_option(
+            name="capture_fsync_interval",
+            typespec=float,
+            default=self.fsync_interval,
+            help="capture_fsync=interval时两次fsync之间的最小间隔(秒)",
+        )
+        loader.add_option(
+            name="capture_segment_size",
+            typespec=int,
+            default=self.segment_bytes,
+            help="日志分段达到该字节数后切换到新分段，0表示不按大小切分",
+        )
+        loader.add_option(
+            name="capture_segment_seconds",
+            typespec=int,
+            default=self.segment_seconds,
+            help="日志分段写入该秒数后切换到新分段，0表示不按时间切分",
+        )
+        loader.add_option(
+            name="capture_segment_compression",
+            typespec=str,
+            default=self.segment_compression,
+            help=f"已关闭分段的压缩格式: {', '.join(COMPRESSIONS)} (zstd未安装时使用gzip)",
+        )
+        loader.add_option(
+            name="capture_queue_size",
+            typespec=int,
+            default=self.queue_size,
+            help="后台写入队列的最大长度",
+        )
+        loader.add_option(
+            name="capture_batch_size",
+            typespec=int,
+            default=self.batch_size,
+            help="后台线程每批最多写入的记录数",
+        )
+        loader.add_option(
+            name="capture_flush_interval",
+            typespec=float,
+            default=self.flush_interval,
+            help="未攒满一批时最长等待多久写入(秒)",
+        )
+        loader.add_option(
+            name="capture_backpressure",
+            typespec=str,
+            default=self.backpressure,
+            help=f"写入队列满时的策略: {', '.join(BACKPRESSURE_POLICIES)}",
+        )
+        loader.add_option(
+            name="capture_stream_threshold",
+            typespec=int,
+            default=self.stream_threshold,
+            help="响应体超过该字节数(按Content-Length)时直接透传，只记录大小和耗时",
+        )
+        loader.add_option(
+            name="capture_stream_types",
+            typespec=str,
+            default=DEFAULT_STREAM_TYPES,
+            help="直接透传的响应Content-Type前缀，逗号分隔",
+        )
+        loader.add_option(
+            name="capture_metrics_port",
+            typespec=int,
+            default=self.metrics_port,
+            help="在127.0.0.1的该端口提供Prometheus格式的运行指标，0表示不启用",
+        )
+        loader.add_option(
+            name="capture_pretty",
+            typespec=bool,
+            default=self.pretty_json,
+            help="退出时保存的统计JSON文件缩进两格便于阅读，默认紧凑输出",
+        )
+        loader.add_option(
+            name="capture_rules",
+            typespec=str,
+            default="",
+            help="抓包过滤规则JSON文件，为空时记录所有请求 (示例: capture_rules.example.json)",
+        )
+        loader.add_option(
+            name="capture_buffer_entries",
+            typespec=int,
+            default=self.buffer_entries,
+            help="内存中保留的最近流量摘要条数",
+        )
+        loader.add_option(
+            name="capture_buffer_bytes",
+            typespec=int,
+            default=self.buffer_bytes,
+            help="按字节数限制流量摘要缓冲区大小，大于0时代替capture_buffer_entries",
+        )
+        loader.add_option(
+            name="capture_blob_threshold",
+            typespec=int,
+            default=self.blob_store.threshold,
+            help="body超过该字节数时存入logs/blobs并按内容去重，负数表示不使用blob存储",
+        )
+        loader.add_option(
+            name="capture_blob_compress",
+            typespec=bool,
+            default=self.blob_store.compress,
+            help="是否用gzip压缩blob文件",
+        )
+
+    def configure(self, updated):
+        """应用mitmproxy选项"""
+        if "capture_session" in updated or "capture_worker" in updated:
+            if ctx.options.capture_session:
+                self.session = ctx.options.capture_session
+            self.worker = ctx.options.capture_worker
+            self._set_log_paths()
+            print(f"{Fore.YELLOW}📝 日志文件: {self.log_base}_*{JSONL_EXT}{Style.RESET_ALL}")
+        if "capture_backend" in updated:
+            if ctx.options.capture_backend not in BACKENDS:
+                raise ValueError(f"capture_backend必须是以下之一: {', '.join(BACKENDS)}")
+            self.backend = ctx.options.capture_backend
+        if "capture_fsync" in updated:
+            if ctx.options.capture_fsync not in FSYNC_POLICIES:
+                raise ValueError(f"capture_fsync必须是以下之一: {', '.join(FSYNC_POLICIES)}")
+            self.fsync_policy = ctx.options.capture_fsync
+        if "capture_fsync_interval" in updated:
+            self.fsync_interval = ctx.options.capture_fsync_interval
+        if "capture_segment_compression" in updated:
+            if ctx.options.capture_segment_compression not in COMPRESSIONS:
+                raise ValueError(f"capture_segment_compression必须是以下之一: {', '.join(COMPRESSIONS)}")
+            self.segment_compression = ctx.options.capture_segment_compression
+        if "capture_segment_size" in updated:
+            self.segment_bytes = ctx.options.capture_segment_size
+        if "capture_segment_seconds" in updated:
+            self.segment_seconds = ctx.options.capture_segment_seconds
+        if "capture_backpressure" in updated:
+            if ctx.options.capture_backpressure not in BACKPRESSURE_POLICIES:
+                raise ValueError(f"capture_backpressure必须是以下之一: {', '.join(BACKPRESSURE_POLICIES)}")
+            self.backpressure = ctx.options.capture_backpressure
+        if "capture_queue_size" in updated:
+            self.queue_size = ctx.options.capture_queue_size
+        if "capture_batch_size" in updated:
+            self.batch_size = ctx.options.capture_batch_size
+        if "capture_flush_interval" in updated:
+            self.flush_interval = ctx.options.capture_flush_interval
+        if "capture_stream_threshold" in updated:
+            self.stream_threshold = ctx.options.capture_stream_threshold
+        if "capture_metrics_port" in updated:
+            self.metrics_port = ctx.options.capture_metrics_port
+            self._start_metrics()
+        if "capture_pretty" in updated:
+            self.pretty_json = ctx.options.capture_pretty
+        if "capture_rules" in updated:
+            rules_file = ctx.options.capture_rules
+            self.capture_filter = CaptureFilter.from_file(rules_file) if rules_file else None
+            if self.capture_filter:
+                print(f"{Fore.YELLOW}🧹 过滤规则: {rules_file} ({len(self.capture_filter.rules)} 条){Style.RESET_ALL}")
+        if "capture_buffer_entries" in updated or "capture_buffer_bytes" in updated:
+            self.buffer_entries = ctx.options.capture_buffer_entries
+            self.buffer_bytes = ctx.options.capture_buffer_bytes
+            self.flow_buffer = FlowRingBuffer(self.buffer_entries, self.buffer_bytes or None)
+        if "capture_blob_threshold" in updated:
+            self.blob_store.threshold = ctx.options.capture_blob_threshold
+        if "capture_blob_compress" in updated:
+            self.blob_store.compress = ctx.options.capture_blob_compress
+        if "capture_stream_types" in updated:
+            self.stream_types = tuple(
+                t.strip().lower() for t in ctx.options.capture_stream_types.split(',') if t.strip()
+            )
+        # 写入器只在后台线程中使用(SQLite连接修改fsync策略时要执行PRAGMA)，
+        # 已经开始写入时把新设置交给写入线程在下一批之前应用；还没有写入器时创建时就会用上
+        if self.pipeline and ("capture_fsync" in updated or "capture_fsync_interval" in updated):
+            self.pipeline.call_in_writer(self._apply_fsync)
+
+    def _apply_fsync(self):
+        """后台线程: 把fsync选项应用到已打开的写入器"""
+        if self.writer:
+            self.writer.fsync_policy = self.fsync_policy
+            self.writer.fsync_interval = self.fsync_interval
+
+    def done(self):
+        """mitmproxy退出时写完队列中的记录并关闭日志文件"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.pipeline:
+            self.pipeline.close()
+            stats = self.pipeline.stats()
+            if stats["dropped"] or stats["spilled"]:
+                print(f"{Fore.YELLOW}⚠️  写入队列溢出: 丢弃 {stats['dropped']} 条, 溢出到文件 {stats['spilled']} 条{Style.RESET_ALL}")
+            self.pipeline = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self._console_file:
+            self._console_file.close()
+            self._console_file = None
+        if self.links_writer:
+            self.links_writer.close()
+            self.links_writer = None
+            print(f"{Fore.GREEN}🔗 共发现 {self.links_found} 个下载链接: {self.links_file}{Style.RESET_ALL}")
+        if self.latency.hosts:
+            print(f"{Fore.CYAN}⏱️  各主机总耗时分位数:{Style.RESET_ALL}")
+            print(self.latency.format_table("total"))
+            print(f"{Fore.CYAN}⏱️  各主机首字节时间(TTFB)分位数:{Style.RESET_ALL}")
+            print(self.latency.format_table("ttfb"))
+            try:
+                self.latency.save(self.log_base + ".latency.json", self.pretty_json)
+            except Exception as e:
+                print(f"{Fore.RED}❌ 保存延迟统计失败: {str(e)}{Style.RESET_ALL}")
+        if self.capture_filter:
+            print(f"{Fore.CYAN}🧹 过滤规则命中统计:{Style.RESET_ALL}")
+            for name, action, hits in self.capture_filter.stats():
+                print(f"  {name} [{action}]: {hits}")
+
+    def _submit(self, kind, info):
+        """把记录放入后台写入队列"""
+        if self.pipeline is None:
+            self.pipeline = BackgroundWriter(
+                self._handle_batch,
+                max_queue=self.queue_size,
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+                backpressure=self.backpressure,
+                spill_path=self.log_base + ".spill" + JSONL_EXT,
+                spill_encoder=lambda item: item[1].to_dict() if item[0] == "response" else None,
+            )
+        self.pipeline.submit((kind, info))
+
+    def _handle_batch(self, batch):
+        """后台线程: 显示一批记录并批量写入文件"""
+        records = []
+        links = []
+        for kind, record in batch:
+            # 紧凑记录只在这里临时还原为字典，用于显示和写入
+            if kind == "request":
+                self._print_request(record.request_dict())
+            elif kind == "link":
+                link_info = self._extract_link(record)
+                if link_info is not None:
+                    links.append(link_info)
             else:
-                data = []
-            
-            # 添加新数据
-            data.append(complete_info)
-            
-            # 写回文件
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
+                info = record.to_dict()
+                self._print_response(info["response"])
+                records.append(self._externalize_bodies(info))
+        self._save_links(links)
+        self._get_console_file().flush()
+        self._save_to_file(records)
+
+    def _externalize_bodies(self, complete_info):
+        """把较大的请求/响应体存入blob存储，返回只含引用的记录副本"""
+        record = {}
+        for part in ("request", "response"):
+            info = complete_info[part]
+            try:
+                body = self.blob_store.externalize(info.get("body"))
+            except Exception as e:
+                print(f"{Fore.RED}❌ 保存blob失败: {str(e)}{Style.RESET_ALL}")
+                body = info.get("body")
+            record[part] = info if body is info.get("body") else {**info, "body": body}
+        return record
+
+    def _get_console_file(self):
+        """打开控制台日志文件(只在后台线程中使用)"""
+        if self._console_file is None:
+            self._console_file = open(self.console_log_file, 'a', encoding='utf-8')
+        return self._console_file
+
+    def _save_to_file(self, records):
+        """追加保存一批完整的请求响应信息到JSONL文件"""
+        if not records:
+            return
+        try:
+            if self.writer is None and self.backend == "sqlite":
+                self.writer = CaptureDatabase(
+                    self.log_base + DB_EXT,
+                    fsync_policy=self.fsync_policy,
+                    fsync_interval=self.fsync_interval,
+                )
+            elif self.writer is None:
+                self.writer = SegmentedCaptureWriter(
+                    self.log_base,
+                    max_bytes=self.segment_bytes,
+                    max_seconds=self.segment_seconds,
+                    compression=self.segment_compression,
+                    fsync_policy=self.fsync_policy,
+                    fsync_interval=self.fsync_interval,
+                    pretty=self.pretty_json,
+                )
+            self.writer.write_many(records)
         except Exception as e:
             print(f"{Fore.RED}❌ 保存文件失败: {str(e)}{Style.RESET_ALL}")
 
@@ -202,9 +728,21 @@ class HTTPSInterceptor:
 interceptor = HTTPSInterceptor()
 
 # mitmproxy插件函数
+def load(loader):
+    interceptor.load(loader)
+
+def configure(updated):
+    interceptor.configure(updated)
+
+def done():
+    interceptor.done()
+
 def request(flow: http.HTTPFlow):
     interceptor.request(flow)
 
+def responseheaders(flow: http.HTTPFlow):
+    interceptor.responseheaders(flow)
+
 def response(flow: http.HTTPFlow):
     interceptor.response(flow)
 
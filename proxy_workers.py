@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程代理
+在连续的端口上启动多个mitmdump工作进程(每个进程单独占用一个CPU核心做TLS拦截)，
+各自写入带 _w<编号> 后缀的日志分段，崩溃后自动重启；
+分析工具按会话把所有工作进程的日志合并查看
+"""
+
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from colorama import init, Fore, Style
+from metrics_server import DEFAULT_METRICS_PORT, fetch_metrics
+
+init()
+
+
+class _Worker:
+    """一个mitmdump工作进程"""
+
+    def __init__(self, number, port, metrics_port):
+        self.number = number
+        self.port = port
+        self.metrics_port = metrics_port
+        self.process = None
+        self.restarts = 0
+        self.crash_times = deque()
+        self.given_up = False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+class ProxySupervisor:
+    """启动并监督多个mitmdump工作进程
+
+    工作进程i监听 base_port+i，指标端口为 metrics_port+i；
+    在restart_window秒内崩溃超过max_restarts次的工作进程不再重启
+    """
+
+    def __init__(self, workers=1, base_port=8080, metrics_port=DEFAULT_METRICS_PORT,
+                 script="proxy_interceptor.py", extra_args=(), max_restarts=5, restart_window=60):
+        if workers < 1:
+            raise ValueError(f"工作进程数必须大于0: {workers}")
+        self.script = script
+        self.extra_args = list(extra_args)
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        # 所有工作进程使用同一个会话时间，日志按会话合并
+        self.session = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.workers = [
+            _Worker(i + 1, base_port + i, metrics_port + i if metrics_port else 0)
+            for i in range(workers)
+        ]
+        self._stopping = threading.Event()
+        self._monitor_thread = None
+
+    @property
+    def ports(self):
+        return [worker.port for worker in self.workers]
+
+    def command(self, worker):
+        """工作进程的mitmdump命令行"""
+        cmd = [
+            'mitmdump', '-s', self.script, '-p', str(worker.port),
+            '--set', f'capture_session={self.session}',
+        ]
+        # 只有一个工作进程时日志文件名与单进程模式相同
+        if len(self.workers) > 1:
+            cmd += ['--set', f'capture_worker={worker.number}']
+        if worker.metrics_port:
+            cmd += ['--set', f'capture_metrics_port={worker.metrics_port}']
+        return cmd + self.extra_args
+
+    def _spawn(self, worker):
+        # 输出直接显示在终端，不用管道(管道写满后工作进程会卡住)
+        worker.process = subprocess.Popen(self.command(worker))
+
+    def start(self):
+        """启动所有工作进程和监督线程，找不到mitmdump时抛出FileNotFoundError"""
+        for worker in self.workers:
+            self._spawn(worker)
+        self._monitor_thread = threading.Thread(target=self._monitor, name="proxy-supervisor", daemon=True)
+        self._monitor_thread.start()
+
+    def _monitor(self):
+        while not self._stopping.wait(1.0):
+            for worker in self.workers:
+                if worker.given_up or worker.alive or self._stopping.is_set():
+                    continue
+                self._handle_exit(worker)
+
+    def _handle_exit(self, worker):
+        """工作进程意外退出时重启，短时间内反复崩溃则放弃"""
+        code = worker.process.returncode
+        now = time.monotonic()
+        worker.crash_times.append(now)
+        while worker.crash_times and now - worker.crash_times[0] > self.restart_window:
+            worker.crash_times.popleft()
+
+        if len(worker.crash_times) > self.max_restarts:
+            worker.given_up = True
+            print(f"{Fore.RED}❌ 工作进程 #{worker.number} (端口 {worker.port}) "
+                  f"{self.restart_window} 秒内崩溃 {len(worker.crash_times)} 次，不再重启{Style.RESET_ALL}")
+            return
+
+        worker.restarts += 1
+        print(f"{Fore.YELLOW}⚠️  工作进程 #{worker.number} (端口 {worker.port}) 已退出 (退出码 {code})，"
+              f"正在重启 (第 {worker.restarts} 次){Style.RESET_ALL}")
+        try:
+            self._spawn(worker)
+        except OSError as e:
+            worker.given_up = True
+            print(f"{Fore.RED}❌ 重启工作进程 #{worker.number} 失败: {str(e)}{Style.RESET_ALL}")
+
+    @property
+    def running(self):
+        """还有工作进程在运行(或等待重启)"""
+        return not self._stopping.is_set() and not all(worker.given_up for worker in self.workers)
+
+    def wait(self):
+        """阻塞直到stop()被调用或所有工作进程都放弃重启"""
+        while self.running:
+            time.sleep(0.5)
+
+    def stop(self, timeout=10):
+        """停止所有工作进程，先terminate，超时后kill"""
+        self._stopping.set()
+        for worker in self.workers:
+            if worker.alive:
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+                worker.process.wait()
+        if self._monitor_thread:
+            self._monitor_thread.join(timeout=2)
+            self._monitor_thread = None
+
+    def status(self):
+        """各工作进程状态: [(编号, 端口, PID, 是否运行, 重启次数)]"""
+        return [
+            (w.number, w.port, w.process.pid if w.process else None, w.alive, w.restarts)
+            for w in self.workers
+        ]
+
+    def metrics(self, timeout=1):
+        """合并所有工作进程的指标，同名指标的样本拼接在一起(metric_value会求和)
+
+        所有工作进程都读不到时返回None
+        """
+        merged = None
+        for worker in self.workers:
+            if not worker.metrics_port:
+                continue
+            metrics = fetch_metrics(worker.metrics_port, timeout=timeout)
+            if metrics is None:
+                continue
+            merged = merged if merged is not None else {}
+            for name, samples in metrics.items():
+                merged.setdefault(name, []).extend(samples)
+        return merged
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志记录的偏移索引
+为每个JSONL日志文件在旁边保存一个偏移索引文件(<日志>.jsonl.offsets)，
+记录每条记录的字节偏移、长度和请求时间(毫秒)，第一次需要时建立，文件增长后只补充新追加的部分。
+读取单条记录时用mmap只取出这一条的字节再解码，不需要解析它之前的记录。
+
+记录按写入(响应完成)顺序排列，请求时间只是大致有序，所以每项还保存两个单调的时间:
+到这条为止的最大请求时间(ceil)和从这条开始的最小请求时间(floor)，
+按时间范围查询时分别二分查找起点和终点，只检查中间的记录，结果与逐条比较完全相同。
+
+偏移是解压后的字节位置，分段被压缩为 .jsonl.gz/.jsonl.zst 后沿用同一个索引文件；
+压缩分段无法随机访问，读取时顺序解压到目标位置(只解压不解析)
+"""
+
+import mmap
+import os
+import struct
+from capture_log import (COMPRESSION_EXTS, LEGACY_EXT, iter_capture_file, open_capture_binary,
+                         record_epoch_ms)
+from serialization import loads
+
+OFFSETS_SUFFIX = ".offsets"
+
+# 文件头: 格式标记、已建立索引的日志字节数、记录数、是否已覆盖整个(压缩后不再变化的)文件；
+# 之后每条记录一项: 偏移、长度、请求时间、ceil、floor(毫秒，没有时间的记录请求时间为0)
+_MAGIC = b"CAPOFF02"
+_HEADER = struct.Struct("<8sQQQ")
+_ENTRY = struct.Struct("<QIqqq")
+_CEIL = 3
+_FLOOR = 4
+# 之后没有带时间的记录时的floor
+_NO_TIME = 2 ** 63 - 1
+
+
+def offsets_path(path):
+    """日志文件对应的偏移索引文件，压缩前后是同一个"""
+    for ext in COMPRESSION_EXTS.values():
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+            break
+    return path + OFFSETS_SUFFIX
+
+
+def _is_compressed(path):
+    return any(path.endswith(ext) for ext in COMPRESSION_EXTS.values())
+
+
+def _skip(f, count):
+    """在(解压)流中向前跳过count字节"""
+    while count > 0:
+        chunk = f.read(min(count, 1024 * 1024))
+        if not chunk:
+            break
+        count -= len(chunk)
+
+
+def _in_range(ms, since, until):
+    return bool(ms) and (since is None or ms >= since) and (until is None or ms <= until)
+
+
+class RecordOffsets:
+    """一个日志文件的偏移索引，用法:
+
+        with RecordOffsets(path) as offsets:
+            record = offsets.read(ordinal)
+    """
+
+    def __init__(self, path):
+        if path.endswith(LEGACY_EXT):
+            raise ValueError(f"旧版JSON日志没有偏移索引: {path}")
+        self.path = path
+        self.index_path = offsets_path(path)
+        self._count = 0
+        self._map = None
+        self._index_file = None
+        self.refresh()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    # ---- 建立索引 ----
+
+    def refresh(self):
+        """打开偏移索引，日志文件有新追加的记录时补充索引"""
+        self.close()
+        covered, count, complete = self._read_header()
+        compressed = _is_compressed(self.path)
+        # 未压缩的日志只会追加，变短说明文件被替换了
+        if not compressed and os.path.getsize(self.path) < covered:
+            covered, count = 0, 0
+        # 压缩分段的内容不再变化，补充一次写入时还没读到的部分后就不需要再检查
+        if not complete:
+            count = self._extend(covered, count, compressed)
+        self._count = count
+        if count:
+            self._index_file = open(self.index_path, 'rb')
+            self._map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_header(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, covered, count, complete = _HEADER.unpack(f.read(_HEADER.size))
+                if magic == _MAGIC and os.fstat(f.fileno()).st_size >= _HEADER.size + count * _ENTRY.size:
+                    return covered, count, bool(complete)
+        except (OSError, struct.error):
+            pass
+        return 0, 0, False
+
+    def _extend(self, covered, count, compressed):
+        """从covered字节处读取新追加的完整行，追加索引项后再更新文件头，返回记录数"""
+        entries = []
+        offset = covered
+        with open_capture_binary(self.path) as f:
+            if compressed:
+                _skip(f, covered)
+            else:
+                f.seek(covered)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 正在写入的最后一行
+                    break
+                start = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = loads(line)
+                except ValueError:
+                    # 与iter_capture_file一样跳过损坏的行
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                entries.append([start, len(line), record_epoch_ms(record), 0, _NO_TIME])
+        if offset == covered and count and not compressed:
+            return count
+
+        mode = 'r+b' if count else 'wb'
+        with open(self.index_path, mode) as f:
+            ceil = 0
+            if count:
+                f.seek(_HEADER.size + (count - 1) * _ENTRY.size)
+                ceil = _ENTRY.unpack(f.read(_ENTRY.size))[_CEIL]
+            for entry in entries:
+                ceil = max(ceil, entry[2])
+                entry[_CEIL] = ceil
+            floor = _NO_TIME
+            for entry in reversed(entries):
+                if entry[2]:
+                    floor = min(floor, entry[2])
+                entry[_FLOOR] = floor
+
+            f.seek(_HEADER.size + count * _ENTRY.size)
+            f.write(b"".join(_ENTRY.pack(*entry) for entry in entries))
+            f.truncate()
+            # 新记录中比已有记录更早的请求时间要降低前面各项的floor，
+            # floor单调不减，从后往前改到不大于它的项为止(记录大致有序，通常只改几项)
+            position = count - 1
+            while floor != _NO_TIME and position >= 0:
+                f.seek(_HEADER.size + position * _ENTRY.size)
+                entry = list(_ENTRY.unpack(f.read(_ENTRY.size)))
+                if entry[_FLOOR] <= floor:
+                    break
+                entry[_FLOOR] = floor
+                f.seek(_HEADER.size + position * _ENTRY.size)
+                f.write(_ENTRY.pack(*entry))
+                position -= 1
+            f.flush()
+            # 文件头最后写，中途中断时旧的文件头仍然有效
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, offset, count + len(entries), int(compressed)))
+        return count + len(entries)
+
+    # ---- 读取 ----
+
+    def entry(self, ordinal):
+        """第ordinal条记录(从0开始)的 (字节偏移, 长度, 请求时间, ceil, floor)"""
+        if not 0 <= ordinal < self._count:
+            raise IndexError(ordinal)
+        return _ENTRY.unpack_from(self._map, _HEADER.size + ordinal * _ENTRY.size)
+
+    def timestamp(self, ordinal):
+        """第ordinal条记录的请求时间(毫秒)，没有时间时为0"""
+        return self.entry(ordinal)[2]
+
+    def _bisect(self, field, predicate):
+        """第一个满足predicate(单调)的序号，都不满足时返回记录数"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if predicate(self.entry(middle)[field]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def between(self, since=None, until=None):
+        """请求时间在[since, until](毫秒，None表示不限)内的记录序号，按文件顺序
+
+        ceil >= since之前的记录都早于since，floor > until开始的记录都晚于until，只检查两者之间的记录；
+        指定了时间范围时没有时间的记录不返回
+        """
+        if since is None and until is None:
+            return list(range(self._count))
+        start = 0 if since is None else self._bisect(_CEIL, lambda ceil: ceil >= since)
+        end = self._count if until is None else self._bisect(_FLOOR, lambda floor: floor > until)
+        return [ordinal for ordinal in range(start, end) if _in_range(self.timestamp(ordinal), since, until)]
+
+    def read(self, ordinal):
+        """读取第ordinal条记录，不存在时返回None"""
+        return self.read_many([ordinal]).get(ordinal)
+
+    def read_many(self, ordinals):
+        """读取多条记录，返回 {序号: 记录}，不存在的序号不出现在结果中"""
+        return dict(self.iter_read(ordinals))
+
+    def iter_read(self, ordinals):
+        """按文件中的位置顺序逐条返回 (序号, 记录)，不存在的序号跳过；压缩分段只顺序解压一遍"""
+        wanted = sorted({ordinal for ordinal in ordinals if 0 <= ordinal < self._count},
+                        key=lambda ordinal: self.entry(ordinal)[0])
+        if not wanted:
+            return
+        if _is_compressed(self.path):
+            with open_capture_binary(self.path) as f:
+                position = 0
+                for ordinal in wanted:
+                    offset, length = self.entry(ordinal)[:2]
+                    _skip(f, offset - position)
+                    yield ordinal, loads(f.read(length))
+                    position = offset + length
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for ordinal in wanted:
+                offset, length = self.entry(ordinal)[:2]
+                yield ordinal, loads(data[offset:offset + length])
+
+
+def iter_records_between(path, since=None, until=None):
+    """逐条返回日志文件中请求时间在[since, until](毫秒)内的 (序号, 记录)，只读取范围内的记录
+
+    旧版JSON日志没有偏移索引，无法建立偏移索引(例如日志目录只读)时也一样，逐条读取后比较
+    """
+    offsets = None
+    if not path.endswith(LEGACY_EXT):
+        try:
+            offsets = RecordOffsets(path)
+        except OSError:
+            pass
+    if offsets is None:
+        for ordinal, record in enumerate(iter_capture_file(path)):
+            if (since is None and until is None) or _in_range(record_epoch_ms(record), since, until):
+                yield ordinal, record
+        return
+    with offsets:
+        yield from offsets.iter_read(offsets.between(since, until))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志记录的过滤表达式
+命令行中用一个表达式筛选记录，例如:
+    host~aliyun status>=400
+    api.php and (method=POST or duration>500) and not status=2xx
+    time>=2025-05-28T17:16 time<=2025-05-28T17:19 endpoint~getlist
+
+语法:
+    单独的词或引号中的字符串     URL或主机包含它(不区分大小写)，与菜单搜索的关键词相同
+    字段 运算符 值              值中有空格或运算符时加引号
+    and / or / not / 括号       相邻的条件之间默认为and
+
+字段:
+    method host url path endpoint   字符串，支持 = != ~(包含) !~(不包含)，不区分大小写
+    status                          状态码，没有响应时为0；值可以写成 4xx
+    duration                        响应耗时(毫秒)，没有耗时的记录不满足任何比较
+    request_size response_size      body大小(字节)
+    time                            请求时间，格式同--since，按时间单位比较:
+                                    time=17:16 为这一分钟，time>17:16 为17:17之后，time<=2025-05-28 包含这一天
+
+顶层and中的关键词、method=、status=和time条件会交给数据库、搜索索引或偏移索引提前筛选，
+其余条件在读出记录后逐条判断
+"""
+
+import re
+from capture_log import parse_time_bound, parse_until_bound, record_epoch_ms
+from endpoint_templates import EndpointTemplates
+
+_TOKEN_RE = re.compile(r"""\s*(?:(?P<paren>[()])|(?P<op>!=|>=|<=|!~|=|<|>|~)|"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<word>[^\s()=<>~!"']+|!))""")
+_STATUS_CLASS_RE = re.compile(r"[1-5]xx", re.IGNORECASE)
+_KEYWORDS = ("and", "or", "not")
+
+_TEMPLATES = EndpointTemplates()
+
+
+def _request(record):
+    return record.get('request') or {}
+
+
+def _response(record):
+    return record.get('response') or {}
+
+
+def _duration_ms(record):
+    seconds = _response(record).get('response_time')
+    return seconds * 1000 if seconds is not None else None
+
+
+def _endpoint(record):
+    request = _request(record)
+    return _TEMPLATES.template(request.get('method'), request.get('url'), request.get('host'))
+
+
+# 字段名 -> (取值函数, 类型)
+FIELDS = {
+    "method": (lambda record: _request(record).get('method') or '', "text"),
+    "host": (lambda record: _request(record).get('host') or '', "text"),
+    "url": (lambda record: _request(record).get('url') or '', "text"),
+    "path": (lambda record: _request(record).get('path') or '', "text"),
+    "endpoint": (_endpoint, "text"),
+    "status": (lambda record: _response(record).get('status_code') or 0, "status"),
+    "duration": (_duration_ms, "number"),
+    "request_size": (lambda record: _request(record).get('body_size') or 0, "number"),
+    "response_size": (lambda record: _response(record).get('body_size') or 0, "number"),
+    "time": (record_epoch_ms, "time"),
+}
+
+_OPERATORS = {
+    "text": ("=", "!=", "~", "!~"),
+    "status": ("=", "!=", "<", "<=", ">", ">="),
+    "number": ("=", "!=", "<", "<=", ">", ">="),
+    "time": ("=", "!=", "<", "<=", ">", ">="),
+}
+
+
+def _tokenize(text):
+    """拆分为 (类型, 值)，类型为 paren/op/string/word"""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"无法识别的过滤表达式: {text[position:]}")
+        position = match.end()
+        if match.group("paren"):
+            tokens.append(("paren", match.group("paren")))
+        elif match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("dq") is not None or match.group("sq") is not None:
+            tokens.append(("string", match.group("dq") if match.group("dq") is not None else match.group("sq")))
+        else:
+            tokens.append(("word", match.group("word")))
+    return tokens
+
+
+def _keyword_predicate(keyword):
+    keyword = keyword.lower()
+    return lambda record: (keyword in (_request(record).get('url') or '').lower()
+                           or keyword in (_request(record).get('host') or '').lower())
+
+
+def _number(field, value):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{field} 的值必须是数字: {value}") from None
+
+
+def _comparison(field, operator, value):
+    """编译一个比较条件，返回 (判断函数, 可提前筛选的条件)"""
+    if field not in FIELDS:
+        raise ValueError(f"未知字段: {field} (可选: {', '.join(FIELDS)})")
+    getter, kind = FIELDS[field]
+    if operator not in _OPERATORS[kind]:
+        raise ValueError(f"字段 {field} 不支持运算符 {operator} (可选: {' '.join(_OPERATORS[kind])})")
+    hint = {}
+
+    if kind == "text":
+        expected = value.lower()
+        if operator in ("=", "!="):
+            test = lambda actual: actual.lower() == expected
+            if field == "method" and operator == "=":
+                hint["method"] = value.upper()
+        else:
+            test = lambda actual: expected in actual.lower()
+            # URL或主机包含关键词的记录是它的超集，可以先用关键词筛选
+            if field in ("url", "host") and operator == "~":
+                hint["keyword"] = value
+        if operator.startswith("!"):
+            return (lambda record: not test(getter(record))), hint
+        return (lambda record: test(getter(record))), hint
+
+    if kind == "time":
+        try:
+            low, high = parse_time_bound(value), parse_until_bound(value)
+        except ValueError:
+            raise ValueError(f"无法识别的时间: {value}") from None
+        # 与--since/--until一致: 没有请求时间的记录不满足时间条件
+        checks = {
+            "=": lambda ms: low <= ms <= high,
+            "<": lambda ms: ms < low,
+            "<=": lambda ms: ms <= high,
+            ">": lambda ms: ms > high,
+            ">=": lambda ms: ms >= low,
+        }
+        bounds = {"=": (low, high), "<": (None, low - 1), "<=": (None, high),
+                  ">": (high + 1, None), ">=": (low, None)}
+        if operator == "!=":
+            return (lambda record: not (low <= record_epoch_ms(record) <= high)), hint
+        check = checks[operator]
+        hint["since"], hint["until"] = bounds[operator]
+        return (lambda record: bool(record_epoch_ms(record)) and check(record_epoch_ms(record))), hint
+
+    if kind == "status" and _STATUS_CLASS_RE.fullmatch(value):
+        low = int(value[0]) * 100
+        in_class = lambda record: low <= getter(record) < low + 100
+        if operator == "=":
+            return in_class, hint
+        if operator == "!=":
+            return (lambda record: not in_class(record)), hint
+        raise ValueError(f"状态码类别 {value} 只支持 = 和 !=")
+
+    expected = _number(field, value)
+    # 没有响应的记录(status=0)不在索引中，不提前筛选
+    if kind == "status" and operator == "=" and expected and expected.is_integer():
+        hint["status_code"] = int(expected)
+    compare = {
+        "=": lambda actual: actual == expected,
+        "!=": lambda actual: actual != expected,
+        "<": lambda actual: actual < expected,
+        "<=": lambda actual: actual <= expected,
+        ">": lambda actual: actual > expected,
+        ">=": lambda actual: actual >= expected,
+    }[operator]
+
+    def predicate(record):
+        actual = getter(record)
+        return actual is not None and compare(actual)
+    return predicate, hint
+
+
+class _Parser:
+    """递归下降: or_expr := and_expr (or and_expr)*; and_expr := not_expr ([and] not_expr)*"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def is_keyword(self, token, keyword):
+        return token[0] == "word" and token[1].lower() == keyword
+
+    def parse(self):
+        node = self.or_expr()
+        if self.position < len(self.tokens):
+            raise ValueError(f"过滤表达式中多余的内容: {self.peek()[1]}")
+        return node
+
+    # 节点: ("or", [子节点]) / ("and", [子节点]) / ("not", 子节点) / ("test", 判断函数, 提前筛选条件)
+    def or_expr(self):
+        children = [self.and_expr()]
+        while self.is_keyword(self.peek(), "or"):
+            self.next()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def and_expr(self):
+        children = [self.not_expr()]
+        while True:
+            token = self.peek()
+            if token[0] is None or token == ("paren", ")") or self.is_keyword(token, "or"):
+                break
+            if self.is_keyword(token, "and"):
+                self.next()
+            children.append(self.not_expr())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def not_expr(self):
+        token = self.peek()
+        if self.is_keyword(token, "not") or token == ("word", "!"):
+            self.next()
+            return ("not", self.not_expr())
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.next()
+        if kind is None:
+            raise ValueError("过滤表达式不完整")
+        if (kind, value) == ("paren", "("):
+            node = self.or_expr()
+            if self.next() != ("paren", ")"):
+                raise ValueError("过滤表达式缺少 )")
+            return node
+        if kind in ("paren", "op") or (kind == "word" and value.lower() in _KEYWORDS):
+            raise ValueError(f"过滤表达式中意外的 {value}")
+        if kind == "word" and self.peek()[0] == "op":
+            operator = self.next()[1]
+            value_kind, operand = self.next()
+            if value_kind not in ("word", "string"):
+                raise ValueError(f"{value}{operator} 后缺少值")
+            predicate, hint = _comparison(value.lower(), operator, operand)
+            return ("test", predicate, hint)
+        return ("test", _keyword_predicate(value), {"keyword": value})
+
+
+def _compile(node):
+    if node[0] == "test":
+        return node[1]
+    if node[0] == "not":
+        child = _compile(node[1])
+        return lambda record: not child(record)
+    children = [_compile(child) for child in node[1]]
+    if node[0] == "and":
+        return lambda record: all(child(record) for child in children)
+    return lambda record: any(child(record) for child in children)
+
+
+class RecordQuery:
+    """编译后的过滤表达式，用法:
+
+        query = RecordQuery("host~aliyun status>=400")
+        matched = [record for record in records if query.match(record)]
+
+    hints是顶层and中可以提前筛选的条件: keyword、method、status_code、since、until(毫秒)
+    """
+
+    def __init__(self, text=None):
+        self.text = (text or "").strip()
+        self.hints = {}
+        if not self.text:
+            self.match = lambda record: True
+            return
+        node = _Parser(_tokenize(self.text)).parse()
+        self.match = _compile(node)
+        for child in node[1] if node[0] == "and" else [node]:
+            if child[0] == "test":
+                self._add_hint(child[2])
+
+    def _add_hint(self, hint):
+        for key, value in hint.items():
+            if value is None:
+                continue
+            if key == "since":
+                self.hints[key] = max(value, self.hints.get(key, value))
+            elif key == "until":
+                self.hints[key] = min(value, self.hints.get(key, value))
+            else:
+                # 同一类条件只提前筛选第一个，其余的逐条判断
+                self.hints.setdefault(key, value)
+
+    def time_range(self, since=None, until=None):
+        """表达式中的时间条件与给定范围的交集 (since, until)"""
+        if self.hints.get("since") is not None:
+            since = self.hints["since"] if since is None else max(since, self.hints["since"])
+        if self.hints.get("until") is not None:
+            until = self.hints["until"] if until is None else min(until, self.hints["until"])
+        return since, until
+
+    def __repr__(self):
+        return f"RecordQuery({self.text!r})"
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志搜索索引
+为抓包日志建立持久化的倒排索引(保存在 logs/search_index.sqlite)，
+URL/主机按单词切分，方法和状态码作为特殊词条，每个日志文件每个词条一条倒排表(记录序号数组)。
+查询时先求倒排表交集得到候选记录，再用索引中保存的小写URL/主机做子串确认，
+结果与逐条比较 `keyword in url.lower()` 完全相同。
+
+索引按文件增量维护: 新出现的文件建立索引，大小或修改时间变化的文件(正在写入的分段)重建索引，
+已删除文件的索引条目自动清除；实时跟踪时新追加的记录直接接在文件已有的倒排表之后
+"""
+
+import os
+import re
+import sqlite3
+from array import array
+from capture_log import iter_capture_file
+from parallel_ingest import map_capture_files
+
+INDEX_NAME = "search_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    records INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY,
+    token TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    token_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    ordinals BLOB NOT NULL,
+    PRIMARY KEY (token_id, file_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS texts (
+    file_id INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (file_id, ordinal)
+) WITHOUT ROWID;
+"""
+
+_TOKEN_RE = re.compile(r"\w+")
+# 方法/状态码词条带冒号，不会与URL单词(\w+)冲突
+_METHOD_PREFIX = "method:"
+_STATUS_PREFIX = "status:"
+# 候选不超过该数量时按序号取文本确认(SQLite默认最多999个参数)，否则扫描整个文件的文本
+_FETCH_CHUNK = 500
+
+
+def _search_text(request):
+    """用于关键词匹配的小写文本: URL，主机不在URL中时追加主机"""
+    url = (request.get('url') or '').lower()
+    host = (request.get('host') or '').lower()
+    return url if host in url else url + "\n" + host
+
+
+def _keyword_terms(keyword):
+    """把关键词切分为 [(单词, 查找方式)]
+
+    关键词是URL的子串时，其中左右都被分隔符截断的单词一定是URL中的完整单词(exact)，
+    只有左边被截断的单词是URL单词的前缀(prefix)，其余情况只能是URL单词的子串(substring)
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(keyword):
+        left = match.start() > 0
+        right = match.end() < len(keyword)
+        kind = "exact" if left and right else "prefix" if left else "substring"
+        terms.append((match.group(), kind))
+    return terms
+
+
+def _scan_records(records, first_ordinal=0):
+    """为一组记录生成 (记录数, {词条: 序号数组}, [(序号, 搜索文本)])，序号从first_ordinal开始"""
+    postings = {}
+    texts = []
+    count = 0
+    for ordinal, record in enumerate(records, first_ordinal):
+        count += 1
+        request = record.get('request') or {}
+        response = record.get('response') or {}
+        text = _search_text(request)
+        texts.append((ordinal, text))
+        tokens = set(_TOKEN_RE.findall(text))
+        if request.get('method'):
+            tokens.add(_METHOD_PREFIX + request['method'].lower())
+        if response.get('status_code') is not None:
+            tokens.add(f"{_STATUS_PREFIX}{response['status_code']}")
+        for token in tokens:
+            postings.setdefault(token, array('I')).append(ordinal)
+    return count, postings, texts
+
+
+def scan_capture_file(path):
+    """扫描一个日志文件，在进程池中运行"""
+    return _scan_records(iter_capture_file(path))
+
+
+class SearchIndex:
+    """抓包日志的持久化倒排索引"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 维护 ----
+
+    def update(self, paths, workers=None):
+        """为新文件和已变化的文件建立索引，返回重建索引的文件列表
+
+        需要(重新)索引的文件由workers个进程并行扫描，写入索引在当前进程中按文件顺序进行
+        """
+        self.prune()
+        known = {
+            row[0]: (row[1], row[2])
+            for row in self._conn.execute("SELECT path, mtime, size FROM files")
+        }
+        changed = {}
+        for path in paths:
+            # 先记下扫描前的状态，扫描期间文件又有写入时下次会再重建
+            stat = os.stat(path)
+            if known.get(os.path.abspath(path)) != (stat.st_mtime, stat.st_size):
+                changed[path] = stat
+        for path, scanned in map_capture_files(scan_capture_file, changed, workers):
+            self._store_file(os.path.abspath(path), changed[path], scanned)
+        return list(changed)
+
+    def prune(self):
+        """删除已不存在的文件的索引"""
+        missing = [
+            (file_id,) for file_id, path in self._conn.execute("SELECT id, path FROM files")
+            if not os.path.exists(path)
+        ]
+        if missing:
+            with self._conn:
+                self._delete_files(missing)
+
+    def _delete_files(self, file_ids):
+        self._conn.executemany("DELETE FROM postings WHERE file_id = ?", file_ids)
+        self._conn.executemany("DELETE FROM texts WHERE file_id = ?", file_ids)
+        self._conn.executemany("DELETE FROM files WHERE id = ?", file_ids)
+
+    def _store_file(self, path, stat, scanned):
+        """在一个事务中用扫描结果替换文件的旧索引条目"""
+        count, postings, texts = scanned
+        with self._conn:
+            row = self._conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._delete_files([(row[0],)])
+            file_id = self._conn.execute(
+                "INSERT INTO files (path, mtime, size, records) VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime, stat.st_size, count),
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tokens (token) VALUES (?)", ((token,) for token in postings)
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (token_id, file_id, ordinals) "
+                "VALUES ((SELECT id FROM tokens WHERE token = ?), ?, ?)",
+                ((token, file_id, ordinals.tobytes()) for token, ordinals in postings.items()),
+            )
+            self._conn.executemany(
+                "INSERT INTO texts (file_id, ordinal, text) VALUES (?, ?, ?)",
+                ((file_id, ordinal, text) for ordinal, text in texts),
+            )
+
+    def append(self, path, first_ordinal, records, stat=None):
+        """把文件中从first_ordinal(从0开始)起的新记录加入索引，用于实时跟踪
+
+        已经在索引中的记录跳过；与索引中的记录数接不上时删除该文件的索引，下次update时重建。
+        stat为读取前的os.stat，只有读到文件末尾时才给出；为None时记下无效的大小，
+        中途退出后update会重建该文件的索引
+        """
+        path = os.path.abspath(path)
+        row = self._conn.execute("SELECT id, records FROM files WHERE path = ?", (path,)).fetchone()
+        indexed = row[1] if row else 0
+        if first_ordinal > indexed:
+            if row:
+                with self._conn:
+                    self._delete_files([(row[0],)])
+            return False
+        count, postings, texts = _scan_records(records[indexed - first_ordinal:], indexed)
+        mtime, size = (stat.st_mtime, stat.st_size) if stat else (0, -1)
+        with self._conn:
+            if row is None:
+                file_id = self._conn.execute(
+                    "INSERT INTO files (path, mtime, size, records) VALUES (?, ?, ?, ?)",
+                    (path, mtime, size, count),
+                ).lastrowid
+            else:
+                file_id = row[0]
+                self._conn.execute(
+                    "UPDATE files SET mtime = ?, size = ?, records = ? WHERE id = ?",
+                    (mtime, size, indexed + count, file_id),
+                )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tokens (token) VALUES (?)", ((token,) for token in postings)
+            )
+            # 新序号都比已有的大，接在原倒排表后面仍然有序
+            for token, ordinals in postings.items():
+                token_id = self._conn.execute("SELECT id FROM tokens WHERE token = ?", (token,)).fetchone()[0]
+                existing = self._conn.execute(
+                    "SELECT ordinals FROM postings WHERE token_id = ? AND file_id = ?", (token_id, file_id)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO postings (token_id, file_id, ordinals) VALUES (?, ?, ?)",
+                    (token_id, file_id, (existing[0] if existing else b"") + ordinals.tobytes()),
+                )
+            self._conn.executemany(
+                "INSERT INTO texts (file_id, ordinal, text) VALUES (?, ?, ?)",
+                ((file_id, ordinal, text) for ordinal, text in texts),
+            )
+        return True
+
+    def rename(self, old_path, new_path):
+        """分段被压缩后把索引条目转到新文件名，内容不变；文件状态在下次append时更新"""
+        old_path = os.path.abspath(old_path)
+        new_path = os.path.abspath(new_path)
+        with self._conn:
+            row = self._conn.execute("SELECT id FROM files WHERE path = ?", (new_path,)).fetchone()
+            if row:
+                self._delete_files([(row[0],)])
+            self._conn.execute(
+                "UPDATE files SET path = ?, mtime = 0, size = -1 WHERE path = ?", (new_path, old_path)
+            )
+
+    # ---- 查询 ----
+
+    def _files(self, paths):
+        """[(文件id, 记录数)]，与paths一一对应，未建立索引的文件为(None, 0)"""
+        rows = {
+            row[0]: (row[1], row[2])
+            for row in self._conn.execute("SELECT path, id, records FROM files")
+        }
+        return [rows.get(os.path.abspath(path), (None, 0)) for path in paths]
+
+    def record_counts(self, paths):
+        """各文件的记录数(需要先update)"""
+        return [records for _, records in self._files(paths)]
+
+    def _token_ids(self, term, kind):
+        if kind == "exact":
+            sql, params = "SELECT id FROM tokens WHERE token = ?", (term,)
+        elif kind == "prefix":
+            # 利用token的唯一索引做范围查询
+            sql, params = "SELECT id FROM tokens WHERE token >= ? AND token < ?", (term, term + "\U0010ffff")
+        else:
+            # 词表比记录少得多，扫描词表找出包含该子串的单词
+            sql, params = "SELECT id FROM tokens WHERE instr(token, ?) > 0 AND instr(token, ':') = 0", (term,)
+        return [row[0] for row in self._conn.execute(sql, params)]
+
+    def _postings(self, token_ids, file_ids):
+        """一组词条在各文件中的倒排表并集 {文件id: set(序号)}"""
+        result = {}
+        for token_id in token_ids:
+            for file_id, blob in self._conn.execute(
+                "SELECT file_id, ordinals FROM postings WHERE token_id = ?", (token_id,)
+            ):
+                if file_id in file_ids:
+                    ordinals = array('I')
+                    ordinals.frombytes(blob)
+                    result.setdefault(file_id, set()).update(ordinals)
+        return result
+
+    def _verify(self, file_id, ordinals, keyword):
+        """在候选记录中确认搜索文本包含keyword，返回命中的序号；ordinals为None时检查整个文件"""
+        if ordinals is None or len(ordinals) > _FETCH_CHUNK:
+            # 候选较多时在SQLite中扫描整个文件的文本再取交集，比分批按序号查询快
+            matched = {row[0] for row in self._conn.execute(
+                "SELECT ordinal FROM texts WHERE file_id = ? AND instr(text, ?) > 0", (file_id, keyword)
+            )}
+            return matched if ordinals is None else matched & ordinals
+        return {row[0] for row in self._conn.execute(
+            f"SELECT ordinal FROM texts WHERE file_id = ? AND ordinal IN ({','.join('?' * len(ordinals))})"
+            " AND instr(text, ?) > 0",
+            [file_id] + list(ordinals) + [keyword],
+        )}
+
+    def search(self, paths, keyword=None, method=None, status_code=None):
+        """在paths(需要先update)中查询，返回按文件顺序、文件内序号排列的 [(文件在paths中的位置, 序号)]
+
+        keyword匹配URL或主机的子串(不区分大小写)，method不区分大小写，status_code精确匹配
+        """
+        files = self._files(paths)
+        file_ids = {file_id for file_id, _ in files if file_id is not None}
+
+        # 每个条件得到一组候选 {文件id: set(序号)}，条件之间求交集
+        conditions = []
+        if method:
+            conditions.append(self._token_ids(_METHOD_PREFIX + method.lower(), "exact"))
+        if status_code is not None:
+            conditions.append(self._token_ids(f"{_STATUS_PREFIX}{status_code}", "exact"))
+
+        keyword = keyword.lower() if keyword else None
+        verify = False
+        if keyword:
+            terms = _keyword_terms(keyword)
+            # 完整单词和前缀走索引查找，足以缩小候选范围时不再扫描词表
+            indexed = [(term, kind) for term, kind in terms if kind != "substring"]
+            if not indexed and terms:
+                indexed = [max(terms, key=lambda t: len(t[0]))]
+            for term, kind in indexed:
+                conditions.append(self._token_ids(term, kind))
+            # 关键词本身就是一个单词时，包含它的单词对应的记录就是结果，不需要再确认
+            verify = not (len(terms) == 1 and terms[0][0] == keyword)
+
+        candidates = None
+        for token_ids in sorted(conditions, key=len):
+            postings = self._postings(token_ids, file_ids)
+            if candidates is None:
+                candidates = postings
+            else:
+                candidates = {
+                    file_id: ordinals & postings[file_id]
+                    for file_id, ordinals in candidates.items() if file_id in postings
+                }
+            if not candidates:
+                return []
+
+        results = []
+        for position, (file_id, records) in enumerate(files):
+            if file_id is None:
+                continue
+            ordinals = candidates.get(file_id) if candidates is not None else None
+            if candidates is not None and not ordinals:
+                continue
+            if verify:
+                ordinals = self._verify(file_id, ordinals, keyword)
+            elif ordinals is None:
+                ordinals = range(records)
+            results.extend((position, ordinal) for ordinal in sorted(ordinals))
+        return results
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化
+日志、数据库和导出文件统一通过这里编码/解码。默认输出紧凑JSON(无多余空格，中文原样输出)，
+pretty=True时缩进两格便于人工查看；安装了orjson时用它编码/解码，否则使用标准库json
+"""
+
+import json
+
+# orjson可选，未安装时退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    _PRETTY_OPTIONS = _OPTIONS | orjson.OPT_INDENT_2
+
+
+def _std_dumps(obj, pretty):
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps_bytes(obj, pretty=False):
+    """编码为UTF-8字节"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_PRETTY_OPTIONS if pretty else _OPTIONS)
+        except TypeError:
+            # orjson不支持的值(超过64位的整数等)交给标准库
+            pass
+    return _std_dumps(obj, pretty).encode('utf-8')
+
+
+def dumps(obj, pretty=False):
+    """编码为字符串"""
+    if orjson is not None:
+        return dumps_bytes(obj, pretty).decode('utf-8')
+    return _std_dumps(obj, pretty)
+
+
+def dumps_line(obj):
+    """编码为一行紧凑JSON(UTF-8字节，以换行结尾)，用于JSONL文件"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass
+    return (_std_dumps(obj, False) + "\n").encode('utf-8')
+
+
+def loads(data):
+    """解码字符串或字节，格式错误时抛出ValueError(json.JSONDecodeError)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson不接受NaN、单独的代理字符等标准库能读的内容，再试一次
+            pass
+    return json.loads(data)
+
+
+def dump_file(obj, path, pretty=False):
+    """写入JSON文件"""
+    with open(path, 'wb') as f:
+        f.write(dumps_bytes(obj, pretty))
+
+
+def load_file(path):
+    """读取JSON文件"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
@@ -9,18 +9,29 @@ import os
 import sys
 import time
 import json
+import argparse
 import subprocess
 import threading
 from datetime import datetime
 from colorama import init, Fore, Style
+from metrics_server import metric_value
+from proxy_workers import ProxySupervisor
+from link_rules import find_link_streams
+from capture_log import is_capture_file
 
 # 初始化colorama
 init()
 
 class DownloadCaptureManager:
-    def __init__(self):
-        self.proxy_process = None
+    def __init__(self, workers=1, base_port=8080, pretty=False):
+        # 多个模拟器同时抓包时可以启动多个代理进程，每个进程一个端口
+        self.workers = workers
+        self.base_port = base_port
+        # 保存的链接文件是否缩进，默认紧凑
+        self.pretty = pretty
+        self.supervisor = None
         self.is_capturing = False
+        self.capture_started_at = None
         
     def show_welcome(self):
         """显示欢迎界面"""
@@ -78,14 +89,18 @@ class DownloadCaptureManager:
         print(f"\n{Fore.GREEN}🚀 启动代理服务器{Style.RESET_ALL}")
         
         try:
-            # 启动代理服务器
-            self.proxy_process = subprocess.Popen([
-                'mitmdump', '-s', 'proxy_interceptor.py', '-p', '8080'
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            # 启动代理服务器(崩溃后自动重启)，输出直接显示在终端
+            self.capture_started_at = time.time()
+            self.supervisor = ProxySupervisor(workers=self.workers, base_port=self.base_port)
+            self.supervisor.start()
+            ports = ", ".join(str(port) for port in self.supervisor.ports)
             
-            print(f"{Fore.GREEN}✅ 代理服务器已启动 (端口: 8080){Style.RESET_ALL}")
+            print(f"{Fore.GREEN}✅ 代理服务器已启动 (端口: {ports}){Style.RESET_ALL}")
             print(f"{Fore.YELLOW}📱 现在请配置你的Android模拟器：{Style.RESET_ALL}")
-            print("   1. 设置代理: 10.0.2.2:8080")
+            if self.workers > 1:
+                print(f"   1. 设置代理: 每个模拟器使用不同端口 10.0.2.2:{self.supervisor.ports[0]}-{self.supervisor.ports[-1]}")
+            else:
+                print(f"   1. 设置代理: 10.0.2.2:{self.base_port}")
             print("   2. 安装证书: 访问 mitm.it 下载证书")
             print("   3. 在APK中点击下载按钮")
             print(f"{Fore.CYAN}🔄 正在实时监听网络请求...{Style.RESET_ALL}")
@@ -96,6 +111,7 @@ class DownloadCaptureManager:
         except FileNotFoundError:
             print(f"{Fore.RED}❌ 找不到mitmdump命令{Style.RESET_ALL}")
             print("请确保已安装mitmproxy: pip install mitmproxy")
+            self.supervisor = None
         except Exception as e:
             print(f"{Fore.RED}❌ 启动失败: {str(e)}{Style.RESET_ALL}")
     
@@ -108,18 +124,38 @@ class DownloadCaptureManager:
         print("   - 请在APK中执行下载操作...")
         
         try:
-            # 等待用户操作
-            while self.is_capturing:
+            # 等待用户操作，每10秒显示一次运行指标
+            last_status = time.time()
+            while self.is_capturing and self.supervisor.running:
                 time.sleep(1)
+                if time.time() - last_status >= 10:
+                    last_status = time.time()
+                    self.print_metrics_line()
+            if self.is_capturing:
+                print(f"{Fore.RED}❌ 所有代理进程都已停止{Style.RESET_ALL}")
+                self.stop_proxy()
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}⏹️  捕获已停止{Style.RESET_ALL}")
             self.stop_proxy()
             self.analyze_captured_data()
     
+    def print_metrics_line(self):
+        """显示一行运行指标摘要"""
+        metrics = self.supervisor.metrics() if self.supervisor else None
+        if metrics is None:
+            return
+        memory_mb = metric_value(metrics, 'capture_process_resident_memory_bytes') / (1024 * 1024)
+        print(f"{Fore.CYAN}📈 请求: {metric_value(metrics, 'capture_flows_total'):.0f} | "
+              f"{metric_value(metrics, 'capture_flows_per_second'):.1f}/秒 | "
+              f"写入队列: {metric_value(metrics, 'capture_writer_queue_depth'):.0f} | "
+              f"丢弃: {metric_value(metrics, 'capture_writer_dropped_total'):.0f} | "
+              f"内存: {memory_mb:.1f} MB{Style.RESET_ALL}")
+    
     def stop_proxy(self):
         """停止代理服务器"""
-        if self.proxy_process:
-            self.proxy_process.terminate()
+        if self.supervisor:
+            self.supervisor.stop()
+            self.supervisor = None
             print(f"{Fore.GREEN}✅ 代理服务器已停止{Style.RESET_ALL}")
             self.is_capturing = False
     
@@ -127,11 +163,27 @@ class DownloadCaptureManager:
         """分析捕获的数据"""
         print(f"\n{Fore.BLUE}📊 分析捕获的数据{Style.RESET_ALL}")
         
-        # 运行下载链接提取器
+        # 代理在抓包时已经实时提取了链接，直接读取本次的链接文件
+        streams = [
+            path for path in find_link_streams('logs')
+            if self.capture_started_at and os.path.getmtime(path) >= self.capture_started_at
+        ]
+        if streams:
+            from download_link_extractor import DownloadLinkExtractor
+            extractor = DownloadLinkExtractor()
+            for path in streams:
+                extractor.load_link_stream(path)
+            if extractor.download_links:
+                extractor.verify_links()
+            extractor.save_links_to_file(pretty=self.pretty)
+            self.show_results()
+            return
+        
+        # 没有实时结果时重新扫描日志
         try:
             result = subprocess.run([
                 'python', 'download_link_extractor.py'
-            ], capture_output=True, text=True)
+            ] + (['--pretty'] if self.pretty else []), capture_output=True, text=True)
             
             if result.returncode == 0:
                 print(f"{Fore.GREEN}✅ 数据分析完成{Style.RESET_ALL}")
@@ -189,15 +241,46 @@ class DownloadCaptureManager:
         """检查代理状态"""
         print(f"\n{Fore.BLUE}🔍 检查代理状态{Style.RESET_ALL}")
         
-        if self.is_capturing:
-            print(f"{Fore.GREEN}✅ 代理服务器正在运行 (PID: {self.proxy_process.pid}){Style.RESET_ALL}")
-            print(f"📱 模拟器代理配置: 10.0.2.2:8080")
+        metrics = self.supervisor.metrics(timeout=2) if self.supervisor else None
+        if self.supervisor:
+            for number, port, pid, alive, restarts in self.supervisor.status():
+                state = f"{Fore.GREEN}运行中{Style.RESET_ALL}" if alive else f"{Fore.RED}已停止{Style.RESET_ALL}"
+                print(f"   进程 #{number}: 端口 {port}, PID {pid}, {state}, 重启 {restarts} 次")
+        if metrics is not None:
+            print(f"{Fore.GREEN}✅ 代理服务器正在运行{Style.RESET_ALL}")
+            print(f"📱 模拟器代理配置: " + ", ".join(f"10.0.2.2:{port}" for port in self.supervisor.ports))
+            uptime = max(value for _, value in metrics.get('capture_uptime_seconds', [({}, 0.0)]))
+            print(f"⏱️  运行时间: {uptime:.0f} 秒")
+            print(f"📊 已记录请求: {metric_value(metrics, 'capture_flows_total'):.0f} "
+                  f"(最近 {metric_value(metrics, 'capture_flows_per_second'):.1f}/秒)")
+            print(f"📝 写入队列: {metric_value(metrics, 'capture_writer_queue_depth'):.0f} 条等待, "
+                  f"丢弃 {metric_value(metrics, 'capture_writer_dropped_total'):.0f}, "
+                  f"溢出 {metric_value(metrics, 'capture_writer_spilled_total'):.0f}")
+            batches = metric_value(metrics, 'capture_persist_batch_seconds_count')
+            if batches:
+                average_ms = metric_value(metrics, 'capture_persist_batch_seconds_sum') / batches * 1000
+                print(f"💾 平均每批写入耗时: {average_ms:.2f} ms")
+            print(f"🧠 内存: {metric_value(metrics, 'capture_process_resident_memory_bytes') / (1024 * 1024):.1f} MB")
+            
+            # 按流量排序显示前几个主机(多个进程的同一主机合并)
+            def by_host(name):
+                totals = {}
+                for labels, value in metrics.get(name, []):
+                    totals[labels['host']] = totals.get(labels['host'], 0) + value
+                return totals
+            hosts = by_host('capture_host_flows_total')
+            response_bytes = by_host('capture_host_response_bytes_total')
+            request_bytes = by_host('capture_host_request_bytes_total')
+            for host, count in sorted(hosts.items(), key=lambda item: item[1], reverse=True)[:5]:
+                print(f"   {host}: {count:.0f} 次, 上行 {request_bytes.get(host, 0):.0f} B, 下行 {response_bytes.get(host, 0):.0f} B")
+        elif self.is_capturing:
+            print(f"{Fore.YELLOW}⚠️  代理进程已启动，但无法读取运行指标{Style.RESET_ALL}")
         else:
             print(f"{Fore.YELLOW}⚠️  代理服务器未运行{Style.RESET_ALL}")
             
         # 检查日志文件
         if os.path.exists('logs'):
-            log_files = [f for f in os.listdir('logs') if f.endswith('.json')]
+            log_files = [f for f in os.listdir('logs') if is_capture_file(f)]
             print(f"📁 日志文件数量: {len(log_files)}")
     
     def list_log_files(self):
@@ -206,7 +289,8 @@ class DownloadCaptureManager:
         
         if os.path.exists('logs'):
             files = os.listdir('logs')
-            json_files = [f for f in files if f.endswith('.json')]
+            # 清单、偏移索引、搜索索引等附属文件不算日志
+            json_files = [f for f in files if is_capture_file(f)]
             txt_files = [f for f in files if f.endswith('.txt')]
             
             print(f"📊 JSON日志文件 ({len(json_files)}个):")
@@ -269,7 +353,13 @@ class DownloadCaptureManager:
                 print(f"{Fore.RED}❌ 操作失败: {str(e)}{Style.RESET_ALL}")
 
 def main():
-    manager = DownloadCaptureManager()
+    parser = argparse.ArgumentParser(description="一键启动下载链接捕获工具")
+    parser.add_argument("--workers", type=int, default=1, help="代理进程数，多个模拟器同时抓包时使用 (默认: 1)")
+    parser.add_argument("--port", type=int, default=8080, help="(第一个)代理端口 (默认: 8080)")
+    parser.add_argument("--pretty", action="store_true", help="保存的链接JSON缩进两格便于阅读 (默认紧凑输出)")
+    args = parser.parse_args()
+    
+    manager = DownloadCaptureManager(workers=args.workers, base_port=args.port, pretty=args.pretty)
     manager.run()
 
 if __name__ == "__main__":
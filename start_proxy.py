@@ -4,20 +4,22 @@
 启动HTTPS代理服务器
 """
 
+import argparse
 import subprocess
 import sys
 import os
 import signal
 from colorama import init, Fore, Style
+from proxy_workers import ProxySupervisor
 
 init()
 
-def start_proxy():
+def start_proxy(port=8080):
     """启动mitmproxy代理服务器"""
     print(f"{Fore.GREEN}🚀 启动HTTPS接口抓取代理服务器...{Style.RESET_ALL}")
-    print(f"{Fore.YELLOW}📡 代理地址: 127.0.0.1:8080{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}📡 代理地址: 127.0.0.1:{port}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
-    print(f"{Fore.MAGENTA}💡 请在Android模拟器中设置代理为: 10.0.2.2:8080{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}💡 请在Android模拟器中设置代理为: 10.0.2.2:{port}{Style.RESET_ALL}")
     print(f"{Fore.MAGENTA}💡 并安装mitmproxy证书来抓取HTTPS流量{Style.RESET_ALL}")
     print(f"{Fore.RED}⚠️  按 Ctrl+C 停止代理服务器{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
@@ -27,7 +29,7 @@ def start_proxy():
         cmd = [
             "mitmdump",
             "-s", "proxy_interceptor.py",
-            "-p", "8080"
+            "-p", str(port)
         ]
         
         print(f"{Fore.BLUE}📋 执行命令: {' '.join(cmd)}{Style.RESET_ALL}")
@@ -46,11 +48,47 @@ def start_proxy():
         
     except subprocess.CalledProcessError as e:
         print(f"{Fore.RED}❌ 启动代理服务器失败: {e}{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}💡 请确保端口8080未被占用{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}💡 或者尝试手动运行: mitmdump -s proxy_interceptor.py -p 8080{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}💡 请确保端口{port}未被占用{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}💡 或者尝试手动运行: mitmdump -s proxy_interceptor.py -p {port}{Style.RESET_ALL}")
         
     except Exception as e:
         print(f"{Fore.RED}❌ 未知错误: {e}{Style.RESET_ALL}")
 
+def start_proxy_workers(workers, base_port=8080):
+    """在连续端口上启动多个代理工作进程，崩溃后自动重启"""
+    supervisor = ProxySupervisor(workers=workers, base_port=base_port)
+    last_port = base_port + workers - 1
+    print(f"{Fore.GREEN}🚀 启动 {workers} 个HTTPS接口抓取代理进程...{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}📡 代理地址: 127.0.0.1:{base_port}-{last_port}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}💡 每个Android模拟器使用不同的端口，例如 10.0.2.2:{base_port}、10.0.2.2:{base_port + 1}{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}💡 日志按会话 {supervisor.session} 合并分析{Style.RESET_ALL}")
+    print(f"{Fore.RED}⚠️  按 Ctrl+C 停止所有代理进程{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
+    
+    try:
+        supervisor.start()
+        supervisor.wait()
+        print(f"{Fore.RED}❌ 所有代理进程都已停止{Style.RESET_ALL}")
+        
+    except FileNotFoundError:
+        print(f"{Fore.RED}❌ 找不到mitmdump命令{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}💡 请确保已安装mitmproxy: pip install -r requirements.txt{Style.RESET_ALL}")
+        
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}🛑 正在停止代理服务器...{Style.RESET_ALL}")
+        
+    finally:
+        supervisor.stop()
+        print(f"{Fore.GREEN}✅ 代理服务器已停止{Style.RESET_ALL}")
+
 if __name__ == "__main__":
-    start_proxy() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="启动HTTPS接口抓取代理")
+    parser.add_argument("--workers", type=int, default=1, help="代理进程数，大于1时在连续端口上各启动一个进程 (默认: 1)")
+    parser.add_argument("--port", type=int, default=8080, help="(第一个)代理端口 (默认: 8080)")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        start_proxy_workers(args.workers, args.port)
+    else:
+        start_proxy(args.port) 
\ No newline at end of file
@@ -5,10 +5,12 @@
 测试提取的下载链接是否有效，或重新获取新的下载链接
 """
 
+import argparse
 import requests
 import json
 from colorama import init, Fore, Style
 import urllib.parse
+from serialization import dump_file
 
 # 初始化colorama
 init()
@@ -96,7 +98,7 @@ def extract_filename_from_url(url):
     except:
         return None
 
-def get_new_download_link():
+def get_new_download_link(pretty=False):
     """尝试获取新的下载链接"""
     print(f"\n{Fore.BLUE}🚀 尝试获取新的下载链接{Style.RESET_ALL}")
     
@@ -133,7 +135,7 @@ def get_new_download_link():
                         # 测试新链接
                         if test_download_link(new_url):
                             # 保存新链接
-                            save_new_link(new_url, query_params)
+                            save_new_link(new_url, query_params, pretty)
                         
                         return new_url
                     else:
@@ -150,8 +152,8 @@ def get_new_download_link():
     
     return None
 
-def save_new_link(url, params):
-    """保存新的下载链接"""
+def save_new_link(url, params, pretty=False):
+    """保存新的下载链接，默认紧凑JSON，pretty=True时缩进两格"""
     try:
         new_link_data = {
             "timestamp": "2025-05-28T17:40:00.000000",
@@ -160,8 +162,7 @@ def save_new_link(url, params):
             "status": "新获取"
         }
         
-        with open('new_download_link.json', 'w', encoding='utf-8') as f:
-            json.dump(new_link_data, f, ensure_ascii=False, indent=2)
+        dump_file(new_link_data, 'new_download_link.json', pretty)
         
         print(f"{Fore.GREEN}💾 新链接已保存到: new_download_link.json{Style.RESET_ALL}")
         
@@ -169,6 +170,10 @@ def save_new_link(url, params):
         print(f"{Fore.RED}❌ 保存失败: {str(e)}{Style.RESET_ALL}")
 
 def main():
+    parser = argparse.ArgumentParser(description="测试提取的下载链接，失效时重新获取")
+    parser.add_argument("--pretty", action="store_true", help="保存的JSON缩进两格便于阅读 (默认紧凑输出)")
+    args = parser.parse_args()
+    
     print(f"{Fore.GREEN}🎯 下载链接测试工具{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'='*50}{Style.RESET_ALL}")
     
@@ -185,7 +190,7 @@ def main():
             
             if not is_valid:
                 print(f"\n🔄 原始链接无效，尝试获取新的下载链接...")
-                new_url = get_new_download_link()
+                new_url = get_new_download_link(args.pretty)
                 
                 if new_url:
                     print(f"\n{Fore.GREEN}🎉 成功！新的下载链接已准备就绪{Style.RESET_ALL}")
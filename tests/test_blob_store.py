@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""blob_store: 按内容去重保存body并还原"""
+
+import json
+
+from blob_store import BlobStore, is_blob_ref
+
+
+def test_round_trip_and_deduplicate(tmp_path):
+    store = BlobStore(str(tmp_path), threshold=16)
+    body = {"items": [{"name": "文件", "id": n} for n in range(5)]}
+    ref = store.externalize(body)
+    assert is_blob_ref(ref) and ref["kind"] == "json"
+    assert store.resolve(ref) == body
+    assert store.externalize(dict(body)) == ref
+    assert (store.stored, store.deduplicated) == (1, 1)
+
+    text = "中文" * 10
+    assert store.resolve(store.externalize(text)) == text
+    assert store.externalize("short") == "short"
+
+
+def test_resolve_blob_written_with_other_settings(tmp_path):
+    # 旧版本用json.dumps(带空格)编码、不压缩写入的blob
+    body = {"a": [1, 2], "b": "值"}
+    ref = BlobStore(str(tmp_path), threshold=0, compress=False).put(
+        json.dumps(body, ensure_ascii=False).encode('utf-8'), "json")
+    assert BlobStore(str(tmp_path)).resolve({**ref, "compression": "gzip"}) == body
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""body_decoder: 抓包时的编码、分析时的按需解析和blob引用还原"""
+
+import os
+
+from blob_store import BLOB_DIR, BlobStore, resolve_body
+from body_decoder import BASE64_ENCODING, BodyDecoder, decode_body, encode_body, parse_body
+
+
+def test_encode_and_parse():
+    assert encode_body(b"") == (None, None)
+    assert encode_body("中文".encode()) == ("中文", "utf-8")
+    body, encoding = encode_body(b"\xff\x00")
+    assert encoding == BASE64_ENCODING
+    assert parse_body(body, encoding, "image/png") == "<二进制数据: 2 字节>"
+
+    gbk, encoding = encode_body("名称".encode("gbk"))
+    assert parse_body(gbk, encoding, "text/plain; charset=GBK") == "名称"
+    assert parse_body('{"a": [1]}', "utf-8", "application/json; charset=utf-8") == {"a": [1]}
+    assert parse_body("a=1&a=2&b=x", "utf-8", "application/x-www-form-urlencoded") == {"a": ["1", "2"], "b": ["x"]}
+    assert parse_body("{oops", "utf-8", "application/json").startswith("<解析失败")
+
+
+def test_decoder_caches_per_part():
+    decoder = BodyDecoder(max_cached=1)
+    part = {"body": '{"a": 1}', "body_encoding": "utf-8", "content_type": "application/json"}
+    assert decoder.decode(part) == decoder.decode(part) == {"a": 1}
+    assert (decoder.hits, decoder.misses) == (1, 1)
+    # 旧版日志的body在抓包时已经解析过
+    assert decoder.decode({"body": {"b": 2}}) == {"b": 2}
+    assert decoder.decode(part) == {"a": 1} and decoder.misses == 3
+
+
+def test_blob_ref_is_resolved_next_to_log(tmp_path):
+    store = BlobStore(str(tmp_path / BLOB_DIR), threshold=0)
+    ref = store.externalize('{"items": [1, 2, 3]}')
+    part = {"body": ref, "body_encoding": "utf-8", "content_type": "application/json"}
+    assert decode_body(part, str(tmp_path / "api_requests_20250528_170000_0001.jsonl")) == {"items": [1, 2, 3]}
+
+
+def test_blob_ref_without_log_path_uses_default_logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ref = BlobStore(os.path.join("logs", BLOB_DIR), threshold=0).externalize("响应内容")
+    assert resolve_body(ref, None) == "响应内容"
+    assert decode_body({"body": ref, "body_encoding": "utf-8", "content_type": "text/plain"}) == "响应内容"
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""capture_db: 按毫秒时间戳的时间范围查询与JSONL日志一致，旧数据库补充timestamp_ms列"""
+
+import sqlite3
+
+from capture_db import CaptureDatabase
+from capture_log import CaptureWriter, parse_time_bound, parse_until_bound
+from record_offsets import iter_records_between
+
+# 范围边界上的时间: 没有微秒部分、不足1毫秒、最后一毫秒内
+TIMESTAMPS = (
+    "2025-05-28T17:15:59.999999",
+    "2025-05-28T17:16:00",
+    "2025-05-28T17:16:00.000999",
+    "2025-05-28T17:17:30.500000",
+    "2025-05-28T17:19:59.999000",
+    "2025-05-28T17:19:59.999999",
+    "2025-05-28T17:20:00",
+    None,
+)
+
+
+def make_records():
+    return [
+        {"request": {"timestamp": timestamp, "method": "GET", "url": f"http://h/{n}", "host": "h"},
+         "response": {"status_code": 200}}
+        for n, timestamp in enumerate(TIMESTAMPS)
+    ]
+
+
+def urls(records):
+    return [record["request"]["url"] for record in records]
+
+
+def test_time_range_matches_jsonl(tmp_path):
+    records = make_records()
+    jsonl = str(tmp_path / "api_requests_20250528_171600_0001.jsonl")
+    with CaptureWriter(jsonl, fsync_policy="none") as writer:
+        writer.write_many(records)
+    since, until = parse_time_bound("2025-05-28T17:16"), parse_until_bound("2025-05-28T17:19")
+
+    with CaptureDatabase(str(tmp_path / "api_requests_test.db"), fsync_policy="none") as db:
+        db.write_many(records)
+        from_db = urls(db.iter_records(since, until))
+        assert db.search_count(since=since) == 6
+    from_jsonl = urls(record for _, record in iter_records_between(jsonl, since, until))
+
+    assert from_db == from_jsonl == ["http://h/1", "http://h/2", "http://h/3", "http://h/4", "http://h/5"]
+
+
+def test_old_database_is_migrated(tmp_path):
+    path = str(tmp_path / "api_requests_old.db")
+    with CaptureDatabase(path, fsync_policy="none") as db:
+        db.write_many(make_records())
+    # 模拟没有timestamp_ms列的旧数据库
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX idx_flows_timestamp_ms")
+    conn.execute("ALTER TABLE flows DROP COLUMN timestamp_ms")
+    conn.commit()
+    conn.close()
+
+    with CaptureDatabase(path) as db:
+        assert db.has_timestamp_ms
+        since = parse_time_bound("2025-05-28T17:16")
+        assert urls(db.iter_records(since, since + 999)) == ["http://h/1", "http://h/2"]
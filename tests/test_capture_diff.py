@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""capture_diff: 按接口模板对比两份抓包"""
+
+from capture_diff import EndpointProfile, diff_profiles
+
+
+def make_record(url, status=200, duration=0.1, size=100, timestamp="2025-05-28T17:16:00"):
+    return {
+        "request": {"timestamp": timestamp, "method": "GET", "url": url, "host": "h", "body_size": 0},
+        "response": {"status_code": status, "response_time": duration, "body_size": size},
+    }
+
+
+def test_diff_profiles():
+    before = EndpointProfile("before").add_records(
+        [make_record(f"http://h/items/{n}", duration=0.1) for n in range(4)]
+        + [make_record("http://h/old")]
+        + [make_record("http://h/rare")]
+    )
+    after = EndpointProfile("after").add_records(
+        [make_record(f"http://h/items/{n}", duration=0.2, size=150, status=500 if n == 0 else 200) for n in range(8)]
+        + [make_record("http://h/new", timestamp="2025-05-28T17:20:00")] * 2
+    )
+
+    result = diff_profiles(before, after, min_count=2)
+
+    assert result["before"]["records"] == 6
+    assert result["after"]["last_timestamp"] == "2025-05-28T17:20:00"
+    assert result["totals"] == {"records": 4, "new_endpoints": 1, "vanished_endpoints": 0, "changed_endpoints": 1}
+    rows = {row["endpoint"]: row for row in result["endpoints"]}
+    # 两边都少于min_count的接口不列出
+    assert set(rows) == {"GET h/items/{id}", "GET h/new"}
+    assert [row["endpoint"] for row in result["endpoints"]] == ["GET h/items/{id}", "GET h/new"]
+
+    items = rows["GET h/items/{id}"]
+    assert items["change"] == "changed"
+    assert items["before"]["count"] == 4 and items["after"]["count"] == 8
+    assert items["delta"]["count"] == 4
+    assert items["delta"]["count_change"] == 1.0
+    assert items["delta"]["error_rate"] == 0.125
+    assert items["delta"]["avg_response_bytes_change"] == 0.5
+    assert items["delta"]["p50_ms"] > 90
+    assert abs(items["delta"]["p50_change"] - 1.0) < 0.05
+
+    assert rows["GET h/new"]["change"] == "new"
+    assert rows["GET h/new"]["before"] is None
+    assert rows["GET h/new"]["delta"] == {"count": 2}
+
+
+def test_vanished_endpoint():
+    before = EndpointProfile().add_records([make_record("http://h/old")])
+    after = EndpointProfile().add_records([make_record("http://h/other", duration=None)])
+    rows = {row["endpoint"]: row for row in diff_profiles(before, after)["endpoints"]}
+    assert rows["GET h/old"]["change"] == "vanished"
+    assert rows["GET h/old"]["delta"] == {"count": -1}
+    assert rows["GET h/other"]["after"]["p50_ms"] is None
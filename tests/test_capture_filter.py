@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from capture_filter import CaptureFilter, FilterRule
+
+
+def make_filter():
+    return CaptureFilter.from_dict({
+        "default": "headers",
+        "rules": [
+            {"name": "images", "action": "drop", "host": "cdn.example.com", "content_type": "image/"},
+            {"name": "api", "action": "keep", "host": "example.com", "path_prefix": "/api/"},
+            {"name": "uploads", "action": "headers", "method": "POST", "path_prefix": "/upload"},
+        ],
+    })
+
+
+def hits(capture_filter):
+    return {name: count for name, _, count in capture_filter.stats()}
+
+
+def test_rules_match_in_order():
+    capture_filter = make_filter()
+    assert capture_filter.match("example.com", "/api/list", "GET") == "keep"
+    assert capture_filter.match("www.example.com", "/api/list", "get") == "keep"
+    assert capture_filter.match("example.org", "/upload/a", "POST") == "headers"
+    assert capture_filter.match("example.org", "/upload/a", "GET") == "headers"
+    assert capture_filter.match("cdn.example.com", "/a.png", "GET", "image/png") == "drop"
+    assert hits(capture_filter) == {"images": 1, "api": 2, "uploads": 1, "(default)": 1}
+
+
+def test_rematch_counts_each_request_once():
+    capture_filter = make_filter()
+    # 请求阶段还不知道响应类型，命中default
+    previous = capture_filter.match_rule("cdn.example.com", "/a.png", "GET")
+    capture_filter.count(previous)
+    rule = capture_filter.rematch(previous, "cdn.example.com", "/a.png", "GET", "image/png")
+    assert rule.name == "images"
+    assert hits(capture_filter) == {"images": 1, "api": 0, "uploads": 0, "(default)": 0}
+
+    # 响应类型不影响处理方式时计数不变
+    previous = capture_filter.match_rule("cdn.example.com", "/a.js", "GET")
+    capture_filter.count(previous)
+    assert capture_filter.rematch(previous, "cdn.example.com", "/a.js", "GET", "text/javascript") is None
+    assert hits(capture_filter) == {"images": 1, "api": 0, "uploads": 0, "(default)": 1}
+
+
+def test_invalid_action():
+    with pytest.raises(ValueError):
+        CaptureFilter.from_dict({"rules": [{"action": "ignore"}]})
+
+
+def test_default_action_is_the_same_for_files_and_code(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [{"name": "ads", "action": "drop", "host": "ads.example.com"}]}),
+                    encoding="utf-8")
+    from_file = CaptureFilter.from_file(str(path))
+    in_code = CaptureFilter([FilterRule("ads", "drop", host="ads.example.com")])
+    assert from_file.default == in_code.default == "keep"
+    assert from_file.match("example.com", "/", "GET") == in_code.match("example.com", "/", "GET") == "keep"
+    assert from_file.match("x.ads.example.com", "/", "GET") == "drop"
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""capture_log: JSONL日志写入读取、分段切换、旧版日志转换、时间解析"""
+
+import json
+import os
+
+import pytest
+
+from capture_log import (CaptureWriter, SegmentedCaptureWriter, convert_legacy_logs, find_capture_files,
+                         iter_capture_file, iter_capture_files, load_manifests, parse_time_bound,
+                         parse_until_bound, record_epoch_ms)
+
+
+def make_record(n, host="example.com"):
+    return {
+        "request": {"timestamp": f"2025-05-28T17:{n // 60:02d}:{n % 60:02d}.000000", "method": "GET",
+                    "url": f"http://{host}/items/{n}", "host": host, "path": f"/items/{n}"},
+        "response": {"status_code": 200, "body_size": n},
+    }
+
+def test_round_trip(tmp_path):
+    records = [make_record(n) for n in range(5)]
+    records[1]["response"]["body"] = "中文\n{\"a\": 1}"
+    path = str(tmp_path / "api_requests_20250528_170000_0001.jsonl")
+    with CaptureWriter(path) as writer:
+        writer.write(records[0])
+        writer.write_many(records[1:])
+        assert writer.records_written == 5
+    assert list(iter_capture_file(path)) == records
+
+    # 追加写入同一个文件
+    with CaptureWriter(path) as writer:
+        writer.write(make_record(5))
+    assert len(list(iter_capture_file(path))) == 6
+
+def test_convert_skips_sidecar_files(tmp_path):
+    records = [make_record(n) for n in range(3)]
+    (tmp_path / "api_requests_20250528_170000.json").write_text(json.dumps(records), encoding="utf-8")
+    (tmp_path / "api_requests_20250528_170000.manifest.json").write_text(
+        json.dumps({"session": "x", "segments": []}), encoding="utf-8")
+    (tmp_path / "api_requests_20250528_170000.latency.json").write_text(
+        json.dumps({"total": {}}), encoding="utf-8")
+
+    converted = convert_legacy_logs(str(tmp_path))
+
+    assert [os.path.basename(p) for p in converted] == ["api_requests_20250528_170000.jsonl"]
+    assert not (tmp_path / "api_requests_20250528_170000.manifest.jsonl").exists()
+    files = find_capture_files(str(tmp_path))
+    assert [os.path.basename(p) for p in files] == ["api_requests_20250528_170000.jsonl"]
+    assert list(iter_capture_file(files[0])) == records
+
+def test_non_dict_records_are_skipped(tmp_path):
+    path = tmp_path / "api_requests_20250528_170000_0001.jsonl"
+    path.write_text('"session"\n' + json.dumps(make_record(1)) + '\n["segments"]\n{"broken\n', encoding="utf-8")
+    assert list(iter_capture_file(str(path))) == [make_record(1)]
+
+    legacy = tmp_path / "api_requests_20250528_170100.json"
+    legacy.write_text(json.dumps(["x", make_record(2), 3]), encoding="utf-8")
+    assert list(iter_capture_file(str(legacy))) == [make_record(2)]
+
+def test_parse_time_bound():
+    assert parse_until_bound("2025-05-28T17:16") - parse_time_bound("2025-05-28T17:16") == 60 * 1000 - 1
+    assert parse_until_bound("2025-05-28") - parse_time_bound("2025-05-28") == 24 * 3600 * 1000 - 1
+    assert parse_until_bound("2025-05-28 17:16:30") - parse_time_bound("2025-05-28 17:16:30") == 999
+    assert parse_time_bound("1716900000") == parse_time_bound("1716900000000") == 1716900000000
+    assert record_epoch_ms({"request": {"timestamp_ms": 5, "timestamp": "2025-05-28T17:16:00"}}) == 5
+    assert record_epoch_ms({"request": {}}) == 0
+
+def test_segments_rotate_and_compress(tmp_path):
+    base = str(tmp_path / "api_requests_20250528_170000")
+    records = [make_record(n) for n in range(20)]
+    with SegmentedCaptureWriter(base, max_bytes=1000) as writer:
+        for record in records:
+            writer.write(record)
+
+    files = find_capture_files(str(tmp_path))
+    assert len(files) > 1
+    assert all(p.endswith(".jsonl.gz") for p in files)
+    assert list(iter_capture_files(files)) == records
+
+    with open(base + ".manifest.json", encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    assert [s["file"] for s in segments] == [os.path.basename(p) for p in files]
+    assert sum(s["flows"] for s in segments) == 20
+    assert segments[0]["offset_start"] == 0
+    assert all(a["offset_end"] == b["offset_start"] for a, b in zip(segments, segments[1:]))
+    assert segments[0]["first_ms"] == record_epoch_ms(records[0])
+
+    # 重启后从已有的分段序号之后继续
+    with SegmentedCaptureWriter(base, max_bytes=1000) as writer:
+        writer.write(make_record(20))
+    files = find_capture_files(str(tmp_path))
+    assert list(iter_capture_files(files)) == records + [make_record(20)]
+
+def test_batch_rotates_per_record(tmp_path):
+    base = str(tmp_path / "api_requests_20250528_170000")
+    records = [make_record(n) for n in range(40)]
+    line_size = max(len(json.dumps(record)) for record in records) + 1
+    with SegmentedCaptureWriter(base, max_bytes=1000, compression="none") as writer:
+        writer.write_many(records[:3])
+        writer.write_many(records[3:])
+
+    with open(base + ".manifest.json", encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    assert len(segments) > 5
+    # 一批记录跨越多个分段，每个分段最多超出max_bytes一条记录
+    assert all(segment["size"] < 1000 + line_size for segment in segments)
+    assert all(segment["size"] >= 1000 for segment in segments[:-1])
+    first = 0
+    for segment in segments:
+        assert segment["first_ms"] == record_epoch_ms(records[first])
+        first += segment["flows"]
+        assert segment["last_ms"] == record_epoch_ms(records[first - 1])
+    assert list(iter_capture_files(find_capture_files(str(tmp_path)))) == records
+
+
+def test_time_range_skips_segments(tmp_path):
+    base = str(tmp_path / "api_requests_20250528_170000")
+    with SegmentedCaptureWriter(base, max_bytes=1) as writer:
+        for n in (0, 120, 240):
+            writer.write(make_record(n))
+    since = parse_time_bound("2025-05-28T17:02")
+    until = parse_until_bound("2025-05-28T17:03")
+    files = find_capture_files(str(tmp_path), since, until)
+    assert [os.path.basename(p) for p in files] == ["api_requests_20250528_170000_0002.jsonl.gz"]
+    assert [record["request"]["url"] for record in iter_capture_files(files)] == ["http://example.com/items/120"]
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+def test_manifest_honors_pretty(tmp_path, pretty):
+    base = str(tmp_path / "api_requests_20250528_170000")
+    with SegmentedCaptureWriter(base, max_bytes=500, pretty=pretty) as writer:
+        writer.write_many(make_record(n) for n in range(10))
+
+    with open(base + ".manifest.json", encoding="utf-8") as f:
+        text = f.read()
+    assert ("\n  " in text) == pretty
+    segments = load_manifests(str(tmp_path))
+    assert sum(s["flows"] for s in segments.values()) == 10
+
+    # 续写时读取已有清单
+    with SegmentedCaptureWriter(base, max_bytes=500, pretty=pretty) as writer:
+        writer.write(make_record(10))
+    assert sum(s["flows"] for s in load_manifests(str(tmp_path)).values()) == 11
@@ -0,0 +1,36 @@
+from endpoint_templates import EndpointTemplates, classify_segment, normalize_query
+
+
+def test_numeric_and_hex_values_share_placeholder():
+    templates = EndpointTemplates()
+    numeric = templates.template("GET", "http://h/api/list?drive_id=20481234")
+    hexadecimal = templates.template("GET", "http://h/api/list?drive_id=2048a1b2")
+    assert numeric == hexadecimal == "GET h/api/list?drive_id={id}"
+
+    sha1_digits = "1234567890" * 4
+    sha1 = "9f1c0e2d" * 5
+    assert (templates.template("GET", f"http://h/files/{sha1_digits}?file_id={sha1_digits}")
+            == templates.template("GET", f"http://h/files/{sha1}?file_id={sha1}")
+            == "GET h/files/{id}?file_id={id}")
+
+
+def test_classify_segment():
+    assert classify_segment("896013") == "{id}"
+    assert classify_segment("550e8400-e29b-41d4-a716-446655440000") == "{uuid}"
+    assert classify_segment("deadbeef") is None
+    assert classify_segment("abc123") is None
+    assert classify_segment("aB3dE5fG7hJ9kL1mN3pQ5") == "{token}"
+
+
+def test_path_and_query_normalization():
+    templates = EndpointTemplates()
+    assert templates.template("get", "http://h/api/users/42/avatar/896013.jpg") == "GET h/api/users/{id}/avatar/{id}.jpg"
+    assert templates.template("POST", "/api.php", host="h") == "POST h/api.php"
+    assert normalize_query("b=2&a=x&flag") == "?a=x&b={id}&flag"
+    assert normalize_query("q=" + "x" * 33) == "?q={token}"
+
+
+def test_node_limit_still_normalizes():
+    templates = EndpointTemplates(max_nodes=2)
+    assert templates.template("GET", "http://h/a/b/123") == "GET h/a/b/{id}"
+    assert templates.nodes == 2
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""flow_buffer: 环形缓冲区覆盖旧记录，名称表只保留仍被引用的名称"""
+
+from flow_buffer import FlowRingBuffer
+
+
+def fill(buffer, count, hosts=None):
+    for n in range(count):
+        host = f"host{n}.example.com" if hosts is None else hosts[n % len(hosts)]
+        buffer.append(1000.0 + n, "GET" if n % 2 else "POST", host, 200, n, n * 10, 0.01 * n if n % 3 else None)
+
+
+def test_recent_and_overwrite():
+    buffer = FlowRingBuffer(capacity=5)
+    fill(buffer, 3)
+    assert [entry.request_size for entry in buffer.recent(2)] == [1, 2]
+    assert [entry.request_size for entry in buffer.recent(10)] == [0, 1, 2]
+    assert buffer.recent(0) == []
+
+    fill(buffer, 12)
+    assert len(buffer) == 5 and buffer.total == 15
+    assert [entry.request_size for entry in buffer] == [7, 8, 9, 10, 11]
+    assert [entry.request_size for entry in buffer.recent(3)] == [9, 10, 11]
+    assert buffer.recent(3)[0].duration is None
+    assert buffer.count_since(1009.0) == 3
+
+
+def test_name_tables_stay_bounded():
+    buffer = FlowRingBuffer(capacity=4)
+    fill(buffer, 1000)
+    assert buffer.host_count == 4
+    assert len(buffer._hosts.names) <= 4
+    assert [entry.host for entry in buffer] == [f"host{n}.example.com" for n in range(996, 1000)]
+    assert buffer.query(host="host10.example.com") == []
+    assert [entry.request_size for entry in buffer.query(host="host998.example.com")] == [998]
+    assert [entry.request_size for entry in buffer.query(method="post")] == [996, 998]
+
+
+def test_shared_names_are_kept_while_referenced():
+    buffer = FlowRingBuffer(capacity=3)
+    fill(buffer, 7, hosts=["a", "b", "a", "c"])
+    # 最后三条: n=4(a) n=5(b) n=6(a)
+    assert [entry.host for entry in buffer] == ["a", "b", "a"]
+    assert buffer.host_count == 2
+    fill(buffer, 2, hosts=["d"])
+    assert [entry.host for entry in buffer] == ["a", "d", "d"]
+    assert buffer.host_count == 2
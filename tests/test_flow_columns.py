@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""flow_columns: NumPy与纯Python两种实现的统计结果相同"""
+
+import pytest
+
+import flow_columns
+from flow_columns import FlowColumns
+
+HOSTS = ("a.example.com", "b.example.com", "c.example.com")
+STATUSES = (200, 200, 200, 404, 200, 500, 0, 200, 304)
+
+
+def make_rows():
+    rows = []
+    for h, host in enumerate(HOSTS):
+        # 各主机的请求数不同，排序结果没有并列
+        for n in range((h + 1) * 7):
+            status = STATUSES[(n + h) % len(STATUSES)]
+            rows.append((
+                1716887760 + h * 61 + n * 13 if n % 5 else "2025-05-28T17:16:0%d.250000" % (n % 10),
+                "POST" if n % 4 == 0 else "GET",
+                host,
+                status,
+                n * 10,
+                n * 100 + h,
+                None if status == 0 else 0.01 * (n + 1) + 0.001 * h,
+                f"http://{host}/api/{'list' if n % 3 else 'items/%d' % n}",
+            ))
+    return rows
+
+
+def all_stats(columns):
+    return {
+        "value_counts": {name: columns.value_counts(name) for name in ("host", "method", "endpoint", "status")},
+        "per_minute": columns.per_minute(),
+        "host_traffic": columns.host_traffic(),
+        "status_by_host": columns.status_by_host(),
+        "latency_percentiles": columns.latency_percentiles(),
+        "endpoint_stats": columns.endpoint_stats(),
+    }
+
+
+def compute(monkeypatch, numpy_module):
+    monkeypatch.setattr(flow_columns, "numpy", numpy_module)
+    rows = make_rows()
+    # 分两部分投影再合并，同时覆盖extend中的编号映射
+    columns = FlowColumns.from_rows(rows[::2])
+    columns.extend(FlowColumns.from_rows(rows[1::2]))
+    return all_stats(columns)
+
+
+def test_numpy_and_pure_python_agree(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    expected = compute(monkeypatch, None)
+    actual = compute(monkeypatch, numpy)
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        assert _rounded(actual[name]) == _rounded(expected[name]), name
+
+
+def test_pure_python_stats(monkeypatch):
+    stats = compute(monkeypatch, None)
+    assert [host for host, _ in stats["value_counts"]["host"]] == list(reversed(HOSTS))
+    assert sum(count for _, count in stats["per_minute"]) == 42
+    assert stats["latency_percentiles"][0][0] == "*"
+    assert stats["latency_percentiles"][0][1] == 42 - sum(1 for row in make_rows() if row[3] == 0)
+
+
+def _rounded(value):
+    """浮点数按9位小数比较，元组和列表同等看待"""
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    return value
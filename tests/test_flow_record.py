@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""flow_record: 记录字典与FlowRecord互相转换，头部共享"""
+
+from flow_record import FlowRecord, HeaderTable
+
+
+def full_record(n):
+    return {
+        "request": {
+            "timestamp": f"2025-05-28T17:00:{n:02d}.000000", "timestamp_ms": 1748422800000 + n * 1000,
+            "method": "POST", "url": f"https://example.com/items?id={n}", "scheme": "https",
+            "host": "example.com", "path": "/items", "headers": {"Accept": "*/*", "X-Id": str(n)},
+            "query_params": {"id": str(n)}, "body": '{"a": 1}', "body_encoding": None,
+            "content_type": "application/json", "body_size": 8, "client": "10.0.0.1",
+        },
+        "response": {
+            "status_code": 201, "status_text": "Created", "headers": {"Server": "demo"},
+            "body": {"$blob": "ab" * 32, "size": 100}, "body_encoding": "base64",
+            "content_type": "application/octet-stream", "body_size": 100, "response_time": 0.25,
+            "timing": {"total": 0.25, "ttfb": 0.1}, "streamed": True,
+        },
+    }
+
+
+def test_round_trip_with_shared_table():
+    table = HeaderTable()
+    for n in (1, 2):
+        record = full_record(n)
+        assert FlowRecord.from_dict(record, table).to_dict() == record
+        assert FlowRecord.from_dict(record).to_dict() == record
+
+    first = FlowRecord.from_dict(full_record(1), table)
+    second = FlowRecord.from_dict(full_record(1), table)
+    # 相同的头部集合和字符串共享同一个对象
+    assert first.request_headers is second.request_headers
+    assert first.response_headers[0] is second.response_headers[0]
+    assert first.host is second.host
+
+
+def test_records_without_response():
+    request = full_record(1)["request"]
+    flow = FlowRecord.from_dict({"request": request})
+    assert not flow.has_response
+    assert flow.to_dict() == {"request": request}
+
+    # 只有错误信息、没有状态码的响应仍然保留
+    record = {"request": request, "response": {"error": "timeout"}}
+    restored = FlowRecord.from_dict(record).to_dict()
+    assert restored["response"]["error"] == "timeout"
+    assert restored["response"]["status_code"] is None
+
+
+def test_header_table_limit():
+    table = HeaderTable(max_entries=2)
+    assert table.headers([("a", "1")]) is table.headers({"a": "1"})
+    for n in range(5):
+        table.headers([("k", str(n))])
+    stats = table.stats()
+    assert stats["strings"] <= 2 and stats["pairs"] <= 2 and stats["header_sets"] <= 2
+    # 超过上限后新值原样返回
+    assert table.intern("new") == "new"
+    assert table.headers([("x", "y")]) == (("x", "y"),)
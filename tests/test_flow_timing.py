@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""flow_timing: 直方图的桶边界、分位数误差、合并，以及各阶段耗时"""
+
+import random
+from types import SimpleNamespace
+
+from flow_timing import LatencyHistogram, LatencyTracker, flow_timings
+
+
+def test_bucket_bounds():
+    histogram = LatencyHistogram(sub_bits=7)
+    for value in list(range(0, 300)) + [10 ** n + k for n in range(3, 10) for k in (-1, 0, 1)]:
+        index = histogram._index(value)
+        upper = histogram._upper_bound(index)
+        # 值落在自己的桶内，桶宽不超过 1/64
+        assert value <= upper
+        assert upper - value <= max(0, value) / 64
+        if value < 128:
+            assert upper == value
+        assert histogram._index(upper) == index
+        assert histogram._index(upper + 1) == index + 1
+
+
+def test_percentiles_within_relative_error():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(-3, 1.2) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for p in (50, 90, 99, 99.9):
+        exact = values[max(1, round(p / 100 * len(values))) - 1]
+        assert abs(histogram.percentile(p) - exact) <= exact / 64 + 1e-6
+    assert histogram.percentile(100) == histogram.max == values[-1]
+    assert histogram.min == values[0]
+    assert abs(histogram.mean - sum(values) / len(values)) < 1e-9
+
+
+def test_ignores_missing_values_and_merges():
+    empty = LatencyHistogram()
+    empty.record(None)
+    empty.record(-1)
+    assert empty.total_count == 0 and empty.percentile(50) is None and empty.mean is None
+
+    first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for n in range(1, 200):
+        (first if n % 2 else second).record(n / 1000)
+        combined.record(n / 1000)
+    first.merge(second)
+    assert list(first.counts) == list(combined.counts)
+    assert (first.min, first.max, first.total_count) == (combined.min, combined.max, combined.total_count)
+    assert first.percentile(95) == combined.percentile(95)
+
+
+def test_flow_timings_and_tracker():
+    request = SimpleNamespace(timestamp_start=10.0, timestamp_end=10.1)
+    response = SimpleNamespace(timestamp_start=10.4, timestamp_end=10.9)
+    new_conn = SimpleNamespace(timestamp_start=9.0, timestamp_tcp_setup=9.05, timestamp_tls_setup=9.2)
+    timings = flow_timings(SimpleNamespace(request=request, response=response, server_conn=new_conn))
+    assert round(timings["ttfb"], 6) == 0.3 and round(timings["total"], 6) == 0.9
+    assert timings["connection_reused"] is True and timings["connect"] is None
+
+    fresh_conn = SimpleNamespace(timestamp_start=10.0, timestamp_tcp_setup=10.05, timestamp_tls_setup=10.2)
+    timings = flow_timings(SimpleNamespace(request=request, response=None, server_conn=fresh_conn))
+    assert timings["total"] is None
+    assert round(timings["connect"], 6) == 0.05 and round(timings["tls"], 6) == 0.15
+
+    tracker = LatencyTracker()
+    for n in range(3):
+        tracker.record("a", {"total": 0.1, "ttfb": 0.05})
+    tracker.record("b", {"total": 0.2})
+    assert [row[:2] for row in tracker.table()] == [("a", 3), ("b", 1)]
+    assert list(tracker.to_dict()["ttfb"]) == ["a"]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""log_analyzer: 非交互命令"""
+
+import sys
+
+import pytest
+
+import log_analyzer
+from capture_log import CaptureWriter, parse_time_bound
+from test_capture_log import make_record
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    with CaptureWriter(str(tmp_path / "api_requests_20250528_170000.jsonl")) as writer:
+        writer.write_many(make_record(n) for n in range(1, 4))
+    return tmp_path
+
+
+def run(monkeypatch, log_dir, *argv):
+    monkeypatch.setattr(sys, "argv", ["log_analyzer.py", "--log-dir", str(log_dir), *argv])
+    return log_analyzer.main()
+
+
+@pytest.mark.parametrize("output_format", ["text", "jsonl"])
+def test_detail_missing_index_fails(monkeypatch, capsys, log_dir, output_format):
+    assert run(monkeypatch, log_dir, "detail", "-f", output_format, "2") == 0
+    assert "items/2" in capsys.readouterr().out
+
+    assert run(monkeypatch, log_dir, "detail", "-f", output_format, "1", "9") == 1
+    captured = capsys.readouterr()
+    assert "items/1" in captured.out
+    assert "9" in captured.err
+
+
+def test_time_range_without_offsets_index(monkeypatch, capsys, log_dir):
+    # 日志目录只读时偏移索引无法写入，按时间范围查询改为逐条读取
+    import record_offsets
+    monkeypatch.setattr(record_offsets, "offsets_path", lambda path: str(log_dir / "missing" / "x.offsets"))
+    assert run(monkeypatch, log_dir, "search", "-f", "jsonl", "--since", "2025-05-28T17:00:02") == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2 and "items/2" in lines[0] and "items/3" in lines[1]
+    assert not list(log_dir.glob("*.offsets"))
+
+
+def test_generated_files_are_not_logs(monkeypatch, capsys, log_dir):
+    assert run(monkeypatch, log_dir, "search", "-f", "jsonl", "--since", "2025-05-28T17:00:02", "items") == 0
+    capsys.readouterr()
+    names = {path.name for path in log_dir.iterdir()}
+    assert {"api_requests_20250528_170000.jsonl.offsets", "search_index.sqlite"} <= names
+    assert run(monkeypatch, log_dir, "search", "-f", "jsonl") == 0
+    assert len(capsys.readouterr().out.splitlines()) == 3
+
+
+def test_record_numbers_match_read_order(tmp_path):
+    # 两个工作进程的日志，文件内按响应完成顺序写入，请求时间只是大致有序
+    for worker, numbers in ((2, [2, 6, 4]), (1, [3, 1, 5])):
+        with CaptureWriter(str(tmp_path / f"api_requests_20250528_170000_w{worker}_0001.jsonl")) as writer:
+            writer.write_many(make_record(n) for n in numbers)
+    analyzer = log_analyzer.LogAnalyzer(str(tmp_path))
+    assert analyzer.load_logs()
+
+    urls = [record["request"]["url"] for record in analyzer._iter_dicts()]
+    assert [n for n, _ in analyzer._iter_numbered()] == list(range(1, 7))
+    assert [record["request"]["url"] for _, record in analyzer._iter_numbered()] == urls
+    assert [analyzer._get_record(n)["request"]["url"] for n in range(1, 7)] == urls
+    assert urls[:3] == [f"http://example.com/items/{n}" for n in (3, 1, 5)]
+
+    # 限定时间范围时序号不变
+    since = parse_time_bound("2025-05-28T17:00:04")
+    assert [(n, record["request"]["url"]) for n, record in analyzer._iter_numbered(since)] == [
+        (3, "http://example.com/items/5"), (5, "http://example.com/items/6"), (6, "http://example.com/items/4"),
+    ]
+
+
+def test_export_summary_numbers_and_total(log_dir):
+    analyzer = log_analyzer.LogAnalyzer(str(log_dir))
+    assert analyzer.load_logs()
+    output = log_dir / "summary.txt"
+
+    analyzer.export_summary(str(output), limit=1, offset=1)
+    text = output.read_text(encoding="utf-8")
+    assert "[2] GET http://example.com/items/2" in text
+    assert "[1]" not in text and "[3]" not in text
+    assert text.endswith("总请求数: 3\n本次导出: 1 条 (从第 2 条起)\n")
+
+    # 限定时间范围时编号仍是记录序号，总数是范围内的记录数
+    analyzer.export_summary(str(output), since=parse_time_bound("2025-05-28T17:00:02"))
+    text = output.read_text(encoding="utf-8")
+    assert "[2] GET" in text and "[3] GET" in text and "[1]" not in text
+    assert text.endswith("总请求数: 2\n")
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""log_follow: 没有inotify时轮询目录，读到新追加的记录且不重复"""
+
+import threading
+import time
+
+import pytest
+
+import log_follow
+from capture_log import CaptureWriter, SegmentedCaptureWriter
+from log_follow import CaptureTailer, DirectoryWatcher, LiveSummary
+from serialization import dumps_line
+from test_capture_log import make_record
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_follow, "INotify", None)
+    watcher = DirectoryWatcher(str(tmp_path), poll_interval=0.01)
+    yield watcher
+    watcher.close()
+
+
+def follow(tailer, watcher, count, timeout=5):
+    """像log_analyzer follow一样循环等待，直到读到count条记录，返回 (第一条的序号, 记录)"""
+    records = []
+    deadline = time.monotonic() + timeout
+    while len(records) < count and time.monotonic() < deadline:
+        if watcher.wait(0.05):
+            tailer.discover()
+            for _, first, batch, _ in tailer.read():
+                records.extend((first + n, record) for n, record in enumerate(batch))
+    return records
+
+
+def test_polling_picks_up_appended_records(tmp_path, watcher):
+    assert watcher.backend == "polling"
+    path = tmp_path / "api_requests_20250528_170000.jsonl"
+    with CaptureWriter(str(path)) as writer:
+        writer.write_many(make_record(n) for n in range(3))
+    tailer = CaptureTailer(str(tmp_path), [str(path)])
+    first_batch = [record for _, _, batch, _ in tailer.read() for record in batch]
+    assert first_batch == [make_record(n) for n in range(3)]
+
+    def append():
+        time.sleep(0.05)
+        with CaptureWriter(str(path)) as writer:
+            writer.write_many(make_record(n) for n in range(3, 6))
+        # 写了一半的行等写完后才读取
+        line = dumps_line(make_record(6))
+        with open(path, "ab") as f:
+            f.write(line[:10])
+            f.flush()
+            time.sleep(0.1)
+            f.write(line[10:])
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    records = follow(tailer, watcher, 4)
+    thread.join()
+    assert records == [(n, make_record(n)) for n in range(3, 7)]
+    # 没有新内容时不读取
+    assert list(tailer.read()) == []
+
+
+def test_rotated_and_new_segments(tmp_path, watcher):
+    base = str(tmp_path / "api_requests_20250528_170000")
+    tailer = CaptureTailer(str(tmp_path), [])
+    summary = LiveSummary()
+    with SegmentedCaptureWriter(base, max_bytes=600) as writer:
+        records = []
+        for n in range(12):
+            writer.write(make_record(n))
+            writer.flush()
+            # 每写一条读一次，分段写满被压缩后从压缩文件的同一位置继续
+            tailer.discover()
+            for _, _, batch, _ in tailer.read():
+                summary.add(batch)
+                records.extend(batch)
+    tailer.discover()
+    for _, _, batch, _ in tailer.read():
+        records.extend(batch)
+        summary.add(batch)
+    assert sorted(records, key=lambda r: r["request"]["url"]) == sorted(
+        (make_record(n) for n in range(12)), key=lambda r: r["request"]["url"])
+    assert summary.total == 12
+    assert list(tmp_path.glob("*.jsonl.gz"))
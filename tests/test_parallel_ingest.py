@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""parallel_ingest: 多进程与单进程读取的结果完全相同"""
+
+import pytest
+
+import log_analyzer
+from capture_log import CaptureWriter
+from download_link_extractor import DownloadLinkExtractor, extract_file_links
+from flow_columns import project_capture_file
+from parallel_ingest import map_capture_files
+from search_index import scan_capture_file
+from test_capture_log import make_record
+
+
+def link_record(n):
+    record = make_record(n, host="pan.aliyun.example")
+    record["request"]["url"] = f"https://pan.aliyun.example/api.php?id={n}"
+    record["response"]["body"] = {"url": f"https://cn.aliyundrive.net/f/{n}", "name": f"{n}.zip"}
+    return record
+
+
+@pytest.fixture
+def log_files(tmp_path):
+    paths = []
+    for n in range(5):
+        path = tmp_path / f"api_requests_20250528_17000{n}.jsonl"
+        with CaptureWriter(str(path)) as writer:
+            writer.write_many(make_record(n * 20 + k, host=f"h{k % 3}.example.com") for k in range(20))
+            # 链接的请求时间与其他文件交错，检查合并后的排序
+            writer.write(link_record(50 - n))
+        paths.append(str(path))
+    return paths
+
+
+def column_state(columns):
+    return ({name: list(values) for name, values in columns._columns.items()},
+            columns.host_names, columns.method_names, columns.endpoint_names)
+
+
+@pytest.mark.parametrize("func", [project_capture_file, scan_capture_file, extract_file_links])
+def test_results_in_input_order(log_files, func):
+    serial = list(map_capture_files(func, log_files, workers=1))
+    parallel = list(map_capture_files(func, log_files, workers=3))
+    assert [path for path, _ in parallel] == log_files
+    if func is project_capture_file:
+        serial = [(path, column_state(result)) for path, result in serial]
+        parallel = [(path, column_state(result)) for path, result in parallel]
+    assert parallel == serial
+
+
+def test_merged_columns_and_links(log_files, tmp_path):
+    states = []
+    for workers in (1, 4):
+        analyzer = log_analyzer.LogAnalyzer(str(tmp_path), workers)
+        assert analyzer.load_logs(all_files=True)
+        states.append(column_state(analyzer._flow_columns()))
+    assert states[0] == states[1]
+    assert len(states[0][0]["status"]) == 105
+
+    serial = DownloadLinkExtractor().extract_from_logs(str(tmp_path), workers=1)
+    parallel = DownloadLinkExtractor().extract_from_logs(str(tmp_path), workers=4)
+    assert parallel == serial
+    assert [link["download_url"][-2:] for link in serial] == ["46", "47", "48", "49", "50"]
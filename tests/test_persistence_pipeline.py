@@ -0,0 +1,26 @@
+import threading
+
+from persistence_pipeline import BackgroundWriter
+
+
+def test_calls_run_on_writer_thread_before_next_batch():
+    events = []
+    writer = BackgroundWriter(
+        lambda batch: events.append(("batch", threading.current_thread().name, list(batch))),
+        batch_size=2, flush_interval=10,
+    )
+    writer.submit(1)
+    writer.call_in_writer(lambda: events.append(("call", threading.current_thread().name, None)))
+    writer.submit(2)
+    writer.close()
+    assert events == [("call", "capture-writer", None), ("batch", "capture-writer", [1, 2])]
+    assert writer.stats()["processed"] == 2
+
+
+def test_drop_policy_counts_overflow():
+    gate = threading.Event()
+    writer = BackgroundWriter(lambda batch: gate.wait(5), max_queue=1, batch_size=1, backpressure="drop")
+    results = [writer.submit(n) for n in range(5)]
+    gate.set()
+    writer.close()
+    assert writer.dropped == results.count(False) >= 3
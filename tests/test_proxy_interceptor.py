@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""proxy_interceptor: 用mitmproxy的测试流量驱动插件，检查写入的日志"""
+
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("mitmproxy")
+
+from mitmproxy.test import tflow, tutils
+
+import proxy_interceptor
+from capture_log import find_capture_files, iter_capture_files
+from link_rules import iter_link_stream
+
+
+@pytest.fixture
+def addon(tmp_path, monkeypatch):
+    # 插件把日志写到当前目录下的logs/
+    monkeypatch.chdir(tmp_path)
+    addon = proxy_interceptor.HTTPSInterceptor()
+    yield addon
+    addon.done()
+
+
+def make_flow(url, content=b"", content_type="application/json", headers=()):
+    flow = tflow.tflow(req=tutils.treq(), resp=tutils.tresp())
+    flow.request.url = url
+    flow.response.content = content
+    flow.response.headers["content-type"] = content_type
+    for name, value in headers:
+        flow.response.headers[name] = value
+    return flow
+
+
+def run(addon, flow, chunks=()):
+    """按mitmproxy的顺序调用钩子，透传的响应体由stream回调逐块经过"""
+    addon.request(flow)
+    addon.responseheaders(flow)
+    stream = getattr(flow, 'stream_counter', None)
+    for chunk in chunks:
+        stream(chunk)
+    addon.response(flow)
+
+
+def saved_records(addon):
+    addon.done()
+    return list(iter_capture_files(find_capture_files("logs")))
+
+
+def test_binary_and_large_responses_are_streamed(addon):
+    addon.stream_threshold = 100
+    run(addon, make_flow("http://cdn.example.com/a.mp4", content_type="video/mp4"), [b"x" * 300, b"y" * 200])
+    run(addon, make_flow("http://api.example.com/big", headers=[("content-length", "5000")]), [b"z" * 5000])
+    run(addon, make_flow("http://api.example.com/small", b'{"ok": true}'))
+
+    video, big, small = saved_records(addon)
+    assert video["response"]["body"] == "<透传数据: 500 字节>"
+    assert video["response"]["body_size"] == 500
+    assert video["response"]["streamed"] is True
+    assert big["response"]["body_size"] == 5000
+    assert "streamed" not in small["response"]
+    assert small["response"]["body"] == '{"ok": true}'
+
+
+def test_download_links_extracted_inline(addon):
+    run(addon, make_flow("https://pan.aliyun.example/api.php?id=7",
+                         b'{"url": "https://cn.aliyundrive.net/f/1?sign=x", "name": "a.zip"}'))
+    run(addon, make_flow("http://share.example.com/page",
+                         b'<a href="https://cn.aliyundrive.net/f/2">download</a>', "text/html"))
+    run(addon, make_flow("http://api.example.com/other", b'{"url": "https://example.com/x"}'))
+
+    records = saved_records(addon)
+    links = list(iter_link_stream(addon.links_file))
+    assert len(records) == 3
+    assert addon.links_found == 2
+    assert [link["download_url"] for link in links] == [
+        "https://cn.aliyundrive.net/f/1?sign=x",
+        "https://cn.aliyundrive.net/f/2",
+    ]
+    assert links[0]["file_info"]["name"] == "a.zip"
+    assert links[0]["query_params"] == {"id": "7"}
+    assert links[1]["file_info"] == {}
+
+
+def test_metrics_scrape_while_recording(addon):
+    # 指标线程抓取时事件循环仍在插入新主机，缩短线程切换间隔让两者充分交错
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    flows = [make_flow(f"http://host{n}.example.com/api", b"{}") for n in range(300)]
+    errors = []
+
+    def record():
+        try:
+            for flow in flows:
+                run(addon, flow)
+        except Exception as e:
+            errors.append(e)
+
+    recorder = threading.Thread(target=record)
+    try:
+        recorder.start()
+        while recorder.is_alive():
+            addon.metrics_text()
+    finally:
+        recorder.join()
+        sys.setswitchinterval(interval)
+
+    assert not errors
+    text = addon.metrics_text()
+    assert "capture_flows_total 300" in text
+    assert 'capture_latency_seconds{host="host299.example.com",quantile="0.5"}' in text
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""record_offsets: 按序号读取、时间范围二分查找与逐条比较的结果相同"""
+
+import random
+
+from capture_log import CaptureWriter, compress_file, iter_capture_file, record_epoch_ms
+from record_offsets import RecordOffsets, iter_records_between, offsets_path
+
+BASE_MS = 1716887760000
+
+
+def make_records(count=300, seed=7):
+    """请求时间大致有序(按响应完成顺序写入)，夹杂没有时间的记录"""
+    rng = random.Random(seed)
+    records = []
+    for n in range(count):
+        request = {"method": "GET", "url": f"http://h/{n}", "host": "h"}
+        if n % 17:
+            request["timestamp_ms"] = BASE_MS + n * 100 - rng.randrange(0, 2000)
+        records.append({"request": request, "response": {"status_code": 200}})
+    return records
+
+
+def write(path, records):
+    with CaptureWriter(str(path), fsync_policy="none") as writer:
+        writer.write_many(records)
+
+
+def expected_between(records, since, until):
+    if since is None and until is None:
+        return list(range(len(records)))
+    return [n for n, record in enumerate(records)
+            if record_epoch_ms(record)
+            and (since is None or record_epoch_ms(record) >= since)
+            and (until is None or record_epoch_ms(record) <= until)]
+
+
+def test_between_matches_linear_scan(tmp_path):
+    records = make_records()
+    path = tmp_path / "api_requests_20250528_171600_0001.jsonl"
+    write(path, records)
+    rng = random.Random(1)
+    with RecordOffsets(str(path)) as offsets:
+        assert len(offsets) == len(records)
+        for _ in range(200):
+            since = BASE_MS + rng.randrange(-3000, 32000) if rng.random() < 0.9 else None
+            until = BASE_MS + rng.randrange(-3000, 32000) if rng.random() < 0.9 else None
+            assert offsets.between(since, until) == expected_between(records, since, until), (since, until)
+
+
+def test_read_and_incremental_refresh(tmp_path):
+    records = make_records(50)
+    path = tmp_path / "api_requests_20250528_171600_0001.jsonl"
+    write(path, records[:30])
+    with RecordOffsets(str(path)) as offsets:
+        assert offsets.read(0) == records[0]
+        assert offsets.read(29) == records[29]
+        assert offsets.read(30) is None
+
+    write(path, records[30:])
+    with RecordOffsets(str(path)) as offsets:
+        assert len(offsets) == 50
+        assert offsets.read_many([49, 3, 99]) == {3: records[3], 49: records[49]}
+
+
+def test_compressed_segment_reuses_index(tmp_path):
+    records = make_records(80)
+    path = tmp_path / "api_requests_20250528_171600_0001.jsonl"
+    write(path, records)
+    with RecordOffsets(str(path)):
+        pass
+    compressed = compress_file(str(path), "gzip")
+    assert offsets_path(compressed) == str(path) + ".offsets"
+
+    since, until = BASE_MS + 1000, BASE_MS + 4000
+    expected = expected_between(records, since, until)
+    assert [n for n, _ in iter_records_between(compressed, since, until)] == expected
+    assert [record for _, record in iter_records_between(compressed)] == list(iter_capture_file(compressed))
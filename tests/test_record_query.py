@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""record_query: 过滤表达式的解析、判断和提前筛选条件"""
+
+import pytest
+
+from capture_log import parse_time_bound, parse_until_bound
+from record_query import RecordQuery
+
+
+def make_record(url, method="GET", status=200, duration=0.1, timestamp="2025-05-28T17:16:30", size=0):
+    host = url.split("/")[2]
+    return {
+        "request": {"timestamp": timestamp, "method": method, "url": url, "host": host,
+                    "path": "/" + url.split("/", 3)[3], "body_size": size},
+        "response": {"status_code": status, "response_time": duration} if status else {},
+    }
+
+
+RECORDS = {
+    "list": make_record("http://api.aliyun.com/list?id=1"),
+    "upload": make_record("http://api.aliyun.com/upload", method="POST", status=500, duration=0.8, size=2048),
+    "missing": make_record("http://cdn.example.com/a.png", status=404, duration=None),
+    "pending": make_record("http://api.example.com/api.php", method="POST", status=None,
+                           timestamp="2025-05-28T17:19:59.500000"),
+    "untimed": make_record("http://api.example.com/api.php?x=1", timestamp=None),
+}
+
+
+def matching(text):
+    query = RecordQuery(text)
+    return sorted(name for name, record in RECORDS.items() if query.match(record))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", ["list", "missing", "pending", "untimed", "upload"]),
+    ("aliyun", ["list", "upload"]),
+    ("host~aliyun status>=400", ["upload"]),
+    ("method=post or status=4xx", ["missing", "pending", "upload"]),
+    ("api.php and not status=2xx", ["pending"]),
+    ("!(host~example) duration>500", ["upload"]),
+    ("url!~aliyun request_size<1", ["missing", "pending", "untimed"]),
+    ("endpoint='GET api.aliyun.com/list?id={id}'", ["list"]),
+    ("path=/upload", ["upload"]),
+    ("time=2025-05-28T17:16", ["list", "missing", "upload"]),
+    ("time>2025-05-28T17:16", ["pending"]),
+    ("time!=2025-05-28T17:16", ["pending", "untimed"]),
+])
+def test_match(text, expected):
+    assert matching(text) == expected
+
+
+def test_hints():
+    query = RecordQuery("aliyun method=post status=500 time>=2025-05-28T17:16 time<=2025-05-28T17:19 upload")
+    assert query.hints == {
+        "keyword": "aliyun", "method": "POST", "status_code": 500,
+        "since": parse_time_bound("2025-05-28T17:16"), "until": parse_until_bound("2025-05-28T17:19"),
+    }
+    assert query.time_range(since=parse_time_bound("2025-05-28T17:18")) == (
+        parse_time_bound("2025-05-28T17:18"), parse_until_bound("2025-05-28T17:19"))
+    # 同一类条件只提前筛选第一个；or中的条件不能提前筛选
+    assert RecordQuery("method=post or status=500").hints == {}
+
+
+@pytest.mark.parametrize("text", [
+    "status~4", "color=red", "duration>fast", "(host~a", "host~a )", "and", "status=4xx and status>4xx",
+    "time>yesterday", "method=",
+])
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        RecordQuery(text)
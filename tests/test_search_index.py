@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""search_index: 索引查询结果与逐条子串比较一致，文件变化后重建"""
+
+import os
+
+import pytest
+
+from capture_log import CaptureWriter, iter_capture_file
+from search_index import SearchIndex
+
+URLS = [
+    ("GET", "https://api.example.com/v1/items?id=1", "api.example.com", 200),
+    ("POST", "https://api.example.com/v1/items", "api.example.com", 201),
+    ("GET", "https://cdn.example.net/static/app-2.js", "cdn.example.net", 304),
+    ("DELETE", "https://api.example.com/v1/items/42", "api.example.com", 404),
+    ("GET", "/relative/Path_With_Case", "Upstream.Example.org", 200),
+    ("PUT", "https://pan.aliyundrive.net/api.php?file=A%20B", "pan.aliyundrive.net", 500),
+    ("GET", "https://x.io/", "x.io", 200),
+]
+
+KEYWORDS = [
+    # 完整单词、前缀、子串
+    "items", "v1", "/items", "/v1/items?", "tem", "xample.co", "example.com/v1/it",
+    # 比单词短的关键词、不含单词字符的关键词、大小写
+    "a", "1", "/", "?", ".", "%20", "EXAMPLE", "path_with", "upstream.example", "nothing-here",
+]
+
+
+def make_record(method, url, host, status):
+    return {"request": {"method": method, "url": url, "host": host},
+            "response": {"status_code": status}}
+
+
+def write_log(path, rows):
+    """写入(覆盖)一个日志文件"""
+    if os.path.exists(path):
+        os.remove(path)
+    with CaptureWriter(str(path)) as writer:
+        writer.write_many(make_record(*row) for row in rows)
+
+
+def scan(paths, keyword=None, method=None, status_code=None):
+    """逐条比较的结果，与log_analyzer中没有索引时的判断相同"""
+    keyword = keyword.lower() if keyword else None
+    results = []
+    for position, path in enumerate(paths):
+        for ordinal, record in enumerate(iter_capture_file(str(path))):
+            request, response = record["request"], record["response"]
+            if keyword and keyword not in request["url"].lower() and keyword not in request["host"].lower():
+                continue
+            if method and request["method"].upper() != method.upper():
+                continue
+            if status_code is not None and response["status_code"] != status_code:
+                continue
+            results.append((position, ordinal))
+    return results
+
+
+@pytest.fixture
+def logs(tmp_path):
+    paths = [tmp_path / "api_requests_20250528_170000.jsonl", tmp_path / "api_requests_20250528_180000.jsonl"]
+    write_log(paths[0], URLS)
+    write_log(paths[1], URLS[::-1] * 3)
+    index = SearchIndex(str(tmp_path / "search_index.sqlite"))
+    index.update([str(p) for p in paths])
+    yield index, [str(p) for p in paths]
+    index.close()
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_keyword_matches_substring_scan(logs, keyword):
+    index, paths = logs
+    assert index.search(paths, keyword) == scan(paths, keyword)
+
+
+@pytest.mark.parametrize("method, status_code", [("get", None), (None, 200), ("GET", 200), ("post", 404), (None, 999)])
+def test_method_and_status_intersection(logs, method, status_code):
+    index, paths = logs
+    for keyword in (None, "example", "items", "a"):
+        assert index.search(paths, keyword, method, status_code) == scan(paths, keyword, method, status_code)
+
+
+def test_record_counts(logs):
+    index, paths = logs
+    assert index.record_counts(paths) == [len(URLS), len(URLS) * 3]
+    assert index.search(paths) == scan(paths)
+
+
+def test_appended_records(logs):
+    index, paths = logs
+    extra = [("PATCH", "https://new.example.com/items/7", "new.example.com", 202)]
+
+    # 实时跟踪: 新记录接在已有倒排表之后
+    with CaptureWriter(paths[0]) as writer:
+        writer.write_many(make_record(*row) for row in extra)
+    assert index.append(paths[0], len(URLS), [make_record(*row) for row in extra], os.stat(paths[0]))
+    for keyword in ("items", "new", "7"):
+        assert index.search(paths, keyword) == scan(paths, keyword)
+    assert index.search(paths, method="patch") == [(0, len(URLS))]
+    assert index.update(paths) == []
+
+    # 文件继续增长后update重建这个文件的索引
+    with CaptureWriter(paths[0]) as writer:
+        writer.write_many(make_record(*row) for row in URLS[:2])
+    assert index.update(paths) == [paths[0]]
+    assert index.record_counts(paths)[0] == len(URLS) + 3
+    for keyword in KEYWORDS:
+        assert index.search(paths, keyword) == scan(paths, keyword)
+
+
+def test_append_gap_drops_file(logs):
+    index, paths = logs
+    # 序号接不上时删除该文件的索引，下次update重建
+    assert not index.append(paths[0], len(URLS) + 5, [make_record(*URLS[0])])
+    assert index.record_counts(paths)[0] == 0
+    assert index.update(paths) == [paths[0]]
+    assert index.search(paths, "items") == scan(paths, "items")
+
+
+def test_replaced_and_shrunk_files(logs):
+    index, paths = logs
+
+    # 截短
+    write_log(paths[1], URLS[:2])
+    assert index.update(paths) == [paths[1]]
+    assert index.record_counts(paths) == [len(URLS), 2]
+    for keyword in KEYWORDS:
+        assert index.search(paths, keyword) == scan(paths, keyword)
+
+    # 大小相同、内容不同的文件只有修改时间变化
+    stat = os.stat(paths[0])
+    write_log(paths[0], [(method, url.replace("items", "ITEMX"), host, status) for method, url, host, status in URLS])
+    assert os.path.getsize(paths[0]) == stat.st_size
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert index.update(paths) == [paths[0]]
+    assert index.search(paths, "items") == scan(paths, "items")
+    assert index.search(paths, "itemx") == scan(paths, "itemx") != []
+
+    # 删除的文件从索引中清除
+    os.remove(paths[1])
+    index.prune()
+    assert index.record_counts(paths) == [len(URLS), 0]